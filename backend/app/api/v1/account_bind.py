@@ -12,6 +12,7 @@ from app.core.security import create_access_token
 from app.core.config import get_settings
 from app.models.user import User
 from app.api.deps import get_current_user
+from app.core.principal_cache import invalidate_user_principals
 from app.api.v1.oauth import get_oauth_config, process_oauth_user_info
 from pydantic import BaseModel
 
@@ -233,8 +234,10 @@ async def qq_bind_callback(
                 # 至少有一方没有数据，直接合并
                 print(f"✅ 直接合并账号（至少一方无数据）")
                 
+                old_user_id = existing_user.id
+                
                 # 先合并数据
-                _merge_accounts(db, current_user.id, existing_user.id, "merge")
+                _merge_accounts(db, current_user.id, old_user_id, "merge")
                 
                 # 删除旧账号的关联数据（外键约束）
                 _delete_user_related_data(db, existing_user.id)
@@ -249,6 +252,7 @@ async def qq_bind_callback(
                 if qq_avatar and not current_user.oauth_avatar:
                     current_user.oauth_avatar = qq_avatar
                 db.commit()
+                _after_account_merge(db, current_user, old_user_id)
                 
                 return HTMLResponse(content=f"""
                     <html><body>
@@ -270,6 +274,7 @@ async def qq_bind_callback(
             if qq_avatar and not current_user.oauth_avatar:
                 current_user.oauth_avatar = qq_avatar
             db.commit()
+            invalidate_user_principals(current_user.id)
             
             return HTMLResponse(content=f"""
                 <html><body>
@@ -355,9 +360,13 @@ async def merge_account(
     elif platform == "wechat":
         current_user.wechat_openid = openid
     
+    # 删除旧账号的关联数据（外键约束）
+    _delete_user_related_data(db, old_user_id)
+    
     # 删除旧用户
     db.delete(old_user)
     db.commit()
+    _after_account_merge(db, current_user, old_user_id)
     
     # 删除临时token
     redis_client.delete(f"temp_bind:{request.temp_bind_token}")
@@ -482,8 +491,10 @@ async def wechat_bind_callback(
                 # 至少有一方没有数据，直接合并
                 print(f"✅ 直接合并账号（至少一方无数据）")
                 
+                old_user_id = existing_user.id
+                
                 # 先合并数据
-                _merge_accounts(db, current_user.id, existing_user.id, "merge")
+                _merge_accounts(db, current_user.id, old_user_id, "merge")
                 
                 # 删除旧账号的关联数据（外键约束）
                 _delete_user_related_data(db, existing_user.id)
@@ -496,6 +507,7 @@ async def wechat_bind_callback(
                 current_user.wechat_openid = openid
                 current_user.wechat_unionid = unionid
                 db.commit()
+                _after_account_merge(db, current_user, old_user_id)
                 
                 return HTMLResponse(content=f"""
                     <html><body>
@@ -515,6 +527,7 @@ async def wechat_bind_callback(
             current_user.wechat_openid = openid
             current_user.wechat_unionid = unionid
             db.commit()
+            invalidate_user_principals(current_user.id)
             
             return HTMLResponse(content=f"""
                 <html><body>
@@ -547,6 +560,20 @@ async def wechat_bind_callback(
         """)
 
 
+def _after_account_merge(db: Session, keep_user: User, remove_user_id: int):
+    """账号合并后：清除两个账号的认证缓存，并刷新减肥榜"""
+    from app.services import leaderboard_service
+    
+    invalidate_user_principals(keep_user.id)
+    invalidate_user_principals(remove_user_id)
+    
+    try:
+        leaderboard_service.remove_user(remove_user_id)
+        leaderboard_service.refresh_user(db, keep_user)
+    except Exception as e:
+        print(f"刷新减肥榜失败: {str(e)}")
+
+
 def _check_user_has_data(db: Session, user_id: int) -> bool:
     """检查用户是否有数据"""
     from app.models.weight import WeightRecord
@@ -576,10 +603,14 @@ def _delete_user_related_data(db: Session, user_id: int):
     from app.models.user_settings import UserSettings
     from app.models.sleep import SleepRecord
     from app.models.water import WaterRecord
+    from app.models.daily_nutrition_summary import DailyNutritionSummary
     
     # 删除用户设置
     db.query(UserSettings).filter(UserSettings.user_id == user_id).delete()
     
+    # 删除每日营养汇总
+    db.query(DailyNutritionSummary).filter(DailyNutritionSummary.user_id == user_id).delete()
+    
     # 删除睡眠记录
     db.query(SleepRecord).filter(SleepRecord.user_id == user_id).delete()
     
@@ -599,8 +630,19 @@ def _merge_accounts(db: Session, keep_user_id: int, remove_user_id: int, action:
     from app.models.exercise import ExerciseRecord
     from app.models.diet import DietRecord
     from app.models.daily_history import DailyHistory
+    from app.models.daily_nutrition_summary import DailyNutritionSummary
+    from app.services.daily_rollup_service import mark_daily_history_dirty_many
     
     if action == "merge":
+        # 迁入的记录所在日期，合并后需要为保留的账号重算汇总
+        merged_dates = set()
+        for model in (WeightRecord, ExerciseRecord, DietRecord):
+            merged_dates.update(
+                record_date for (record_date,) in db.query(model.record_date).filter(
+                    model.user_id == remove_user_id
+                ).distinct()
+            )
+        
         # 合并所有数据
         # 1. 合并体重记录
         db.query(WeightRecord).filter(
@@ -622,11 +664,18 @@ def _merge_accounts(db: Session, keep_user_id: int, remove_user_id: int, action:
             DailyHistory.user_id == remove_user_id
         ).update({"user_id": keep_user_id})
         
+        # 5. 旧账号的每日营养汇总作废，按合并后的数据重算
+        db.query(DailyNutritionSummary).filter(
+            DailyNutritionSummary.user_id == remove_user_id
+        ).delete()
+        
         db.commit()
+        mark_daily_history_dirty_many(db, keep_user_id, merged_dates)
     elif action == "replace":
         # 删除旧账号的所有数据
         db.query(WeightRecord).filter(WeightRecord.user_id == remove_user_id).delete()
         db.query(ExerciseRecord).filter(ExerciseRecord.user_id == remove_user_id).delete()
         db.query(DietRecord).filter(DietRecord.user_id == remove_user_id).delete()
         db.query(DailyHistory).filter(DailyHistory.user_id == remove_user_id).delete()
+        db.query(DailyNutritionSummary).filter(DailyNutritionSummary.user_id == remove_user_id).delete()
         db.commit()
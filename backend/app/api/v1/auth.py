@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.redis import get_redis
 from app.core.security import create_access_token
+from app.core.principal_cache import invalidate_user_principals
 from app.core.config import get_settings
 from app.models.user import User
 from app.schemas.user import (
@@ -105,6 +106,8 @@ async def login(
         settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
         access_token
     )
+    # 同设备旧token已被覆盖，清除认证缓存
+    invalidate_user_principals(user.id)
     
     return {
         "token": access_token,
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
 from datetime import datetime, date, timedelta
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models.user import User
 from app.models.daily_history import DailyHistory
 from app.models.weight import WeightRecord
@@ -11,6 +13,16 @@ from app.models.diet import DietRecord
 from app.models.exercise import ExerciseRecord
 from app.models.water import WaterRecord
 from app.api.deps import get_current_user
+from app.services import daily_rollup_service
+from app.services.home_overview_service import invalidate_home_overview
+from app.services.keyset_pagination import (
+    InvalidCursor,
+    Keyset,
+    count_cache_key,
+    get_cached_count,
+    set_cached_count
+)
+from app.services.nutrition_summary_service import refresh_nutrition_summaries
 from pydantic import BaseModel, validator
 from app.schemas.common import PaginationResponse
 from app.models.sleep import SleepRecord
@@ -18,6 +30,9 @@ import math
 
 router = APIRouter()
 
+# 历史记录按 (日期, id) 倒序
+HISTORY_KEYSET = Keyset("daily_history", (DailyHistory.record_date, DailyHistory.id))
+
 
 class DailyHistoryResponse(BaseModel):
     id: int
@@ -144,50 +159,91 @@ async def get_daily_history(
     end_date: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="游标（上一页返回的 next_cursor），传入时按游标翻页，忽略 page"),
+    with_total: bool = Query(False, description="游标翻页时是否返回总数（短时间缓存）"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取用户的历史记录数据（仅包含前一天及更早的数据）
+    按日期倒序，支持页码翻页和游标翻页（next_cursor）
     """
+    # 确保最多只查询到前一天
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    
+    conditions = [
+        DailyHistory.user_id == current_user.id,
+        DailyHistory.record_date <= yesterday
+    ]
+    
+    if start_date:
+        conditions.append(DailyHistory.record_date >= start_date)
+    
+    if end_date:
+        conditions.append(DailyHistory.record_date <= end_date)
+    
+    count_query = select(func.count()).select_from(DailyHistory).where(*conditions)
+    
+    if cursor is not None:
+        try:
+            after = HISTORY_KEYSET.after(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
     try:
-        # 确保最多只查询到前一天
-        today = date.today()
-        yesterday = today - timedelta(days=1)
-        
-        query = db.query(DailyHistory).filter(
-            DailyHistory.user_id == current_user.id,
-            DailyHistory.record_date <= yesterday
-        )
-        
-        if start_date:
-            query = query.filter(DailyHistory.record_date >= start_date)
-        
-        if end_date:
-            query = query.filter(DailyHistory.record_date <= end_date)
+        if cursor is not None:
+            # 游标翻页：从上一页最后一条之后取，多取一条判断是否还有下一页
+            rows = (await db.execute(
+                select(DailyHistory).where(*conditions, after)
+                .order_by(*HISTORY_KEYSET.order_by)
+                .limit(page_size + 1)
+            )).scalars().all()
+            records, next_cursor = HISTORY_KEYSET.page(rows, page_size)
+            
+            total = None
+            if with_total:
+                cache_key = count_cache_key(
+                    "daily_history", current_user.id,
+                    start_date=start_date, end_date=end_date, yesterday=yesterday
+                )
+                total = get_cached_count(cache_key)
+                if total is None:
+                    total = (await db.execute(count_query)).scalar_one()
+                    set_cached_count(cache_key, total)
+            
+            return {
+                "total": total,
+                "page_size": page_size,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor,
+                "items": [DailyHistoryResponse.from_orm(record).dict() for record in records]
+            }
         
         # 获取总数
-        total = query.count()
+        total = (await db.execute(count_query)).scalar_one()
         
         # 计算总页数
         total_pages = math.ceil(total / page_size) if total > 0 else 0
         
-        # 按日期倒序
-        query = query.order_by(DailyHistory.record_date.desc())
-        
-        # 分页查询
+        # 按日期倒序，分页查询
         skip = (page - 1) * page_size
-        records = query.offset(skip).limit(page_size).all()
+        records = (await db.execute(
+            select(DailyHistory).where(*conditions)
+            .order_by(*HISTORY_KEYSET.order_by)
+            .offset(skip).limit(page_size)
+        )).scalars().all()
         
         # 转换为响应模型
         items = [DailyHistoryResponse.from_orm(record).dict() for record in records]
         
-        # 返回分页响应
+        # 返回分页响应（next_cursor 可用于从下一页开始改用游标翻页）
         return {
             "total": total,
             "page": page,
             "page_size": page_size,
             "total_pages": total_pages,
+            "next_cursor": HISTORY_KEYSET.cursor_for(records[-1]) if records and page < total_pages else None,
             "items": items
         }
         
@@ -211,80 +267,9 @@ async def recalculate_daily_history(
     try:
         target_date = datetime.strptime(record_date, "%Y-%m-%d").date()
         
-        # 查询该日期的所有记录
-        diet_records = db.query(DietRecord).filter(
-            DietRecord.user_id == current_user.id,
-            DietRecord.record_date == target_date
-        ).all()
-        
-        exercise_records = db.query(ExerciseRecord).filter(
-            ExerciseRecord.user_id == current_user.id,
-            ExerciseRecord.record_date == target_date
-        ).all()
-        
-        weight_records = db.query(WeightRecord).filter(
-            WeightRecord.user_id == current_user.id,
-            WeightRecord.record_date == target_date
-        ).all()
-        
-        water_records = db.query(WaterRecord).filter(
-            WaterRecord.user_id == current_user.id,
-            WaterRecord.record_date == target_date
-        ).all()
-        
-        # 组织数据
-        breakfast_list = [f"{d.food_name} {d.portion if d.portion else ''} {int(d.calories)}大卡".strip() for d in diet_records if d.meal_type == 'breakfast']
-        lunch_list = [f"{d.food_name} {d.portion if d.portion else ''} {int(d.calories)}大卡".strip() for d in diet_records if d.meal_type == 'lunch']
-        dinner_list = [f"{d.food_name} {d.portion if d.portion else ''} {int(d.calories)}大卡".strip() for d in diet_records if d.meal_type == 'dinner']
-        
-        breakfast = ' + '.join(breakfast_list) if breakfast_list else "无"
-        lunch = ' + '.join(lunch_list) if lunch_list else "无"
-        dinner = ' + '.join(dinner_list) if dinner_list else "无"
-        
-        exercise_list = [f"{e.exercise_type} {e.duration}分钟 {int(e.calories)}大卡" for e in exercise_records]
-        exercise = ' + '.join(exercise_list) if exercise_list else "无"
-        
-        # 获取体重数据（优先使用morning_weight和evening_weight字段）
-        morning_weight = None
-        evening_weight = None
-        note = ""
-        
-        for weight in weight_records:
-            if weight.morning_weight:
-                morning_weight = weight.morning_weight
-            if weight.evening_weight:
-                evening_weight = weight.evening_weight
-            if weight.note:
-                note = weight.note
-        
-        # 计算饮水总量
-        total_water = sum(w.amount for w in water_records)
-        water = f"{total_water / 1000:.1f}L" if total_water > 0 else "0L"
-        
-        # 查找或创建历史数据
-        history = db.query(DailyHistory).filter(
-            DailyHistory.user_id == current_user.id,
-            DailyHistory.record_date == target_date
-        ).first()
-        
-        if not history:
-            history = DailyHistory(
-                user_id=current_user.id,
-                record_date=target_date
-            )
-            db.add(history)
-        
-        # 更新数据
-        history.breakfast = breakfast
-        history.lunch = lunch
-        history.dinner = dinner
-        history.exercise = exercise
-        history.morning_weight = morning_weight
-        history.evening_weight = evening_weight
-        history.water = water
-        history.note = note
-        
-        db.commit()
+        # 立即同步重算（与后台汇总任务使用同一套汇总逻辑）
+        histories = daily_rollup_service.recalculate_daily_history(db, [(current_user.id, target_date)])
+        history = histories[(current_user.id, target_date)]
         db.refresh(history)
         
         return {
@@ -511,6 +496,8 @@ async def create_daily_history(
         
         db.commit()
         db.refresh(history)
+        refresh_nutrition_summaries(db, [(current_user.id, target_date)])
+        invalidate_home_overview(current_user.id)
         
         return {
             "message": "创建成功",
@@ -711,6 +698,8 @@ async def update_daily_history(
         
         db.commit()
         db.refresh(history)
+        refresh_nutrition_summaries(db, [(current_user.id, old_date), (current_user.id, target_date)])
+        invalidate_home_overview(current_user.id)
         
         return {
             "message": "更新成功",
@@ -785,6 +774,8 @@ async def delete_daily_history(
         db.delete(history)
         
         db.commit()
+        refresh_nutrition_summaries(db, [(current_user.id, record_date)])
+        invalidate_home_overview(current_user.id)
         
         return {"message": "删除成功"}
         
@@ -1,7 +1,7 @@
 """数据同步配置API"""
 from fastapi import APIRouter, Depends, Query, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_
 from app.core.database import get_db
 from app.api.deps import get_current_user
 from app.models.user import User
@@ -14,6 +14,13 @@ from app.schemas.data_sync import (
     SyncRequest
 )
 from app.services.data_sync_service import DataSyncService
+from app.services.keyset_pagination import (
+    InvalidCursor,
+    Keyset,
+    count_cache_key,
+    get_cached_count,
+    set_cached_count
+)
 from app.services.scheduler_service import scheduler_service
 from typing import List, Optional
 from datetime import date
@@ -23,6 +30,9 @@ import logging
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 同步日志按 (创建时间, id) 倒序
+LOG_KEYSET = Keyset("data_sync_logs", (DataSyncLog.created_at, DataSyncLog.id))
+
 
 @router.get("/configs", summary="获取同步配置列表")
 async def get_sync_configs(
@@ -112,6 +122,9 @@ async def update_sync_config(
         config.sync_days = config_data.sync_days  # type: ignore
     if config_data.sync_yesterday is not None:
         config.sync_yesterday = config_data.sync_yesterday  # type: ignore
+    if config_data.sync_days is not None or config_data.sync_yesterday is not None:
+        # 同步范围变化后下次定时同步按新范围完整拉取一次
+        config.sync_cursor = None  # type: ignore
     
     db.commit()
     db.refresh(config)
@@ -223,10 +236,12 @@ async def get_sync_logs(
     end_date: Optional[date] = Query(None, description="结束日期"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="游标（上一页返回的 next_cursor），传入时按游标翻页，忽略 page"),
+    with_total: bool = Query(False, description="游标翻页时是否返回总数（短时间缓存）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取同步日志列表"""
+    """获取同步日志列表（按创建时间倒序，支持页码翻页和游标翻页）"""
     # 构建查询
     query = db.query(DataSyncLog).filter(DataSyncLog.user_id == current_user.id)
     
@@ -248,11 +263,42 @@ async def get_sync_logs(
     if end_date:
         query = query.filter(DataSyncLog.created_at <= end_date)
     
+    if cursor is not None:
+        try:
+            after = LOG_KEYSET.after(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # 游标翻页：从上一页最后一条之后取，多取一条判断是否还有下一页
+        rows = query.filter(after).order_by(*LOG_KEYSET.order_by).limit(page_size + 1).all()
+        logs, next_cursor = LOG_KEYSET.page(rows, page_size)
+        
+        total = None
+        if with_total:
+            cache_key = count_cache_key(
+                "data_sync_logs", current_user.id,
+                data_source=data_source, data_type=data_type, status=status,
+                start_date=start_date, end_date=end_date
+            )
+            total = get_cached_count(cache_key)
+            if total is None:
+                total = query.count()
+                set_cached_count(cache_key, total)
+        
+        return {
+            "total": total,
+            "page_size": page_size,
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor,
+            "items": logs
+        }
+    
     # 总数
     total = query.count()
+    total_pages = math.ceil(total / page_size) if total > 0 else 0
     
     # 按创建时间倒序排序
-    query = query.order_by(desc(DataSyncLog.created_at))
+    query = query.order_by(*LOG_KEYSET.order_by)
     
     # 分页
     offset = (page - 1) * page_size
@@ -262,6 +308,7 @@ async def get_sync_logs(
         "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": math.ceil(total / page_size) if total > 0 else 0,
+        "total_pages": total_pages,
+        "next_cursor": LOG_KEYSET.cursor_for(logs[-1]) if logs and page < total_pages else None,
         "items": logs
     }
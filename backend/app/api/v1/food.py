@@ -4,14 +4,18 @@ from typing import List, Optional
 from app.core.database import get_db
 from app.models.user import User
 from app.models.food import FoodNutrition
-from app.schemas.food import FoodNutritionResponse, FoodNutritionCreate, FoodNutritionUpdate
+from app.schemas.food import FoodNutritionResponse, FoodNutritionCreate, FoodNutritionUpdate, FoodBatchRequest
 from app.api.deps import get_current_user
 from app.utils.storage import upload_file
+from app.services import miaofoods_client, food_image_service
+from app.services import food_random_service
+from app.services.food_search_index import food_search_index
+from app.services.food_cache import food_cache
+from starlette.concurrency import run_in_threadpool
 import httpx
-import requests
 from bs4 import BeautifulSoup
 import re
-from decimal import Decimal
+from random import sample as random_sample
 import urllib3
 
 # 禁用SSL警告
@@ -29,88 +33,26 @@ async def search_food_online(
     current_user: User = Depends(get_current_user)
 ):
     """
-    搜索食物热量信息(使用execjs执行Nuxt的__NUXT__数据)
+    搜索食物热量信息(解析Nuxt的__NUXT__数据)
+    - 共享连接池请求上游，结果按关键词缓存（进程内 + Redis）
+    - 同一关键词的并发请求只请求一次上游
     """
     try:
-        import urllib.parse
-        import re
-        import execjs
-        
-        encoded_keyword = urllib.parse.quote(keyword)
-        search_url = f"https://www.miaofoods.com/search/{encoded_keyword}.html"
-        
-        # 请求头
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36",
-            "Accept-Encoding": "gzip, deflate",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        }
+        cached_foods, fetched = await miaofoods_client.search_foods(keyword)
+        foods = miaofoods_client.to_food_items(cached_foods)
         
-        # 发送请求
-        resp = requests.get(search_url, headers=headers, timeout=10, verify=False)
-        resp.raise_for_status()
-        resp.encoding = "utf-8"
-        html = resp.text
-        
-        # 提取包含 window.__NUXT__ 的 script 标签
-        script_pattern = re.search(r'<script>window\.__NUXT__\s*=\s*(.*?)</script>', html, re.S)
-        
-        if not script_pattern:
-            raise HTTPException(status_code=500, detail="未能找到食物数据")
-        
-        # 提取 JavaScript 表达式
-        js_expression = script_pattern.group(1).strip()
-        
-        # 移除末尾的分号(execjs.eval需要纯表达式)
-        if js_expression.endswith(';'):
-            js_expression = js_expression[:-1]
-        
-        # 执行 JavaScript 获取数据
-        nuxt_data = execjs.eval(js_expression)
-        
-        # 从解析好的数据中提取食物列表
-        data_list = nuxt_data.get('data', [{}])[0].get('curSearchFoodList', [])
-        
-        foods = []
-        for item in data_list:  # 返回所有结果
-            try:
-                # 处理图片URL中的unicode编码
-                image_url = item.get('foodIcon', '')
-                if image_url:
-                    image_url = image_url.replace('\\u002F', '/')
-                
-                food_item = {
-                    "external_id": str(item.get('foodId', hash(item.get('foodName')))),
-                    "name": item.get('foodName', ''),
-                    "calories": Decimal(str(item.get('foodCaloriesVal', 0))),
-                    "protein": Decimal(str(item.get('foodProteinVal', 0))),
-                    "carbs": Decimal(str(item.get('foodCarbohydrateVal', 0))),
-                    "fat": Decimal(str(item.get('foodFatVal', 0))),
-                    "image_url": image_url,
-                    "category": item.get('cateName'),
-                    "source": "miaofoods",
-                    "unit": "100克"
-                }
-                
-                foods.append(food_item)
-                
-            except Exception as e:
-                print(f"解析食物项失败: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                continue
-        
-        # 批量保存到数据库(后台任务)
-        if foods:
-            background_tasks.add_task(batch_save_foods_to_db, foods, db)
+        # 新获取的数据批量保存到数据库(后台任务)，缓存命中时已保存过
+        if foods and fetched:
+            background_tasks.add_task(save_foods_with_images, foods, db)
         
         return {
             "source": "online",
             "data": foods
         }
             
-    except HTTPException:
-        raise
+    except miaofoods_client.MiaofoodsError as e:
+        print(f"搜索食物失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         print(f"搜索食物失败: {str(e)}")
         import traceback
@@ -130,13 +72,11 @@ def get_food_detail(
     获取食物详细营养信息
     """
     try:
-        # 先查本地
-        local_food = db.query(FoodNutrition).filter(
-            FoodNutrition.external_id == external_id
-        ).first()
+        # 先查本地（进程内缓存）
+        local_food = food_cache.get_by_external_id(db, external_id)
         
         if local_food:
-            return FoodNutritionResponse.from_orm(local_food).dict()
+            return local_food.to_dict()
         
         # TODO: 爬虫功能待实现
         raise HTTPException(status_code=404, detail="食物不存在")
@@ -189,14 +129,17 @@ def save_food_to_db(food_data: dict, db: Session):
         db.rollback()
 
 
-def batch_save_foods_to_db(foods_data: list, db: Session):
+def batch_save_foods_to_db(foods_data: list, db: Session) -> list:
     """
     批量保存食物到本地数据库(同步,后台任务调用)
-    同时下载图片并上传到七牛云
+    图片先保存原始链接，由图片转存流水线上传后回填
+    
+    Returns:
+        list: 本次新增的食物数据
     """
     try:
         if not foods_data:
-            return
+            return []
         
         # 获取所有external_id
         external_ids = [food['external_id'] for food in foods_data]
@@ -208,42 +151,12 @@ def batch_save_foods_to_db(foods_data: list, db: Session):
         existing_ids = set(row[0] for row in existing_foods)
         
         # 过滤出需要新增的食物
+        new_foods_data = []
         new_foods = []
         for food_data in foods_data:
             if food_data['external_id'] not in existing_ids:
-                # 处理图片上传
-                qiniu_image_url = None
-                original_image_url = food_data.get('image_url')
-                
-                if original_image_url:
-                    try:
-                        # 下载原始图片
-                        import asyncio
-                        image_response = requests.get(original_image_url, timeout=10)
-                        if image_response.status_code == 200:
-                            image_content = image_response.content
-                            
-                            # 获取文件扩展名
-                            file_ext = '.jpg'  # 默认jpg
-                            if '.' in original_image_url:
-                                file_ext = '.' + original_image_url.split('.')[-1].split('?')[0]
-                            
-                            # 上传到七牛云(同步调用异步函数)
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            upload_result = loop.run_until_complete(
-                                upload_file(image_content, file_ext, folder="foods/")
-                            )
-                            loop.close()
-                            
-                            if upload_result.get('success'):
-                                qiniu_image_url = upload_result.get('url')
-                                print(f"图片上传成功: {food_data['name']} -> {qiniu_image_url}")
-                            else:
-                                print(f"图片上传失败: {food_data['name']}")
-                    except Exception as img_error:
-                        print(f"处理图片失败 {food_data['name']}: {str(img_error)}")
-                
+                existing_ids.add(food_data['external_id'])
+                new_foods_data.append(food_data)
                 new_foods.append(FoodNutrition(
                     external_id=food_data['external_id'],
                     name=food_data['name'],
@@ -251,7 +164,7 @@ def batch_save_foods_to_db(foods_data: list, db: Session):
                     protein=food_data.get('protein', 0),
                     carbs=food_data.get('carbs', 0),
                     fat=food_data.get('fat', 0),
-                    image_url=qiniu_image_url or original_image_url,  # 优先使用七牛云URL
+                    image_url=food_data.get('image_url'),  # 原始URL，转存后回填
                     unit=food_data.get('unit', '100g'),
                     source='miaofoods',
                     is_custom=False,
@@ -265,12 +178,34 @@ def batch_save_foods_to_db(foods_data: list, db: Session):
             print(f"批量保存了 {len(new_foods)} 个食物到本地")
         else:
             print("所有食物已存在,跳过保存")
+        return new_foods_data
         
     except Exception as e:
         print(f"批量保存食物失败: {str(e)}")
         import traceback
         traceback.print_exc()
         db.rollback()
+        return []
+
+
+async def save_foods_with_images(foods_data: list, db: Session):
+    """
+    后台任务：先入库（原始图片链接），再并发转存图片并回填 image_url
+    """
+    new_foods = await run_in_threadpool(batch_save_foods_to_db, foods_data, db)
+    if new_foods:
+        await food_image_service.ingest_food_images(new_foods)
+
+
+def _load_foods(db: Session, ids: List[int]) -> List[FoodNutrition]:
+    """按主键批量取出食物，保持 ids 的顺序"""
+    if not ids:
+        return []
+    foods_by_id = {
+        food.id: food
+        for food in db.query(FoodNutrition).filter(FoodNutrition.id.in_(ids)).all()
+    }
+    return [foods_by_id[food_id] for food_id in ids if food_id in foods_by_id]
 
 
 # 本地食物库 - 列表查询
@@ -281,14 +216,38 @@ def get_local_foods(
     page: int = 1,
     page_size: int = 20,
     random: bool = False,
+    session: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取本地食物库列表
-    random=True 时随机返回数据
+    random=True 时随机返回数据，传入 session（前端生成的会话标识）时同一会话内不重复
+    关键词支持名称片段、全拼和首字母（如 "mifan"、"mf"），按相关度排序
     """
     try:
+        ids = None
+        if random:
+            if not keyword:
+                # 预先打乱的 id 列表取样，不再 ORDER BY RAND()
+                total, ids = food_random_service.sample_food_ids(
+                    db, page_size, category, current_user.id, session
+                )
+            elif food_search_index.ready:
+                total, matched = food_search_index.search(keyword, category)
+                ids = random_sample(matched, min(page_size, total))
+        elif food_search_index.ready:
+            # 内存检索索引，只按主键取出当前页
+            total, ids = food_search_index.search(keyword, category, (page - 1) * page_size, page_size)
+        
+        if ids is not None:
+            return {
+                "total": total,
+                "page": page,
+                "page_size": page_size,
+                "items": [FoodNutritionResponse.from_orm(food).dict() for food in _load_foods(db, ids)]
+            }
+        
         query = db.query(FoodNutrition)
         
         if keyword:
@@ -300,9 +259,9 @@ def get_local_foods(
         total = query.count()
         
         if random:
-            # 随机获取
-            from sqlalchemy.sql.expression import func
-            foods = query.order_by(func.rand()).limit(page_size).all()
+            # 关键词过滤后的候选 id 中随机取样（只读主键列，不在数据库中排序）
+            matched = [row[0] for row in query.with_entities(FoodNutrition.id).all()]
+            foods = _load_foods(db, random_sample(matched, min(page_size, len(matched))))
         else:
             # 按更新时间倒序排列
             skip = (page - 1) * page_size
@@ -322,6 +281,70 @@ def get_local_foods(
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
 
+# 批量查询食物
+@router.post("/batch", summary="批量获取食物营养信息")
+def get_foods_batch(
+    request: FoodBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    按 id / external_id 批量获取食物（一整餐一次请求）
+    - 优先读取进程内缓存，未命中的合并为一次查询
+    - items 按请求顺序返回（先 ids 后 external_ids），不存在的列在 missing 中
+    """
+    try:
+        by_id, by_external = food_cache.get_many(db, request.ids, request.external_ids)
+        
+        items = [by_id[food_id].to_dict() for food_id in request.ids if food_id in by_id]
+        items += [by_external[eid].to_dict() for eid in request.external_ids if eid in by_external]
+        return {
+            "items": items,
+            "missing": {
+                "ids": [food_id for food_id in request.ids if food_id not in by_id],
+                "external_ids": [eid for eid in request.external_ids if eid not in by_external]
+            }
+        }
+        
+    except Exception as e:
+        print(f"批量获取食物失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+
+
+# 本地食物库 - 输入联想
+@router.get("/local/suggest", summary="本地食物名称联想")
+def suggest_local_foods(
+    keyword: str,
+    limit: int = 10,
+    category: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    输入联想（名称片段、全拼、首字母）
+    """
+    try:
+        limit = max(1, min(limit, 50))
+        if food_search_index.ready:
+            hits = food_search_index.suggest(keyword, limit, category)
+            return {"items": [{"id": h.id, "name": h.name, "category": h.category} for h in hits]}
+        
+        # 索引未就绪时按名称前缀查询（可以使用 name 索引）
+        query = db.query(FoodNutrition.id, FoodNutrition.name, FoodNutrition.category).filter(
+            FoodNutrition.name.like(f"{keyword}%")
+        )
+        if category:
+            query = query.filter(FoodNutrition.category == category)
+        rows = query.limit(limit).all()
+        return {"items": [{"id": r.id, "name": r.name, "category": r.category} for r in rows]}
+        
+    except Exception as e:
+        print(f"食物联想失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
+
+
 # 新增/编辑本地食物
 @router.post("/local", summary="新增食物到本地库")
 def create_local_food(
@@ -338,6 +361,7 @@ def create_local_food(
         db.add(new_food)
         db.commit()
         db.refresh(new_food)
+        food_search_index.upsert(new_food)
         
         return FoodNutritionResponse.from_orm(new_food).dict()
         
@@ -369,6 +393,8 @@ def update_local_food(
         
         db.commit()
         db.refresh(db_food)
+        food_search_index.upsert(db_food)
+        food_cache.invalidate(food_id)
         
         return FoodNutritionResponse.from_orm(db_food).dict()
         
@@ -398,6 +424,8 @@ def delete_local_food(
         
         db.delete(db_food)
         db.commit()
+        food_search_index.remove(food_id)
+        food_cache.invalidate(food_id)
         
         return {"message": "删除成功"}
         
@@ -3,6 +3,7 @@ import uuid
 from datetime import datetime
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
+from redis.exceptions import WatchError
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
@@ -13,6 +14,8 @@ from app.schemas.food_unit import (
     FoodUnitResponse,
     FoodUnitRecordCreate,
     FoodUnitRecordResponse,
+    FoodUnitBatchRequest,
+    FoodUnitGroup,
 )
 from app.api.deps import get_current_user
 
@@ -21,6 +24,42 @@ router = APIRouter(prefix="/api/v1/food-units", tags=["food-units"])
 # Redis key 前缀
 UNIT_KEY_PREFIX = "food_unit:"  # food_unit:{user_id}:{source_type}:{food_id}:units
 RECORD_KEY_PREFIX = "food_unit_record:"  # food_unit_record:{user_id}:{source_type}:{food_id}
+# 用户的单位索引（set，成员为 {source_type}:{food_id}），"我的全部单位" 不需要 SCAN
+UNIT_INDEX_PREFIX = "food_unit_index:"  # food_unit_index:{user_id}
+UNIT_TTL = 30 * 24 * 60 * 60  # 30天
+
+
+def _unit_key(user_id: int, source_type: str, food_id) -> str:
+    return f"{UNIT_KEY_PREFIX}{user_id}:{source_type}:{food_id}:units"
+
+
+def _index_key(user_id: int) -> str:
+    return f"{UNIT_INDEX_PREFIX}{user_id}"
+
+
+def _save_unit(redis_client, user_id: int, unit_info: dict):
+    """写入单位并更新用户索引（MULTI/EXEC，一次往返）"""
+    source_type = unit_info["source_type"]
+    food_id = unit_info["food_id"]
+    key = _unit_key(user_id, source_type, food_id)
+    index_key = _index_key(user_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(key, unit_info["unit_id"], json.dumps(unit_info))
+    pipe.expire(key, UNIT_TTL)
+    pipe.sadd(index_key, f"{source_type}:{food_id}")
+    pipe.expire(index_key, UNIT_TTL)
+    pipe.execute()
+
+
+def _load_units(redis_client, user_id: int, foods: List[tuple]) -> List[List[FoodUnitResponse]]:
+    """一次 pipeline 读取多个食物的单位，foods 为 (source_type, food_id) 列表"""
+    pipe = redis_client.pipeline(transaction=False)
+    for source_type, food_id in foods:
+        pipe.hgetall(_unit_key(user_id, source_type, food_id))
+    return [
+        [FoodUnitResponse(**json.loads(unit_json)) for unit_json in units_data.values()]
+        for units_data in pipe.execute()
+    ]
 
 
 @router.post("/units", response_model=FoodUnitResponse)
@@ -37,9 +76,6 @@ async def create_food_unit(
     # 生成单位ID
     unit_id = str(uuid.uuid4())
     
-    # Redis key - 带上文物源类型
-    key = f"{UNIT_KEY_PREFIX}{user_id}:{source_type}:{food_id}:units"
-    
     # 构建单位数据
     unit_info = {
         "unit_id": unit_id,
@@ -50,19 +86,52 @@ async def create_food_unit(
         "created_at": datetime.utcnow().isoformat(),
     }
     
-    # 存储到 Redis（以 unit_id 为 hash field）
-    redis_client.hset(
-        key,
-        unit_id,
-        json.dumps(unit_info),
-    )
-    
-    # 设置过期时间（30天）
-    redis_client.expire(key, 30 * 24 * 60 * 60)
+    # 存储到 Redis（以 unit_id 为 hash field），过期时间30天
+    _save_unit(redis_client, user_id, unit_info)
     
     return FoodUnitResponse(**unit_info)
 
 
+@router.post("/units/batch", response_model=List[FoodUnitGroup])
+async def get_food_units_batch(
+    batch: FoodUnitBatchRequest,
+    current_user = Depends(get_current_user),
+    redis_client = Depends(get_redis),
+):
+    """批量获取多个食物的自定义单位（饮食列表一次加载，一次 pipeline）"""
+    foods = list(dict.fromkeys((food.source_type or "local", food.food_id) for food in batch.foods))
+    units_list = _load_units(redis_client, current_user.id, foods)
+    return [
+        FoodUnitGroup(food_id=food_id, source_type=source_type, units=units)
+        for (source_type, food_id), units in zip(foods, units_list)
+    ]
+
+
+@router.get("/units", response_model=List[FoodUnitGroup])
+async def get_all_food_units(
+    current_user = Depends(get_current_user),
+    redis_client = Depends(get_redis),
+):
+    """获取当前用户的全部自定义单位（按食物分组）"""
+    user_id = current_user.id
+    members = sorted(redis_client.smembers(_index_key(user_id)))
+    foods = []
+    for member in members:
+        source_type, _, food_id = member.rpartition(":")
+        foods.append((source_type, int(food_id)))
+    units_list = _load_units(redis_client, user_id, foods)
+    
+    # 单位 hash 已过期或已删空的食物从索引中移除
+    stale = [member for member, units in zip(members, units_list) if not units]
+    if stale:
+        redis_client.srem(_index_key(user_id), *stale)
+    
+    return [
+        FoodUnitGroup(food_id=food_id, source_type=source_type, units=units)
+        for (source_type, food_id), units in zip(foods, units_list) if units
+    ]
+
+
 @router.get("/units/{food_id}", response_model=List[FoodUnitResponse])
 async def get_food_units(
     food_id: int,
@@ -72,7 +141,7 @@ async def get_food_units(
 ):
     """获取某个食物的所有自定义单位"""
     user_id = current_user.id
-    key = f"{UNIT_KEY_PREFIX}{user_id}:{source_type}:{food_id}:units"
+    key = _unit_key(user_id, source_type, food_id)
     
     units_data = redis_client.hgetall(key)
     
@@ -99,29 +168,42 @@ async def update_food_unit(
 ):
     """更新食物单位"""
     user_id = current_user.id
-    key = f"{UNIT_KEY_PREFIX}{user_id}:{source_type}:{food_id}:units"
-    
-    # 获取现有单位数据
-    unit_json = redis_client.hget(key, unit_id)
-    if not unit_json:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="单位不存在",
-        )
-    
-    unit_info = json.loads(unit_json)
-    
-    # 更新字段
-    if unit_data.unit_name is not None:
-        unit_info["unit_name"] = unit_data.unit_name
-    if unit_data.unit_weight is not None:
-        unit_info["unit_weight"] = unit_data.unit_weight
-    
-    unit_info["updated_at"] = datetime.utcnow().isoformat()
-    
-    # 保存回 Redis
-    redis_client.hset(key, unit_id, json.dumps(unit_info))
-    redis_client.expire(key, 30 * 24 * 60 * 60)
+    key = _unit_key(user_id, source_type, food_id)
+    index_key = _index_key(user_id)
+    
+    # WATCH 单位 hash：读取与写回之间被并发修改时重试，写回为一次 MULTI/EXEC
+    with redis_client.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                # 获取现有单位数据
+                unit_json = pipe.hget(key, unit_id)
+                if not unit_json:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="单位不存在",
+                    )
+                
+                unit_info = json.loads(unit_json)
+                
+                # 更新字段
+                if unit_data.unit_name is not None:
+                    unit_info["unit_name"] = unit_data.unit_name
+                if unit_data.unit_weight is not None:
+                    unit_info["unit_weight"] = unit_data.unit_weight
+                
+                unit_info["updated_at"] = datetime.utcnow().isoformat()
+                
+                # 保存回 Redis
+                pipe.multi()
+                pipe.hset(key, unit_id, json.dumps(unit_info))
+                pipe.expire(key, UNIT_TTL)
+                pipe.sadd(index_key, f"{source_type}:{food_id}")
+                pipe.expire(index_key, UNIT_TTL)
+                pipe.execute()
+                break
+            except WatchError:
+                continue
     
     return FoodUnitResponse(**unit_info)
 
@@ -136,18 +218,22 @@ async def delete_food_unit(
 ):
     """删除食物单位"""
     user_id = current_user.id
-    key = f"{UNIT_KEY_PREFIX}{user_id}:{source_type}:{food_id}:units"
-    
-    # 检查单位是否存在
-    unit_json = redis_client.hget(key, unit_id)
-    if not unit_json:
+    key = _unit_key(user_id, source_type, food_id)
+    
+    # 删除并取剩余数量（一次往返）
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hdel(key, unit_id)
+    pipe.hlen(key)
+    deleted, remaining = pipe.execute()
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="单位不存在",
         )
     
-    # 删除
-    redis_client.hdel(key, unit_id)
+    # 该食物已没有单位时从用户索引中移除
+    if not remaining:
+        redis_client.srem(_index_key(user_id), f"{source_type}:{food_id}")
     
     return {"message": "单位已删除"}
 
@@ -184,15 +270,11 @@ async def save_food_unit_record(
         "created_at": datetime.utcnow().isoformat(),
     }
     
-    # 存储到 Redis（以 record_id 为 hash field）
-    redis_client.hset(
-        key,
-        record_id,
-        json.dumps(record_info),
-    )
-    
-    # 设置过期时间（30天）
-    redis_client.expire(key, 30 * 24 * 60 * 60)
+    # 存储到 Redis（以 record_id 为 hash field），过期时间30天
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(key, record_id, json.dumps(record_info))
+    pipe.expire(key, UNIT_TTL)
+    pipe.execute()
     
     return FoodUnitRecordResponse(**record_info)
 
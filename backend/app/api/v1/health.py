@@ -11,6 +11,7 @@ from app.schemas.other import (
     SleepRecordCreate, SleepRecordUpdate, SleepRecordResponse
 )
 from app.api.deps import get_current_user
+from app.services.daily_rollup_service import mark_daily_history_dirty_many
 
 router = APIRouter()
 
@@ -112,13 +113,15 @@ async def update_sleep_record(
         from fastapi import HTTPException, status
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="记录不存在")
     
+    original_date = record.record_date
+    
     for field, value in record_update.dict(exclude_unset=True).items():
         setattr(record, field, value)
     
     db.commit()
     db.refresh(record)
     
-    # 触发历史记录重算
-    trigger_daily_history_recalculate(db, current_user.id, record.record_date)
+    # 触发历史记录重算（改了日期时原日期也要重算）
+    mark_daily_history_dirty_many(db, current_user.id, {original_date, record.record_date})
     
     return SleepRecordResponse.from_orm(record).dict()
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select
+from app.core.database import get_db, get_async_db
 from app.models.user import User
 from app.models.weight import WeightRecord
 from app.models.diet import DietRecord
 from app.models.exercise import ExerciseRecord
 from app.api.deps import get_current_user
+from app.services.home_overview_service import build_dashboard, build_calories_trend, get_home_overview
+from app.services.nutrition_summary_service import get_summaries
 from datetime import date, timedelta
 
 router = APIRouter()
@@ -14,7 +17,7 @@ router = APIRouter()
 
 @router.get("/dashboard", summary="获取首页概览数据")
 async def get_dashboard(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -30,62 +33,33 @@ async def get_dashboard(
         
         # 获取最新体重记录
         # 取最新更新的体重记录（优先按记录日期降序，其次按更新时间降序）
-        latest_weight = db.query(WeightRecord).filter(
-            WeightRecord.user_id == current_user.id
-        ).order_by(
-            desc(WeightRecord.record_date),
-            desc(WeightRecord.updated_at),
-            desc(WeightRecord.id)
-        ).first()
+        latest_weight = (await db.execute(
+            select(WeightRecord.weight, WeightRecord.record_date).where(
+                WeightRecord.user_id == current_user.id
+            ).order_by(
+                desc(WeightRecord.record_date),
+                desc(WeightRecord.updated_at),
+                desc(WeightRecord.id)
+            ).limit(1)
+        )).first()
         
         # 获取今日饮食记录
-        today_diet = db.query(DietRecord).filter(
-            DietRecord.user_id == current_user.id,
-            DietRecord.record_date == today
-        ).all()
-        
-        # 计算今日摄入热量
-        today_calories = sum(float(d.calories or 0) for d in today_diet)
+        today_diet = (await db.execute(
+            select(DietRecord).where(
+                DietRecord.user_id == current_user.id,
+                DietRecord.record_date == today
+            )
+        )).scalars().all()
         
         # 获取今日运动记录
-        today_exercise = db.query(ExerciseRecord).filter(
-            ExerciseRecord.user_id == current_user.id,
-            ExerciseRecord.record_date == today
-        ).all()
-        
-        # 计算今日消耗热量
-        today_exercise_calories = sum(float(e.calories or 0) for e in today_exercise)
+        today_exercise = (await db.execute(
+            select(ExerciseRecord).where(
+                ExerciseRecord.user_id == current_user.id,
+                ExerciseRecord.record_date == today
+            )
+        )).scalars().all()
         
-        # 格式化饮食记录
-        diet_records = [{
-            "id": d.id,
-            "meal_type": d.meal_type,
-            "food_name": d.food_name,
-            "calories": float(d.calories or 0),
-            "portion": d.portion or "",
-            "record_date": d.record_date.strftime("%Y-%m-%d")
-        } for d in today_diet]
-        
-        # 格式化运动记录
-        exercise_records = [{
-            "id": e.id,
-            "exercise_type": e.exercise_type,
-            "duration": e.duration,
-            "calories": float(e.calories or 0),
-            "distance": float(e.distance or 0),
-            "record_date": e.record_date.strftime("%Y-%m-%d")
-        } for e in today_exercise]
-        
-        return {
-            "latest_weight": {
-                "weight": float(latest_weight.weight) if latest_weight else None,
-                "record_date": latest_weight.record_date.strftime("%Y-%m-%d") if latest_weight else None
-            } if latest_weight else None,
-            "today_calories": round(today_calories, 1),
-            "today_exercise_calories": round(today_exercise_calories, 1),
-            "today_diet_records": diet_records,
-            "today_exercise_records": exercise_records
-          }
+        return build_dashboard(latest_weight, today_diet, today_exercise)
         
     except Exception as e:
         print(f"获取首页数据失败: {str(e)}")
@@ -108,43 +82,41 @@ async def get_calories_trend(
     try:
         start_date = date.today() - timedelta(days=days)
         
-        # 获取饮食记录
-        diet_records = db.query(
-            DietRecord.record_date,
-            func.sum(DietRecord.calories).label('total_calories')
-        ).filter(
-            DietRecord.user_id == current_user.id,
-            DietRecord.record_date >= start_date
-        ).group_by(DietRecord.record_date).all()
-        
-        # 获取运动记录
-        exercise_records = db.query(
-            ExerciseRecord.record_date,
-            func.sum(ExerciseRecord.calories).label('total_calories')
-        ).filter(
-            ExerciseRecord.user_id == current_user.id,
-            ExerciseRecord.record_date >= start_date
-        ).group_by(ExerciseRecord.record_date).all()
+        # 读取每日营养汇总（每天一行）
+        summaries = get_summaries(db, current_user.id, start_date)
         
         # 创建日期到热量的映射
-        diet_map = {str(r.record_date): float(r.total_calories or 0) for r in diet_records}
-        exercise_map = {str(r.record_date): float(r.total_calories or 0) for r in exercise_records}
-        
-        # 生成完整的日期序列
-        data = []
-        for i in range(days):
-            current_date = start_date + timedelta(days=i)
-            date_str = str(current_date)
-            data.append({
-                "date": date_str,
-                "intake": round(diet_map.get(date_str, 0), 1),
-                "consume": round(exercise_map.get(date_str, 0), 1)
-            })
+        diet_map = {str(s.record_date): float(s.intake_calories or 0) for s in summaries}
+        exercise_map = {str(s.record_date): float(s.exercise_calories or 0) for s in summaries}
         
         return {
-            "data": data
+            "data": build_calories_trend(start_date, days, diet_map, exercise_map)
         }
         
     except Exception as e:
         print(f"获取热量趋势失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取失败: {str(e)}")
+
+
+@router.get("/overview", summary="获取首页聚合数据")
+async def get_overview(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    首页一次加载所需的全部数据（两条查询，结果按用户、日期缓存）
+    - dashboard: 同 /home/dashboard
+    - progress: 同 /user/progress 的 data
+    - nutrition: 同 /nutrition/nutrition-analysis（今天）
+    - calories_trend: 同 /home/calories-trend（最近30天）的 data
+    """
+    try:
+        return {
+            "code": 200,
+            "data": await get_home_overview(db, current_user)
+        }
+    except Exception as e:
+        print(f"获取首页聚合数据失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"获取失败: {str(e)}")
@@ -9,6 +9,7 @@ import hashlib
 from app.core.database import get_db
 from app.core.redis import get_redis
 from app.core.security import create_access_token
+from app.core.principal_cache import invalidate_user_principals
 from app.core.config import get_settings
 from app.models.user import User
 from app.utils.oauth_helper import process_oauth_user_info
@@ -162,6 +163,7 @@ async def wechat_callback(
             settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
             token
         )
+        invalidate_user_principals(user.id)
         
         print(f"Token已保存到Redis")
         print(f"===================\n")
@@ -348,6 +350,7 @@ async def qq_callback(
             settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
             token
         )
+        invalidate_user_principals(user.id)
         
         print(f"Token已保存到Redis")
         print(f"===================\n")
@@ -5,6 +5,7 @@ from app.models.user import User
 from app.models.user_settings import UserSettings
 from app.schemas.user_settings import UserSettingsResponse, UserSettingsUpdate
 from app.api.deps import get_current_user
+from app.services import leaderboard_service
 
 router = APIRouter()
 
@@ -77,4 +78,10 @@ async def update_user_settings(
     db.commit()
     db.refresh(settings)
     
+    # 同步减肥榜中的数据公开设置
+    try:
+        leaderboard_service.set_data_public(current_user.id, settings.data_public)
+    except Exception as e:
+        print(f"更新减肥榜公开设置失败: {str(e)}")
+    
     return UserSettingsResponse.from_orm(settings).dict()
@@ -7,6 +7,8 @@ from app.models.user import User
 from app.models.weight import WeightRecord
 from app.schemas.user import UserResponse, UserUpdate
 from app.api.deps import get_current_user
+from app.core.principal_cache import invalidate_user_principals
+from app.services.home_overview_service import invalidate_home_overview
 from app.utils.storage import upload_file
 from app.utils.health_calculator import update_user_health_stats
 from pydantic import BaseModel
@@ -57,6 +59,9 @@ async def update_user_info(
         db.commit()
         db.refresh(current_user)
     
+    invalidate_user_principals(current_user.id)
+    invalidate_home_overview(current_user.id)
+    
     return UserResponse.from_orm(current_user).dict()
 
 
@@ -93,6 +98,7 @@ async def upload_avatar(
     avatar_url = result["url"]
     current_user.avatar = avatar_url
     db.commit()
+    invalidate_user_principals(current_user.id)
     
     return {
         "code": 200,
@@ -156,7 +162,7 @@ async def get_weight_progress(
     - 预计达到目标需要的天数
     """
     from app.models.weight import WeightRecord
-    from datetime import date, timedelta
+    from datetime import date
     
     today = date.today()
     
@@ -166,115 +172,30 @@ async def get_weight_progress(
         WeightRecord.record_date == today
     ).first()
     
-    # 如果今天有记录，使用今天的；否则使用用户表的当前体重
-    current_weight = today_record.weight if today_record else current_user.current_weight
-    
     # 2. 获取昨天或更早的体重记录（用于比较）
     yesterday_or_before = db.query(WeightRecord).filter(
         WeightRecord.user_id == current_user.id,
         WeightRecord.record_date < today
     ).order_by(WeightRecord.record_date.desc()).first()
     
-    # 计算相比昨天（或上次记录）的变化
-    weight_change = None
-    weight_change_date = None
-    if yesterday_or_before:
-        weight_change = current_weight - yesterday_or_before.weight
-        weight_change_date = yesterday_or_before.record_date.isoformat()
-    
     # 3. 获取最早的体重记录（作为起始体重）
     first_record = db.query(WeightRecord).filter(
         WeightRecord.user_id == current_user.id
     ).order_by(WeightRecord.record_date.asc()).first()
     
-    # 计算已减去的体重和耗时
-    weight_lost = None
-    days_elapsed = None
-    if first_record:
-        weight_lost = first_record.weight - current_weight  # 正数表示减重，负数表示增重
-        days_elapsed = (today - first_record.record_date).days
-    
-    # 4. 计算距离目标还有多少
-    weight_to_goal = None
-    if current_user.target_weight:
-        weight_to_goal = current_weight - current_user.target_weight
-    
-    # 5. 根据历史趋势计算预计达到目标需要的天数
-    estimated_days_to_goal = None
-    if current_user.target_weight and weight_to_goal and weight_to_goal > 0:
-        # 智能选择时间范围：根据用户记录频率动态调整
-        all_records = db.query(WeightRecord).filter(
-            WeightRecord.user_id == current_user.id
-        ).order_by(WeightRecord.record_date.asc()).all()
-        
-        # 至少需要3条记录才能计算趋势
-        if len(all_records) >= 3:
-            # 计算用户的记录频率（总记录数 / 总天数）
-            first_date = all_records[0].record_date
-            last_date = all_records[-1].record_date
-            total_days = (last_date - first_date).days
-            
-            if total_days > 0:
-                record_frequency = len(all_records) / total_days  # 每天平均记录次数
-                
-                # 根据记录频率选择数据范围：
-                # - 如果记录频率 >= 0.7（约每天都记录），使用最近60天数据
-                # - 如果记录频率 >= 0.4（约2-3天记录一次），使用最近45天数据
-                # - 否则使用最近30天数据
-                if record_frequency >= 0.7:
-                    days_range = 60  # 频繁记录用户，用更多数据
-                elif record_frequency >= 0.4:
-                    days_range = 45  # 中等频率用户
-                else:
-                    days_range = 30  # 低频率用户
-                
-                # 获取指定时间范围的记录
-                range_records = db.query(WeightRecord).filter(
-                    WeightRecord.user_id == current_user.id,
-                    WeightRecord.record_date >= today - timedelta(days=days_range)
-                ).order_by(WeightRecord.record_date.asc()).all()
-                
-                # 如果范围内记录少于5条，回退到全部数据
-                if len(range_records) >= 5:
-                    records_to_use = range_records
-                else:
-                    # 数据太少，用全部历史数据
-                    records_to_use = all_records if len(all_records) >= 5 else None
-            else:
-                # 所有记录在同一天，无法计算
-                records_to_use = None
-            
-            # 计算平均每天的体重变化率
-            if records_to_use and len(records_to_use) >= 5:
-                start_weight = records_to_use[0].weight
-                end_weight = records_to_use[-1].weight
-                days_span = (records_to_use[-1].record_date - records_to_use[0].record_date).days
-                
-                if days_span > 0:
-                    daily_change = (end_weight - start_weight) / days_span  # 负数表示在减重
-                    
-                    # 如果趋势是在减重（daily_change < 0）
-                    if daily_change < 0:
-                        # 预计还需要多少天
-                        estimated_days_to_goal = int(abs(weight_to_goal / daily_change))
-                        # 限制在合理范围内（1-1000天）
-                        if estimated_days_to_goal < 1:
-                            estimated_days_to_goal = 1
-                        elif estimated_days_to_goal > 1000:
-                            estimated_days_to_goal = None  # 太久了，不显示
+    # 4. 计算变化、已减体重、距离目标和预计天数（优先读取夜间批量计算的减重速率）
+    from app.services.home_overview_service import build_progress
+    from app.services.ml_service import get_goal_daily_change
+    data = build_progress(
+        current_user, today,
+        today_record.weight if today_record else None,
+        yesterday_or_before, first_record,
+        lambda: get_goal_daily_change(db, current_user.id, today)
+    )
     
     return {
         "code": 200,
-        "data": {
-            "current_weight": current_weight,
-            "target_weight": current_user.target_weight,
-            "weight_change": weight_change,  # 相比昨天的变化（kg）
-            "weight_change_date": weight_change_date,  # 对比的日期
-            "weight_lost": weight_lost,  # 已减去的体重（kg）
-            "weight_to_goal": weight_to_goal,  # 距离目标还有多少（kg）
-            "days_elapsed": days_elapsed,  # 耗时天数
-            "estimated_days_to_goal": estimated_days_to_goal  # 预计达到目标需要的天数
-        }
+        "data": data
     }
 
 
@@ -327,6 +248,7 @@ async def bind_phone(
     # 3. 绑定手机号
     current_user.phone = request.phone
     db.commit()
+    invalidate_user_principals(current_user.id)
     
     # 4. 删除验证码
     redis_client.delete(f"sms_code:{request.phone}")
@@ -385,5 +307,6 @@ async def unbind_account(
         )
     
     db.commit()
+    invalidate_user_principals(current_user.id)
     
     return {"message": "解绑成功"}
@@ -1,101 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List, Optional
 from datetime import date, datetime, timedelta
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models.user import User
 from app.models.weight import WeightRecord
-from app.models.daily_history import DailyHistory
 from app.schemas.weight import (
     WeightRecordCreate, WeightRecordUpdate, WeightRecordResponse,
     WeightTrendRequest, WeightPrediction
 )
 from app.api.deps import get_current_user
 from app.utils.health_calculator import update_user_health_stats
+from app.services.daily_rollup_service import mark_daily_history_dirty, mark_daily_history_dirty_many
 
 router = APIRouter()
 
 
 def trigger_daily_history_recalculate(db: Session, user_id: int, record_date: date):
-    """触发历史数据重算，今天的数据也会保存到历史记录表"""
-    # 移除日期限制，今天的数据也会触发历史记录更新
-    from app.models.diet import DietRecord
-    from app.models.exercise import ExerciseRecord
-    from app.models.water import WaterRecord
-    
-    # 查询该日期的所有记录
-    diet_records = db.query(DietRecord).filter(
-        DietRecord.user_id == user_id,
-        DietRecord.record_date == record_date
-    ).all()
-    
-    exercise_records = db.query(ExerciseRecord).filter(
-        ExerciseRecord.user_id == user_id,
-        ExerciseRecord.record_date == record_date
-    ).all()
-    
-    weight_records = db.query(WeightRecord).filter(
-        WeightRecord.user_id == user_id,
-        WeightRecord.record_date == record_date
-    ).all()
-    
-    water_records = db.query(WaterRecord).filter(
-        WaterRecord.user_id == user_id,
-        WaterRecord.record_date == record_date
-    ).all()
-    
-    # 汇总数据
-    breakfast_list = [f"{d.food_name} {d.portion if d.portion else ''} {int(d.calories)}大卡".strip() for d in diet_records if d.meal_type == 'breakfast']
-    lunch_list = [f"{d.food_name} {d.portion if d.portion else ''} {int(d.calories)}大卡".strip() for d in diet_records if d.meal_type == 'lunch']
-    dinner_list = [f"{d.food_name} {d.portion if d.portion else ''} {int(d.calories)}大卡".strip() for d in diet_records if d.meal_type == 'dinner']
-    
-    breakfast = ' + '.join(breakfast_list) if breakfast_list else "无"
-    lunch = ' + '.join(lunch_list) if lunch_list else "无"
-    dinner = ' + '.join(dinner_list) if dinner_list else "无"
-    
-    exercise_list = [f"{e.exercise_type} {e.duration}分钟 {int(e.calories)}大卡" for e in exercise_records]
-    exercise = ' + '.join(exercise_list) if exercise_list else "无"
-    
-    # 体重数据
-    morning_weight = None
-    evening_weight = None
-    note = ""
-    
-    for weight in weight_records:
-        if weight.morning_weight:
-            morning_weight = weight.morning_weight
-        if weight.evening_weight:
-            evening_weight = weight.evening_weight
-        if weight.note:
-            note = weight.note
-    
-    # 计算饮水
-    total_water = sum(w.amount for w in water_records)
-    water = f"{total_water / 1000:.1f}L" if total_water > 0 else "0L"
-    
-    # 查找或创建历史记录
-    history = db.query(DailyHistory).filter(
-        DailyHistory.user_id == user_id,
-        DailyHistory.record_date == record_date
-    ).first()
-    
-    if not history:
-        history = DailyHistory(
-            user_id=user_id,
-            record_date=record_date
-        )
-        db.add(history)
-    
-    history.breakfast = breakfast
-    history.lunch = lunch
-    history.dinner = dinner
-    history.exercise = exercise
-    history.morning_weight = morning_weight
-    history.evening_weight = evening_weight
-    history.water = water
-    history.note = note
-    
-    db.commit()
+    """触发历史数据重算（标记为待重算，由后台汇总任务合并处理），今天的数据也会保存到历史记录表"""
+    mark_daily_history_dirty(db, user_id, record_date)
 
 
 @router.post("/", response_model=WeightRecordResponse, summary="创建或更新体重记录")
@@ -205,17 +130,19 @@ async def get_weight_records(
 @router.get("/trend", summary="获取体重趋势")
 async def get_weight_trend(
     days: int = 30,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取体重趋势数据"""
     try:
         # 支持返回全部记录：当 days <= 0 时不做日期限制
-        query = db.query(WeightRecord).filter(WeightRecord.user_id == current_user.id)
+        query = select(WeightRecord.record_date, WeightRecord.weight).where(
+            WeightRecord.user_id == current_user.id
+        )
         if days and days > 0:
             start_date = date.today() - timedelta(days=days)
-            query = query.filter(WeightRecord.record_date >= start_date)
-        records = query.order_by(WeightRecord.record_date.asc()).all()
+            query = query.where(WeightRecord.record_date >= start_date)
+        records = (await db.execute(query.order_by(WeightRecord.record_date.asc()))).all()
         
         data = [{
             "record_date": r.record_date.strftime("%Y-%m-%d"),
@@ -273,6 +200,8 @@ async def update_weight_record(
             detail="记录不存在"
         )
     
+    original_date = record.record_date
+    
     # 更新字段
     for field, value in record_update.dict(exclude_unset=True).items():
         setattr(record, field, value)
@@ -288,9 +217,8 @@ async def update_weight_record(
     # 更新用户的健康数据
     update_user_health_stats(db, current_user.id)
     
-    # 触发历史数据重算
-    record_date = record_update.record_date if record_update.record_date else record.record_date
-    trigger_daily_history_recalculate(db, current_user.id, record_date)
+    # 触发历史数据重算（改了日期时原日期也要重算）
+    mark_daily_history_dirty_many(db, current_user.id, {original_date, record.record_date})
     
     return WeightRecordResponse.from_orm(record).dict()
 
@@ -41,6 +41,61 @@ class Settings(BaseSettings):
     APP_PORT: int = 8000
     DEBUG: bool = True
     
+    # 数据库连接池配置（同步、异步引擎各一个池，每个 worker 进程独立）
+    DB_POOL_SIZE: int = 10  # 常驻连接数
+    DB_MAX_OVERFLOW: int = 10  # 池满后允许额外创建的连接数
+    DB_POOL_TIMEOUT: int = 10  # 等待空闲连接的超时时间（秒）
+    DB_POOL_RECYCLE: int = 3600  # 连接最长使用时间（秒），需小于 MySQL wait_timeout
+    DB_ECHO: bool = False  # 是否输出SQL日志（与 DEBUG 无关）
+    METRICS_TOKEN: str = ""  # 访问 /metrics/db-pool 需要的 X-Metrics-Token，留空时接口不可访问
+    
+    # 认证缓存配置（进程内缓存 token -> 用户，0 表示关闭）
+    PRINCIPAL_CACHE_TTL: int = 30  # 秒
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    
+    # 每日历史汇总配置（写入只标记脏日期，后台任务合并重算）
+    DAILY_ROLLUP_INTERVAL_SECONDS: int = 5  # 后台汇总任务执行间隔
+    DAILY_ROLLUP_DEBOUNCE_SECONDS: int = 2  # 标记后至少等待多久再重算，用于合并连续写入
+    DAILY_ROLLUP_BATCH_SIZE: int = 500  # 每轮最多重算的天数
+    
+    # 夜间批量体重预测配置
+    FORECAST_BATCH_HOUR: int = 3  # 每天执行的小时
+    FORECAST_BATCH_MINUTE: int = 0  # 每天执行的分钟
+    FORECAST_ACTIVE_DAYS: int = 90  # 最近N天内有体重记录的用户才参与批量预测
+    
+    # 首页聚合数据缓存（按用户、日期缓存，写入记录时主动清除）
+    HOME_OVERVIEW_CACHE_TTL: int = 300  # 秒
+    LIST_COUNT_CACHE_TTL: int = 60  # 游标翻页时列表总数的缓存时间（秒）
+    
+    # 喵喵食物网搜索配置
+    MIAOFOODS_TIMEOUT: float = 10.0  # 上游请求超时（秒）
+    MIAOFOODS_MAX_CONNECTIONS: int = 20  # 连接池大小（长连接复用）
+    FOOD_SEARCH_CACHE_TTL: int = 86400  # 有结果的关键词在 Redis 中的缓存时间（秒）
+    FOOD_SEARCH_NEGATIVE_TTL: int = 600  # 无结果的关键词缓存时间（秒）
+    FOOD_SEARCH_LOCAL_TTL: int = 300  # 进程内缓存时间（秒）
+    FOOD_SEARCH_LOCAL_CACHE_SIZE: int = 512  # 进程内最多缓存的关键词数，0 表示关闭
+    FOOD_INDEX_SYNC_SECONDS: int = 60  # 本地食物库检索索引增量同步间隔（秒）
+    FOOD_RANDOM_REFRESH_SECONDS: int = 3600  # 随机推荐列表重新打乱间隔（秒）
+    FOOD_RANDOM_SESSION_TTL: int = 1800  # 随机推荐会话（已返回的食物）保留时间（秒）
+    FOOD_CACHE_SIZE: int = 20000  # 进程内食物缓存条数，0 表示关闭
+    FOOD_CACHE_TTL: int = 600  # 进程内食物缓存有效期（秒）
+    FOOD_CACHE_WARM_SIZE: int = 2000  # 启动时预热最近常吃的食物数
+    
+    # 食物图片转存配置（搜索结果入库后下载原图上传到自己的存储）
+    FOOD_IMAGE_CONCURRENCY: int = 8  # 同时处理的图片数
+    FOOD_IMAGE_PER_HOST: int = 4  # 同一图片域名的并发下载数
+    FOOD_IMAGE_RETRIES: int = 2  # 下载失败重试次数
+    FOOD_IMAGE_TIMEOUT: float = 10.0  # 下载超时（秒）
+    FOOD_IMAGE_MAX_EDGE: int = 0  # 大于0时按最长边缩小并重编码为JPEG，0 表示原样上传
+    
+    # 小米运动健康数据同步配置（长时间范围按窗口并发拉取）
+    XIAOMI_SYNC_CONCURRENCY: int = 4  # 同一次同步同时进行的请求数
+    XIAOMI_SYNC_WINDOW_DAYS: int = 30  # 每个窗口的天数，超过该范围的同步才并发拉取
+    XIAOMI_SYNC_EARLIEST_YEAR: int = 2014  # 早于该年份的时间段合并为一个窗口
+    SYNC_CURSOR_OVERLAP_SECONDS: int = 3600  # 定时增量同步从游标往前重叠的时间（秒），接住延迟上传的数据
+    EXTERNAL_INSERT_BATCH_SIZE: int = 500  # 外部数据批量写入时每条 INSERT 的行数（含原始数据，过大可能超过 max_allowed_packet）
+    DATA_HASH_STRATEGY: str = "identity"  # 外部数据防重标识：identity=按标识字段（数据时间等），content=按整条记录
+    
     # 文件上传配置
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
@@ -70,6 +125,10 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}?charset=utf8mb4"
     
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"mysql+aiomysql://{self.MYSQL_USER}:{self.MYSQL_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}?charset=utf8mb4"
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,160 @@
+"""
+数据库连接池监控
+
+统计每个连接池的借出等待耗时、使用中连接数、溢出连接和等待超时次数，
+通过 /metrics/db-pool 输出，用于在多 worker 部署下估算 MySQL 连接数：
+总连接上限 ≈ worker 数 × (DB_POOL_SIZE + DB_MAX_OVERFLOW) × 2（同步 + 异步引擎）
+
+数据按进程统计，返回中带有 pid，多 worker 时需要分别采集。
+"""
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """单个连接池的统计数据"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0  # 借出次数
+        self.checkout_wait_total = 0.0  # 累计等待耗时（秒）
+        self.checkout_wait_max = 0.0  # 最大等待耗时（秒）
+        self.timeouts = 0  # 等待超时次数（pool_timeout）
+        self.overflow_checkouts = 0  # 借出后使用中连接数超过 pool_size（占用溢出连接）的次数
+        self.connects = 0  # 新建物理连接次数
+        self.invalidations = 0  # 连接失效次数
+        self.in_use = 0  # 当前使用中的连接数
+        self.in_use_peak = 0  # 使用中连接数峰值
+
+    def record_wait(self, elapsed: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkout_wait_total += elapsed
+            if elapsed > self.checkout_wait_max:
+                self.checkout_wait_max = elapsed
+
+    def record_checkout(self, overflow: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            if self.in_use > self.in_use_peak:
+                self.in_use_peak = self.in_use
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidate(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, pool) -> Dict:
+        with self._lock:
+            avg_wait = self.checkout_wait_total / self.checkouts if self.checkouts else 0.0
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "in_use_peak": self.in_use_peak,
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": round(avg_wait * 1000, 3),
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+
+
+_metrics: Dict[str, PoolMetrics] = {}
+_pools: Dict[str, object] = {}
+
+
+class _TimedPoolMixin:
+    """在 _do_get 外层计时，得到借出连接时的排队等待耗时"""
+
+    metrics_name = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            get_pool_metrics(self.metrics_name).record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        get_pool_metrics(self.metrics_name).record_wait(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # dispose/重建时保持计时能力
+        new_pool = super().recreate()
+        new_pool.metrics_name = self.metrics_name
+        return new_pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    """带等待计时的 QueuePool（同步引擎）"""
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    """带等待计时的 AsyncAdaptedQueuePool（异步引擎）"""
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    metrics = _metrics.get(name)
+    if metrics is None:
+        metrics = _metrics.setdefault(name, PoolMetrics(name))
+    return metrics
+
+
+def instrument_engine(engine, name: str):
+    """为引擎的连接池注册事件监听（同步引擎传 engine，异步引擎传 async_engine.sync_engine）"""
+    pool = engine.pool
+    pool.metrics_name = name
+    _pools[name] = engine
+    metrics = get_pool_metrics(name)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        # 借出后使用中的连接数超过 pool_size，说明这次占用的是溢出连接
+        pool = engine.pool
+        metrics.record_checkout(overflow=pool.checkedout() > pool.size())
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.record_checkin()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.record_invalidate()
+
+
+def get_pool_stats() -> Dict:
+    """所有已监控连接池的统计数据"""
+    return {
+        "pid": os.getpid(),
+        "pools": {
+            name: get_pool_metrics(name).snapshot(engine.pool)
+            for name, engine in _pools.items()
+        }
+    }
@@ -0,0 +1,209 @@
+"""
+认证主体（principal）进程内缓存
+
+get_current_user 每次请求都要解码JWT、查询Redis中的token、再查询MySQL中的用户，
+这里按 token 哈希缓存解码后的 payload 和一份脱离会话的 User 快照，短 TTL 内的重复请求不做任何 I/O。
+
+失效通过 Redis pub/sub 广播到所有 worker 进程：
+- token 被覆盖/吊销（重新登录、退出）时按用户失效
+- 用户信息变更（资料修改、健康数据更新、账号合并）时按用户失效
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INVALIDATE_CHANNEL = "principal:invalidate"
+
+
+class CachedPrincipal:
+    """缓存的认证主体"""
+
+    __slots__ = ("payload", "device_id", "user", "expires_at")
+
+    def __init__(self, payload: dict, device_id: str, user: User, expires_at: float):
+        self.payload = payload
+        self.device_id = device_id
+        self.user = user
+        self.expires_at = expires_at
+
+
+class PrincipalCache:
+    """按 token 哈希缓存认证主体（单例，进程内）"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._entries = OrderedDict()  # token哈希 -> CachedPrincipal（LRU顺序）
+            cls._instance._user_index = {}  # user_id -> {token哈希}
+            cls._instance._lock = threading.Lock()
+            cls._instance._subscriber = None
+        return cls._instance
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        """token 哈希（不在内存中保存明文 token 作为键）"""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[CachedPrincipal]:
+        """获取未过期的缓存主体"""
+        if settings.PRINCIPAL_CACHE_TTL <= 0:
+            return None
+        self._ensure_subscriber()
+
+        key = self.token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, token: str, payload: dict, device_id: str, user: User):
+        """缓存认证主体，保存一份脱离会话的用户快照"""
+        if settings.PRINCIPAL_CACHE_TTL <= 0:
+            return
+        self._ensure_subscriber()
+
+        key = self.token_key(token)
+        entry = CachedPrincipal(
+            payload=payload,
+            device_id=device_id,
+            user=_snapshot_user(user),
+            expires_at=time.monotonic() + settings.PRINCIPAL_CACHE_TTL
+        )
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._user_index.setdefault(entry.user.id, set()).add(key)
+            while len(self._entries) > settings.PRINCIPAL_CACHE_MAX_SIZE:
+                oldest_key = next(iter(self._entries))
+                self._drop(oldest_key)
+
+    def evict_user(self, user_id: int):
+        """本进程内清除某个用户的所有缓存主体"""
+        with self._lock:
+            for key in list(self._user_index.get(user_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        """清空本进程缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._user_index.clear()
+
+    def _drop(self, key: str):
+        """删除单条缓存（调用方需持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._user_index.get(entry.user.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_index[entry.user.id]
+
+    def _ensure_subscriber(self):
+        """懒启动失效消息订阅线程"""
+        if self._subscriber is not None and self._subscriber.is_alive():
+            return
+        with self._lock:
+            if self._subscriber is not None and self._subscriber.is_alive():
+                return
+            self._subscriber = threading.Thread(
+                target=self._listen,
+                name="principal-cache-invalidator",
+                daemon=True
+            )
+            self._subscriber.start()
+
+    def _listen(self):
+        """订阅失效频道；连接断开时清空缓存并重连，避免漏掉失效消息"""
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATE_CHANNEL)
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._handle_message(message.get("data"))
+            except Exception as e:
+                logger.warning(f"认证缓存失效订阅中断，清空缓存后重连: {e}")
+                self.clear()
+                time.sleep(1)
+
+    def _handle_message(self, data: Optional[str]):
+        """处理失效消息，格式为 user:{user_id}"""
+        if not data or not data.startswith("user:"):
+            return
+        try:
+            self.evict_user(int(data.split(":", 1)[1]))
+        except ValueError:
+            return
+
+
+def _snapshot_user(user: User) -> User:
+    """复制用户列数据，生成一个干净的 detached 对象（不与任何会话绑定）"""
+    snapshot = User(**{
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(User).column_attrs
+    })
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def attach_user(db: Session, principal: CachedPrincipal) -> User:
+    """
+    将缓存的用户快照挂到当前请求的会话上
+
+    merge(load=False) 不会发出 SQL，返回的对象属于当前会话，
+    处理函数中 setattr + commit 的写法保持不变
+    """
+    return db.merge(principal.user, load=False)
+
+
+def get_principal_cache() -> PrincipalCache:
+    return PrincipalCache()
+
+
+def invalidate_user_principals(user_id: int):
+    """
+    使某个用户的缓存主体失效（本进程立即生效，并广播到其他进程）
+
+    在 token 覆盖/吊销、用户信息变更后调用
+    """
+    get_principal_cache().evict_user(user_id)
+    try:
+        get_redis().publish(INVALIDATE_CHANNEL, f"user:{user_id}")
+    except Exception as e:
+        logger.warning(f"广播认证缓存失效消息失败: user_id={user_id}, {e}")
+
+
+def get_cached_principal(token: str, device_id_hint: Optional[str] = None) -> Optional[CachedPrincipal]:
+    """读取缓存主体；JWT 已过期时不命中，旧版 token（payload 无 device_id）需要设备ID一致才命中"""
+    entry = get_principal_cache().get(token)
+    if entry is None:
+        return None
+    exp = entry.payload.get("exp")
+    if exp and exp <= time.time():
+        return None
+    if not entry.payload.get("device_id") and device_id_hint != entry.device_id:
+        return None
+    return entry
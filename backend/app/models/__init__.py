@@ -5,6 +5,7 @@ from app.models.exercise import ExerciseRecord
 from app.models.diet import DietRecord
 from app.models.water import WaterRecord
 from app.models.sleep import SleepRecord
+from app.models.daily_nutrition_summary import DailyNutritionSummary
 
 __all__ = [
     "User",
@@ -12,5 +13,6 @@ __all__ = [
     "ExerciseRecord",
     "DietRecord",
     "WaterRecord",
-    "SleepRecord"
+    "SleepRecord",
+    "DailyNutritionSummary"
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, Date, ForeignKey, String, Text
+from sqlalchemy import Column, Integer, Float, DateTime, Date, ForeignKey, String, Text, UniqueConstraint
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -31,5 +31,9 @@ class DailyHistory(Base):
     created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="更新时间")
     
+    __table_args__ = (
+        UniqueConstraint('user_id', 'record_date', name='uk_user_date'),
+    )
+    
     class Config:
         from_attributes = True
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, Float, DateTime, Date, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DailyNutritionSummary(Base):
+    """每日营养汇总（由饮食/运动/饮水/睡眠记录增量维护，供趋势和营养分析读取）"""
+    __tablename__ = "daily_nutrition_summary"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="用户ID")
+    record_date = Column(Date, nullable=False, comment="记录日期")
+    
+    # 饮食摄入
+    intake_calories = Column(Float, nullable=False, default=0.0, comment="摄入热量(千卡)")
+    protein = Column(Float, nullable=False, default=0.0, comment="蛋白质(g)")
+    carbs = Column(Float, nullable=False, default=0.0, comment="碳水化合物(g)")
+    fat = Column(Float, nullable=False, default=0.0, comment="脂肪(g)")
+    
+    # 运动消耗
+    exercise_calories = Column(Float, nullable=False, default=0.0, comment="运动消耗热量(千卡)")
+    exercise_duration = Column(Integer, nullable=False, default=0, comment="运动时长(分钟)")
+    
+    # 饮水、睡眠
+    water = Column(Float, nullable=False, default=0.0, comment="饮水量(ml)")
+    sleep_duration = Column(Float, nullable=False, default=0.0, comment="睡眠时长(小时)")
+    
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'record_date', name='uk_user_date'),
+    )
@@ -1,5 +1,5 @@
 """数据同步配置和日志模型"""
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -20,6 +20,7 @@ class DataSyncConfig(Base):
     sync_days = Column(Integer, default=30, nullable=False, comment="自动同步天数（0表示全部数据）")
     sync_yesterday = Column(Boolean, default=False, nullable=False, comment="是否同步昨天数据（True=昨天整天，False=往前推N天）")
     last_sync_time = Column(DateTime, nullable=True, comment="最后同步时间")
+    sync_cursor = Column(BigInteger, nullable=True, comment="增量同步游标（已拉取到的最新数据时间，秒级时间戳）")
     auto_sync_to_local = Column(Boolean, default=False, nullable=False, comment="是否自动同步到本地库")
     sync_weight = Column(Boolean, default=False, nullable=False, comment="同步体重数据")
     sync_sleep = Column(Boolean, default=False, nullable=False, comment="同步睡眠数据")
@@ -44,3 +45,7 @@ class DataSyncLog(Base):
     data_count = Column(Integer, nullable=True, comment="数据条数")
     error_message = Column(Text, nullable=True, comment="错误信息")
     created_at = Column(DateTime, server_default=func.now(), nullable=False, comment="创建时间")
+
+    __table_args__ = (
+        Index('idx_user_created', 'user_id', 'created_at'),
+    )
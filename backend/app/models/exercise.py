@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, Date, ForeignKey, String, Text
+from sqlalchemy import Column, Integer, Float, DateTime, Date, ForeignKey, String, Text, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -18,3 +18,7 @@ class ExerciseRecord(Base):
     record_date = Column(Date, nullable=False, index=True, comment="记录日期")
     created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    __table_args__ = (
+        Index('idx_user_date', 'user_id', 'record_date'),
+    )
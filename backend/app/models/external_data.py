@@ -1,5 +1,6 @@
 """外部数据模型"""
-from sqlalchemy import Column, Integer, String, DateTime, Date, DECIMAL, Text, JSON, Index, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Date, DECIMAL, Text, JSON, Index, Boolean, BINARY, LargeBinary
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -12,7 +13,7 @@ class ExternalSleepRecord(Base):
     user_id = Column(Integer, nullable=False, comment='用户ID')
     data_source = Column(String(50), nullable=False, default='xiaomi_sport', comment='数据来源')
     source_id = Column(String(100), comment='来源数据ID')
-    data_hash = Column(String(64), nullable=False, unique=True, comment='数据哈希值')
+    data_hash = Column(BINARY(16), nullable=False, unique=True, comment='数据标识哈希（防重）')
     sleep_date = Column(Date, nullable=False, comment='睡眠日期')
     start_time = Column(DateTime, nullable=False, comment='入睡时间')
     end_time = Column(DateTime, nullable=False, comment='起床时间')
@@ -22,13 +23,14 @@ class ExternalSleepRecord(Base):
     rem_sleep = Column(Integer, comment='REM睡眠时长（分钟）')
     awake_time = Column(Integer, comment='清醒时长（分钟）')
     sleep_score = Column(Integer, comment='睡眠评分')
-    raw_data = Column(JSON, comment='原始数据')
+    # 旧数据的原始数据，新数据存入 external_raw_data；延迟加载，列表/详情查询不读取
+    raw_data = deferred(Column(JSON, comment='原始数据'))
     is_deleted = Column(Boolean, nullable=False, default=False, comment='逻辑删除标记')
     created_at = Column(DateTime, server_default=func.now(), comment='创建时间')
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment='更新时间')
 
     __table_args__ = (
-        Index('idx_user_date', 'user_id', 'sleep_date'),
+        Index('idx_user_date', 'user_id', 'sleep_date', 'start_time'),
         Index('idx_user_source', 'user_id', 'data_source'),
         Index('idx_is_deleted', 'is_deleted'),
     )
@@ -42,7 +44,7 @@ class ExternalExerciseRecord(Base):
     user_id = Column(Integer, nullable=False, comment='用户ID')
     data_source = Column(String(50), nullable=False, default='xiaomi_sport', comment='数据来源')
     source_id = Column(String(100), comment='来源数据ID')
-    data_hash = Column(String(64), nullable=False, unique=True, comment='数据哈希值')
+    data_hash = Column(BINARY(16), nullable=False, unique=True, comment='数据标识哈希（防重）')
     exercise_date = Column(Date, nullable=False, comment='锻炼日期')
     start_time = Column(DateTime, nullable=False, comment='开始时间')
     end_time = Column(DateTime, nullable=False, comment='结束时间')
@@ -53,13 +55,14 @@ class ExternalExerciseRecord(Base):
     steps = Column(Integer, comment='步数')
     avg_heart_rate = Column(Integer, comment='平均心率')
     max_heart_rate = Column(Integer, comment='最大心率')
-    raw_data = Column(JSON, comment='原始数据')
+    # 旧数据的原始数据，新数据存入 external_raw_data；延迟加载，列表/详情查询不读取
+    raw_data = deferred(Column(JSON, comment='原始数据'))
     is_deleted = Column(Boolean, nullable=False, default=False, comment='逻辑删除标记')
     created_at = Column(DateTime, server_default=func.now(), comment='创建时间')
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment='更新时间')
 
     __table_args__ = (
-        Index('idx_user_date', 'user_id', 'exercise_date'),
+        Index('idx_user_date', 'user_id', 'exercise_date', 'start_time'),
         Index('idx_user_source', 'user_id', 'data_source'),
         Index('idx_is_deleted', 'is_deleted'),
     )
@@ -73,7 +76,7 @@ class ExternalWeightRecord(Base):
     user_id = Column(Integer, nullable=False, comment='用户ID')
     data_source = Column(String(50), nullable=False, default='xiaomi_sport', comment='数据来源')
     source_id = Column(String(100), comment='来源数据ID')
-    data_hash = Column(String(64), nullable=False, unique=True, comment='数据哈希值')
+    data_hash = Column(BINARY(16), nullable=False, unique=True, comment='数据标识哈希（防重）')
     measure_date = Column(Date, nullable=False, comment='测量日期')
     measure_time = Column(DateTime, nullable=False, comment='测量时间')
     weight = Column(DECIMAL(5, 2), nullable=False, comment='体重（kg）')
@@ -121,13 +124,14 @@ class ExternalWeightRecord(Base):
     upper_limb_fat_balance = Column(Integer, comment='上肢脂肪平衡')
     upper_limb_muscle_balance = Column(Integer, comment='上肢肌肉平衡')
     note = Column(String(500), comment='备注')
-    raw_data = Column(JSON, comment='原始数据')
+    # 旧数据的原始数据，新数据存入 external_raw_data；延迟加载，列表/详情查询不读取
+    raw_data = deferred(Column(JSON, comment='原始数据'))
     is_deleted = Column(Boolean, nullable=False, default=False, comment='逻辑删除标记')
     created_at = Column(DateTime, server_default=func.now(), comment='创建时间')
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment='更新时间')
 
     __table_args__ = (
-        Index('idx_user_date', 'user_id', 'measure_date'),
+        Index('idx_user_date', 'user_id', 'measure_date', 'measure_time'),
         Index('idx_user_source', 'user_id', 'data_source'),
         Index('idx_is_deleted', 'is_deleted'),
     )
@@ -141,13 +145,14 @@ class ExternalStepRecord(Base):
     user_id = Column(Integer, nullable=False, comment='用户ID')
     data_source = Column(String(50), nullable=False, default='xiaomi_sport', comment='数据来源')
     source_id = Column(String(100), comment='来源数据ID')
-    data_hash = Column(String(64), nullable=False, unique=True, comment='数据哈希值')
+    data_hash = Column(BINARY(16), nullable=False, unique=True, comment='数据标识哈希（防重）')
     step_date = Column(Date, nullable=False, comment='步数日期')
     steps = Column(Integer, nullable=False, comment='步数')
     distance = Column(DECIMAL(10, 2), comment='距离（米）')
     calories = Column(Integer, comment='消耗卡路里')
     active_time = Column(Integer, comment='活跃时长（分钟）')
-    raw_data = Column(JSON, comment='原始数据')
+    # 旧数据的原始数据，新数据存入 external_raw_data；延迟加载，列表/详情查询不读取
+    raw_data = deferred(Column(JSON, comment='原始数据'))
     is_deleted = Column(Boolean, nullable=False, default=False, comment='逻辑删除标记')
     created_at = Column(DateTime, server_default=func.now(), comment='创建时间')
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment='更新时间')
@@ -157,3 +162,13 @@ class ExternalStepRecord(Base):
         Index('idx_user_source', 'user_id', 'data_source'),
         Index('idx_is_deleted', 'is_deleted'),
     )
+
+
+class ExternalRawData(Base):
+    """外部数据-原始数据归档（zlib 压缩的 JSON，按数据类型和 data_hash 对应记录）"""
+    __tablename__ = "external_raw_data"
+
+    data_type = Column(String(20), primary_key=True, comment='数据类型（sleep/exercise/weight/steps）')
+    data_hash = Column(BINARY(16), primary_key=True, comment='对应记录的数据标识哈希')
+    payload = deferred(Column(LargeBinary(16777215), nullable=False, comment='压缩后的原始数据'))
+    created_at = Column(DateTime, server_default=func.now(), comment='创建时间')
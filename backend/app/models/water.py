@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, Date, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, Date, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -11,3 +11,7 @@ class WaterRecord(Base):
     amount = Column(Float, nullable=False, comment="饮水量(ml)")
     record_date = Column(Date, nullable=False, index=True, comment="记录日期")
     created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
+
+    __table_args__ = (
+        Index('idx_user_date', 'user_id', 'record_date'),
+    )
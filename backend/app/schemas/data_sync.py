@@ -38,6 +38,7 @@ class DataSyncConfigResponse(DataSyncConfigBase):
     id: int
     user_id: int
     last_sync_time: Optional[datetime] = None
+    sync_cursor: Optional[int] = Field(None, description="增量同步游标（已拉取到的最新数据时间，秒级时间戳）")
     created_at: datetime
     updated_at: datetime
 
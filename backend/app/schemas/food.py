@@ -1,5 +1,5 @@
-from pydantic import BaseModel, validator
-from typing import Optional
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime
 
@@ -52,3 +52,9 @@ class FoodNutritionResponse(FoodNutritionBase):
     
     class Config:
         from_attributes = True
+
+
+class FoodBatchRequest(BaseModel):
+    """批量查询食物"""
+    ids: List[int] = Field(default_factory=list, max_length=200)
+    external_ids: List[str] = Field(default_factory=list, max_length=200)
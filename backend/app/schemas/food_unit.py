@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class FoodUnitBase(BaseModel):
@@ -48,3 +48,21 @@ class FoodUnitRecordResponse(FoodUnitRecordCreate):
 
     class Config:
         from_attributes = True
+
+
+class FoodUnitFoodKey(BaseModel):
+    """批量查询单位时的食物标识"""
+    food_id: int = Field(..., description="食物ID")
+    source_type: Optional[str] = Field(default="local", description="食物来源类型（local=本地食物库，online=在线食物库）")
+
+
+class FoodUnitBatchRequest(BaseModel):
+    """批量获取多个食物的自定义单位"""
+    foods: List[FoodUnitFoodKey] = Field(..., max_length=200, description="食物列表")
+
+
+class FoodUnitGroup(BaseModel):
+    """某个食物的自定义单位"""
+    food_id: int
+    source_type: str
+    units: List[FoodUnitResponse]
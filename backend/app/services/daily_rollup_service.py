@@ -0,0 +1,237 @@
+"""
+每日历史汇总（DailyHistory）增量重算服务
+
+写入饮食/运动/体重/饮水/睡眠记录时只在 Redis 中标记 (user_id, date) 为"脏"，
+由后台定时任务合并一段时间内的写入，每个脏日期只重算一次：
+- 一批脏日期只用一条 UNION ALL 查询读取所有子表数据
+- 一次查询取出已有的历史记录，统一 upsert 后单次提交
+
+这样小米导入90天数据只触发一次批量汇总，交互式写入也不用等待汇总完成。
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, String, literal, null, select, tuple_, type_coerce, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.models.daily_history import DailyHistory
+from app.models.diet import DietRecord
+from app.models.exercise import ExerciseRecord
+from app.models.water import WaterRecord
+from app.models.weight import WeightRecord
+from app.services.home_overview_service import invalidate_home_overview
+from app.services.nutrition_summary_service import refresh_nutrition_summaries
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+DIRTY_KEY = "daily_rollup:dirty"  # ZSET，member = "{user_id}:{date}"，score = 首次标记时间
+
+DayKey = Tuple[int, date]
+
+
+def _member(user_id: int, record_date: date) -> str:
+    return f"{user_id}:{record_date.isoformat()}"
+
+
+def _parse_member(member: str) -> DayKey:
+    user_id, date_str = member.split(":", 1)
+    return int(user_id), date.fromisoformat(date_str)
+
+
+def mark_daily_history_dirty(db: Session, user_id: int, record_date: date):
+    """标记某用户某天的历史数据待重算"""
+    mark_daily_history_dirty_many(db, user_id, [record_date])
+
+
+def mark_daily_history_dirty_many(db: Session, user_id: int, record_dates: Iterable[date]):
+    """
+    批量标记待重算日期（一次 Redis 往返）
+
+    ZADD NX 保留首次标记时间，后台任务在防抖时间过后统一处理，持续写入也不会无限推迟汇总。
+    Redis 不可用时退化为同步重算，保证历史数据不丢失。
+    """
+    keys = [(user_id, d) for d in set(record_dates)]
+    if not keys:
+        return
+    # 同步刷新每日营养汇总（趋势/营养分析直接读取，需要立即可见）
+    try:
+        refresh_nutrition_summaries(db, keys)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"刷新营养汇总失败: user_id={user_id}, {e}")
+    # 子表数据变化同时影响首页概览（今日数据、进度、热量趋势）
+    invalidate_home_overview(user_id)
+
+    try:
+        now = time.time()
+        get_redis().zadd(DIRTY_KEY, {_member(u, d): now for u, d in keys}, nx=True)
+    except Exception as e:
+        logger.warning(f"标记历史汇总失败，改为同步重算: {e}")
+        recalculate_daily_history(db, keys)
+
+
+def flush_dirty_days(db: Session, limit: Optional[int] = None) -> int:
+    """
+    处理已过防抖时间的脏日期
+
+    ZREM 返回 1 表示由当前进程认领，多个 worker 同时执行时不会重复计算。
+    重算失败的日期重新放回脏集合，等待下一轮。
+
+    :return: 本次重算的天数
+    """
+    redis_client = get_redis()
+    deadline = time.time() - settings.DAILY_ROLLUP_DEBOUNCE_SECONDS
+    members = redis_client.zrangebyscore(
+        DIRTY_KEY, 0, deadline,
+        start=0, num=limit or settings.DAILY_ROLLUP_BATCH_SIZE
+    )
+    if not members:
+        return 0
+
+    pipe = redis_client.pipeline(transaction=False)
+    for member in members:
+        pipe.zrem(DIRTY_KEY, member)
+    claimed = [m for m, removed in zip(members, pipe.execute()) if removed]
+    if not claimed:
+        return 0
+
+    try:
+        recalculate_daily_history(db, [_parse_member(m) for m in claimed])
+    except Exception:
+        db.rollback()
+        redis_client.zadd(DIRTY_KEY, {m: time.time() for m in claimed}, nx=True)
+        raise
+
+    return len(claimed)
+
+
+def _null(type_):
+    """类型化的 NULL 占位列（不生成 CAST，MySQL 不支持 CAST AS FLOAT）"""
+    return type_coerce(null(), type_)
+
+
+def _child_rows_query(keys: List[DayKey]):
+    """构造一次读取所有子表数据的 UNION ALL 查询（列对齐后按表、id 排序）"""
+    def day_filter(model):
+        return tuple_(model.user_id, model.record_date).in_(keys)
+
+    diet = select(
+        literal("diet").label("kind"), DietRecord.id, DietRecord.user_id, DietRecord.record_date,
+        DietRecord.meal_type.label("meal_type"), DietRecord.food_name.label("name"),
+        DietRecord.portion.label("portion"), DietRecord.calories.label("calories"),
+        _null(Integer).label("duration"),
+        _null(Float).label("morning_weight"), _null(Float).label("evening_weight"),
+        _null(String).label("note"), _null(Float).label("amount")
+    ).where(day_filter(DietRecord))
+
+    exercise = select(
+        literal("exercise"), ExerciseRecord.id, ExerciseRecord.user_id, ExerciseRecord.record_date,
+        _null(String), ExerciseRecord.exercise_type,
+        _null(String), ExerciseRecord.calories,
+        ExerciseRecord.duration,
+        _null(Float), _null(Float),
+        _null(String), _null(Float)
+    ).where(day_filter(ExerciseRecord))
+
+    weight = select(
+        literal("weight"), WeightRecord.id, WeightRecord.user_id, WeightRecord.record_date,
+        _null(String), _null(String),
+        _null(String), _null(Float),
+        _null(Integer),
+        WeightRecord.morning_weight, WeightRecord.evening_weight,
+        WeightRecord.note, _null(Float)
+    ).where(day_filter(WeightRecord))
+
+    water = select(
+        literal("water"), WaterRecord.id, WaterRecord.user_id, WaterRecord.record_date,
+        _null(String), _null(String),
+        _null(String), _null(Float),
+        _null(Integer),
+        _null(Float), _null(Float),
+        _null(String), WaterRecord.amount
+    ).where(day_filter(WaterRecord))
+
+    rows = union_all(diet, exercise, weight, water).subquery()
+    return select(rows).order_by(rows.c.kind, rows.c.id)
+
+
+def _diet_label(row) -> str:
+    return f"{row.name} {row.portion if row.portion else ''} {int(row.calories)}大卡".strip()
+
+
+def summarize_day(rows) -> Dict[str, object]:
+    """把某一天的子表数据汇总为 DailyHistory 字段"""
+    meals: Dict[str, List[str]] = {"breakfast": [], "lunch": [], "dinner": []}
+    exercise_list: List[str] = []
+    morning_weight = None
+    evening_weight = None
+    note = ""
+    total_water = 0.0
+
+    for row in rows:
+        if row.kind == "diet":
+            if row.meal_type in meals:
+                meals[row.meal_type].append(_diet_label(row))
+        elif row.kind == "exercise":
+            exercise_list.append(f"{row.name} {row.duration}分钟 {int(row.calories)}大卡")
+        elif row.kind == "weight":
+            if row.morning_weight:
+                morning_weight = row.morning_weight
+            if row.evening_weight:
+                evening_weight = row.evening_weight
+            if row.note:
+                note = row.note
+        elif row.kind == "water":
+            total_water += row.amount or 0
+
+    return {
+        "breakfast": ' + '.join(meals["breakfast"]) if meals["breakfast"] else "无",
+        "lunch": ' + '.join(meals["lunch"]) if meals["lunch"] else "无",
+        "dinner": ' + '.join(meals["dinner"]) if meals["dinner"] else "无",
+        "exercise": ' + '.join(exercise_list) if exercise_list else "无",
+        "morning_weight": morning_weight,
+        "evening_weight": evening_weight,
+        "water": f"{total_water / 1000:.1f}L" if total_water > 0 else "0L",
+        "note": note,
+    }
+
+
+def recalculate_daily_history(db: Session, keys: List[DayKey]) -> Dict[DayKey, DailyHistory]:
+    """
+    同步重算一批 (user_id, date) 的历史数据并提交
+
+    :return: 每个日期对应的 DailyHistory 对象
+    """
+    keys = list(set(keys))
+    if not keys:
+        return {}
+
+    rows_by_day = defaultdict(list)
+    for row in db.execute(_child_rows_query(keys)):
+        rows_by_day[(row.user_id, row.record_date)].append(row)
+
+    histories = {
+        (h.user_id, h.record_date): h
+        for h in db.query(DailyHistory).filter(
+            tuple_(DailyHistory.user_id, DailyHistory.record_date).in_(keys)
+        ).all()
+    }
+
+    for user_id, record_date in keys:
+        history = histories.get((user_id, record_date))
+        if history is None:
+            history = DailyHistory(user_id=user_id, record_date=record_date)
+            db.add(history)
+            histories[(user_id, record_date)] = history
+
+        for field, value in summarize_day(rows_by_day.get((user_id, record_date), [])).items():
+            setattr(history, field, value)
+
+    db.commit()
+    return histories
@@ -1,9 +1,9 @@
 """数据同步服务 - 整合数据拉取、存储和Redis锁"""
-import json
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from app.core.redis import get_redis
 from app.models.data_sync import DataSyncLog, DataSyncConfig
 from app.models.user_settings import UserSettings
@@ -15,9 +15,15 @@ from app.models.external_data import (
 )
 from app.models.auth_management import AuthManagement
 from app.services.xiaomi_data_sync import XiaomiDataSyncService
+from app.services.xiaomi_async_sync import AsyncXiaomiDataSyncService
+from app.core.config import get_settings
 from app.utils.exercise_types import XIAOMI_EXERCISE_TYPE_MAP
+from app.utils.data_hash import compute_data_hash
+from app.services.external_raw_store import archive_raw_payloads
 import base64
 
+settings = get_settings()
+
 
 class DataSyncService:
     """数据同步服务"""
@@ -91,8 +97,23 @@ class DataSyncService:
                 log.error_message = error_message
             self.db.commit()
     
-    def _get_xiaomi_sync_service(self, user_id: int) -> Optional[XiaomiDataSyncService]:
-        """获取小米数据同步服务实例"""
+    def update_sync_progress(self, log_id: int, data_count: int):
+        """更新同步进度（运行中的日志的已入库条数）"""
+        self.db.query(DataSyncLog).filter(DataSyncLog.id == log_id).update(
+            {DataSyncLog.data_count: data_count},
+            synchronize_session=False
+        )
+        self.db.commit()
+    
+    def _get_xiaomi_sync_service(
+        self,
+        user_id: int,
+        concurrent: bool = False
+    ) -> Optional[XiaomiDataSyncService]:
+        """
+        获取小米数据同步服务实例
+        :param concurrent: 是否返回按时间窗口并发拉取的异步实现
+        """
         # 查询用户的小米运动健康授权信息
         auth = self.db.query(AuthManagement).filter(
             and_(
@@ -105,6 +126,14 @@ class DataSyncService:
         if not auth or not auth.token or not auth.ssecurity:
             return None
         
+        if concurrent:
+            # 异步实现在后台线程中刷新token，使用自己的数据库会话，不能共用 self.db
+            return AsyncXiaomiDataSyncService(
+                token=auth.token,
+                ssecurity=auth.ssecurity,
+                cookies=auth.cookies or "",
+                auth_id=auth.id
+            )
         return XiaomiDataSyncService(
             token=auth.token,
             ssecurity=auth.ssecurity,
@@ -113,318 +142,213 @@ class DataSyncService:
             db_session=self.db  # 传入db会话用于token刷新
         )
     
-    def _save_sleep_records(self, user_id: int, records: list) -> int:
-        """保存睡眠记录（批量处理）"""
-        if not records:
-            return 0
-        
-        # 批量查询已存在的data_hash（包括已删除的）
-        data_hashes = [r.get('data_hash') for r in records]
-        existing_hashes = set(
-            row[0] for row in self.db.query(ExternalSleepRecord.data_hash)
-            .filter(ExternalSleepRecord.data_hash.in_(data_hashes))
-            .all()
-        )
-        
-        # 批量准备要插入的数据
-        batch_size = 3000
-        total_count = 0
-        new_records = []
+    def _get_sync_config(self, user_id: int, data_source: str, data_type: str) -> Optional[DataSyncConfig]:
+        """获取同步配置（手动同步时可能没有配置）"""
+        return self.db.query(DataSyncConfig).filter(
+            DataSyncConfig.user_id == user_id,
+            DataSyncConfig.data_source == data_source,
+            DataSyncConfig.data_type == data_type
+        ).first()
+    
+    def _advance_sync_cursor(self, config: DataSyncConfig, start_time: datetime, latest: Optional[int]):
+        """
+        把同步游标推进到本次拉取到的最新数据时间（接口返回的 time 字段）
         
-        for record in records:
-            try:
-                # 跳过已存在的记录（包括已删除的，保持删除状态）
-                if record.get('data_hash') in existing_hashes:
-                    continue
-                
-                # 使用bedtime作为睡眠开始时间（秒级时间戳）
-                start_time = datetime.fromtimestamp(record.get('bedtime', 0))
-                # 使用wake_up_time作为睡眠结束时间（秒级时间戳）
-                end_time = datetime.fromtimestamp(record.get('wake_up_time', 0))
-                
-                # 解析数据
-                sleep_data = ExternalSleepRecord(
-                    user_id=user_id,
-                    data_source="xiaomi_sport",
-                    data_hash=record.get('data_hash'),
-                    sleep_date=start_time.date(),
-                    start_time=start_time,
-                    end_time=end_time,
-                    total_duration=record.get('duration', 0),  # 已经是分钟
-                    deep_sleep=record.get('sleep_deep_duration', 0),
-                    light_sleep=record.get('sleep_light_duration', 0),
-                    rem_sleep=record.get('sleep_rem_duration', 0),
-                    awake_time=record.get('sleep_awake_duration', 0),
-                    sleep_score=0,  # 小米睡眠数据中没有睡眠分数
-                    raw_data=json.dumps(record)
-                )
-                new_records.append(sleep_data)
-                
-                # 达到批量大小，执行批量插入
-                if len(new_records) >= batch_size:
-                    self.db.bulk_save_objects(new_records)
-                    self.db.commit()
-                    total_count += len(new_records)
-                    print(f"已批量保存 {len(new_records)} 条睡眠记录")
-                    new_records = []
-                    
-            except Exception as e:
-                print(f"处理睡眠记录失败: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
+        只有本次时间范围与游标相接时才推进：如果游标落在本次范围之前（例如手动同步了最近几天），
+        两者之间的数据还没有拉取过，推进游标会让增量同步跳过这一段。
+        """
+        if latest is None:
+            return
+        cursor = config.sync_cursor
+        if cursor and start_time.timestamp() > cursor:
+            return
+        latest = min(latest, int(datetime.now().timestamp()))
+        if not cursor or latest > cursor:
+            config.sync_cursor = latest  # type: ignore
+    
+    def _bulk_insert_new(self, model, rows: List[Dict]) -> int:
+        """
+        多行 INSERT ... ON DUPLICATE KEY UPDATE id = id 批量写入
         
-        # 保存剩余的记录
-        if new_records:
-            self.db.bulk_save_objects(new_records)
+        data_hash 有唯一约束，已存在的行（包括已逻辑删除的，保持删除状态）只在键冲突时跳过；
+        与 INSERT IGNORE 不同，截断、非法值、NOT NULL 等数据错误仍会报错，不会被静默改写后入库。
+        驱动开启了 CLIENT_FOUND_ROWS，键冲突的行也计入影响行数，插入条数改为写入前按 data_hash 查询已有行计算。
+        :return: 新插入的行数（并发同步同一批数据时可能略有偏差）
+        """
+        inserted = 0
+        batch_size = settings.EXTERNAL_INSERT_BATCH_SIZE
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            hashes = {row["data_hash"] for row in batch}
+            existing = set(self.db.execute(
+                select(model.data_hash).where(model.data_hash.in_(hashes))
+            ).scalars())
+            self.db.execute(mysql_insert(model).values(batch).on_duplicate_key_update(id=model.id))
             self.db.commit()
-            total_count += len(new_records)
-            print(f"已批量保存 {len(new_records)} 条睡眠记录")
-        
-        return total_count
+            inserted += len(hashes - existing)
+        return inserted
     
-    def _save_exercise_records(self, user_id: int, records: list) -> int:
-        """保存运动记录（批量处理）"""
+    def _save_records(self, model, build_row, user_id: int, records: list, data_type: str, label: str) -> int:
+        """把记录转换为行后批量写入，单条转换失败时跳过；原始数据压缩后单独归档"""
         if not records:
             return 0
         
-        # 批量查询已存在的data_hash（包括已删除的）
-        data_hashes = [r.get('data_hash') for r in records]
-        existing_hashes = set(
-            row[0] for row in self.db.query(ExternalExerciseRecord.data_hash)
-            .filter(ExternalExerciseRecord.data_hash.in_(data_hashes))
-            .all()
-        )
-        
-        # 批量准备要插入的数据
-        batch_size = 3000
-        total_count = 0
-        new_records = []
-        
+        rows = []
+        payloads = []
         for record in records:
             try:
-                # 跳过已存在的记录（包括已删除的，保持删除状态）
-                if record.get('data_hash') in existing_hashes:
-                    continue
-                
-                # 使用start_time和end_time，如果没有end_time则根据duration计算
-                start_timestamp = record.get('start_time', record.get('time', 0))
-                duration_seconds = record.get('duration', 0)
-                end_timestamp = record.get('end_time', start_timestamp + duration_seconds)
-                
-                # 获取运动类型（英文）并转换为中文
-                category = record.get('category', '')
-                exercise_type_cn = XIAOMI_EXERCISE_TYPE_MAP.get(category, category)  # 如果找不到映射，保留原始值
-                
-                exercise_data = ExternalExerciseRecord(
-                    user_id=user_id,
-                    data_source="xiaomi_sport",
-                    data_hash=record.get('data_hash'),
-                    exercise_date=datetime.fromtimestamp(start_timestamp).date(),
-                    start_time=datetime.fromtimestamp(start_timestamp),
-                    end_time=datetime.fromtimestamp(end_timestamp),
-                    exercise_type=exercise_type_cn,  # 使用中文类型
-                    duration=duration_seconds // 60,  # 转换为分钟
-                    distance=record.get('distance', 0),  # 已经是米
-                    calories=record.get('calories', 0),
-                    steps=record.get('steps', 0),
-                    avg_heart_rate=record.get('avg_hrm', 0),  # 小米用avg_hrm
-                    max_heart_rate=record.get('max_hrm', 0),  # 小米用max_hrm
-                    raw_data=json.dumps(record)
-                )
-                new_records.append(exercise_data)
-                
-                # 达到批量大小，执行批量插入
-                if len(new_records) >= batch_size:
-                    self.db.bulk_save_objects(new_records)
-                    self.db.commit()
-                    total_count += len(new_records)
-                    print(f"已批量保存 {len(new_records)} 条运动记录")
-                    new_records = []
-                    
+                row = build_row(user_id, record)
             except Exception as e:
-                print(f"处理运动记录失败: {e}")
-                import traceback
-                traceback.print_exc()
+                print(f"处理{label}记录失败: {e}")
                 continue
+            rows.append(row)
+            payloads.append((row['data_hash'], record))
         
-        # 保存剩余的记录
-        if new_records:
-            self.db.bulk_save_objects(new_records)
-            self.db.commit()
-            total_count += len(new_records)
-            print(f"已批量保存 {len(new_records)} 条运动记录")
-        
-        return total_count
+        # 先归档原始数据再写记录：中途失败时最多留下没有记录对应的原始数据，下次同步时会被跳过
+        archive_raw_payloads(self.db, data_type, payloads)
+        count = self._bulk_insert_new(model, rows)
+        print(f"已批量保存 {count} 条{label}记录（跳过已存在 {len(rows) - count} 条）")
+        return count
     
-    def _save_weight_records(self, user_id: int, records: list) -> int:
-        """保存体重记录（批量处理）"""
-        if not records:
-            return 0
-        
-        # 批量查询已存在的data_hash（包括已删除的）
-        data_hashes = [r.get('data_hash') for r in records]
-        existing_hashes = set(
-            row[0] for row in self.db.query(ExternalWeightRecord.data_hash)
-            .filter(ExternalWeightRecord.data_hash.in_(data_hashes))
-            .all()
+    @staticmethod
+    def _sleep_row(user_id: int, record: Dict) -> Dict:
+        # 使用bedtime作为睡眠开始时间（秒级时间戳）
+        start_time = datetime.fromtimestamp(record.get('bedtime', 0))
+        # 使用wake_up_time作为睡眠结束时间（秒级时间戳）
+        end_time = datetime.fromtimestamp(record.get('wake_up_time', 0))
+        return dict(
+            user_id=user_id,
+            data_source="xiaomi_sport",
+            data_hash=compute_data_hash(user_id, "xiaomi_sport", "sleep", record),
+            sleep_date=start_time.date(),
+            start_time=start_time,
+            end_time=end_time,
+            total_duration=record.get('duration', 0),  # 已经是分钟
+            deep_sleep=record.get('sleep_deep_duration', 0),
+            light_sleep=record.get('sleep_light_duration', 0),
+            rem_sleep=record.get('sleep_rem_duration', 0),
+            awake_time=record.get('sleep_awake_duration', 0),
+            sleep_score=0  # 小米睡眠数据中没有睡眠分数
         )
+    
+    @staticmethod
+    def _exercise_row(user_id: int, record: Dict) -> Dict:
+        # 使用start_time和end_time，如果没有end_time则根据duration计算
+        start_timestamp = record.get('start_time', record.get('time', 0))
+        duration_seconds = record.get('duration', 0)
+        end_timestamp = record.get('end_time', start_timestamp + duration_seconds)
         
-        # 批量准备要插入的数据
-        batch_size = 3000
-        total_count = 0
-        new_records = []
-        
-        for record in records:
-            try:
-                # 跳过已存在的记录
-                if record.get('data_hash') in existing_hashes:
-                    continue
-                
-                # 使用time字段作为测量时间（秒级时间戳）
-                measure_time = datetime.fromtimestamp(record.get('time', 0))
-                
-                weight_data = ExternalWeightRecord(
-                    user_id=user_id,
-                    data_source="xiaomi_sport",
-                    data_hash=record.get('data_hash'),
-                    measure_date=measure_time.date(),
-                    measure_time=measure_time,
-                    # 基础体成分数据
-                    weight=record.get('weight', 0),
-                    bmi=record.get('bmi', 0),
-                    body_fat=record.get('body_fat_rate', 0),
-                    muscle_mass=record.get('muscle_mass', 0),
-                    bone_mass=record.get('bone_mass', 0),
-                    water=record.get('body_moisture_mass', 0),
-                    protein=record.get('protein_mass', 0),
-                    bmr=record.get('basal_metabolism', 0),
-                    visceral_fat=record.get('visceral_fat', 0),
-                    body_age=record.get('body_age', 0),
-                    body_score=record.get('body_score', 0),
-                    heart_rate=record.get('bpm', 0),  # 小米返回的心率字段
-                    whr=record.get('whr', 0),  # 小米返回的腰臀比字段
-                    body_shape=record.get('body_shape'),
-                    fat_mass=record.get('fat_mass', 0),
-                    # 八电极秤数据 - 左下肢
-                    left_lower_limb_fat_mass=record.get('left_lower_limb_fat_mass', 0),
-                    left_lower_limb_fat_rank=record.get('left_lower_limb_fat_rank', 0),
-                    left_lower_limb_muscle_mass=record.get('left_lower_limb_muscle_mass', 0),
-                    left_lower_limb_muscle_rank=record.get('left_lower_limb_muscle_rank', 0),
-                    # 八电极秤数据 - 左上肢
-                    left_upper_limb_fat_mass=record.get('left_upper_limb_fat_mass', 0),
-                    left_upper_limb_fat_rank=record.get('left_upper_limb_fat_rank', 0),
-                    left_upper_limb_muscle_mass=record.get('left_upper_limb_muscle_mass', 0),
-                    left_upper_limb_muscle_rank=record.get('left_upper_limb_muscle_rank', 0),
-                    # 八电极秤数据 - 右下肢
-                    right_lower_limb_fat_mass=record.get('right_lower_limb_fat_mass', 0),
-                    right_lower_limb_fat_rank=record.get('right_lower_limb_fat_rank', 0),
-                    right_lower_limb_muscle_mass=record.get('right_lower_limb_muscle_mass', 0),
-                    right_lower_limb_muscle_rank=record.get('right_lower_limb_muscle_rank', 0),
-                    # 八电极秤数据 - 右上肢
-                    right_upper_limb_fat_mass=record.get('right_upper_limb_fat_mass', 0),
-                    right_upper_limb_fat_rank=record.get('right_upper_limb_fat_rank', 0),
-                    right_upper_limb_muscle_mass=record.get('right_upper_limb_muscle_mass', 0),
-                    right_upper_limb_muscle_rank=record.get('right_upper_limb_muscle_rank', 0),
-                    # 八电极秤数据 - 躯干
-                    trunk_fat_mass=record.get('trunk_fat_mass', 0),
-                    trunk_fat_rank=record.get('trunk_fat_rank', 0),
-                    trunk_muscle_mass=record.get('trunk_muscle_mass', 0),
-                    trunk_muscle_rank=record.get('trunk_muscle_rank', 0),
-                    # 八电极秤数据 - 平衡指标
-                    limbs_fat_balance=record.get('limbs_fat_balance', 0),
-                    limbs_muscle_balance=record.get('limbs_muscle_balance', 0),
-                    limbs_skeletal_muscle_index=record.get('limbs_skeletal_muscle_index', 0),
-                    lower_limb_fat_balance=record.get('lower_limb_fat_balance', 0),
-                    lower_limb_muscle_balance=record.get('lower_limb_muscle_balance', 0),
-                    upper_limb_fat_balance=record.get('upper_limb_fat_balance', 0),
-                    upper_limb_muscle_balance=record.get('upper_limb_muscle_balance', 0),
-                    # 其他指标
-                    recommended_calories_intake=record.get('recommended_calories_intake', 0),
-                    raw_data=json.dumps(record)
-                )
-                new_records.append(weight_data)
-                
-                # 达到批量大小，执行批量插入
-                if len(new_records) >= batch_size:
-                    self.db.bulk_save_objects(new_records)
-                    self.db.commit()
-                    total_count += len(new_records)
-                    print(f"已批量保存 {len(new_records)} 条体重记录")
-                    new_records = []
-                    
-            except Exception as e:
-                print(f"处理体重记录失败: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-        
-        # 保存剩余的记录
-        if new_records:
-            self.db.bulk_save_objects(new_records)
-            self.db.commit()
-            total_count += len(new_records)
-            print(f"已批量保存 {len(new_records)} 条体重记录")
+        # 获取运动类型（英文）并转换为中文
+        category = record.get('category', '')
+        exercise_type_cn = XIAOMI_EXERCISE_TYPE_MAP.get(category, category)  # 如果找不到映射，保留原始值
         
-        return total_count
+        return dict(
+            user_id=user_id,
+            data_source="xiaomi_sport",
+            data_hash=compute_data_hash(user_id, "xiaomi_sport", "exercise", record),
+            exercise_date=datetime.fromtimestamp(start_timestamp).date(),
+            start_time=datetime.fromtimestamp(start_timestamp),
+            end_time=datetime.fromtimestamp(end_timestamp),
+            exercise_type=exercise_type_cn,  # 使用中文类型
+            duration=duration_seconds // 60,  # 转换为分钟
+            distance=record.get('distance', 0),  # 已经是米
+            calories=record.get('calories', 0),
+            steps=record.get('steps', 0),
+            avg_heart_rate=record.get('avg_hrm', 0),  # 小米用avg_hrm
+            max_heart_rate=record.get('max_hrm', 0)  # 小米用max_hrm
+        )
+    
+    @staticmethod
+    def _weight_row(user_id: int, record: Dict) -> Dict:
+        # 使用time字段作为测量时间（秒级时间戳）
+        measure_time = datetime.fromtimestamp(record.get('time', 0))
+        return dict(
+            user_id=user_id,
+            data_source="xiaomi_sport",
+            data_hash=compute_data_hash(user_id, "xiaomi_sport", "weight", record),
+            measure_date=measure_time.date(),
+            measure_time=measure_time,
+            # 基础体成分数据
+            weight=record.get('weight', 0),
+            bmi=record.get('bmi', 0),
+            body_fat=record.get('body_fat_rate', 0),
+            muscle_mass=record.get('muscle_mass', 0),
+            bone_mass=record.get('bone_mass', 0),
+            water=record.get('body_moisture_mass', 0),
+            protein=record.get('protein_mass', 0),
+            bmr=record.get('basal_metabolism', 0),
+            visceral_fat=record.get('visceral_fat', 0),
+            body_age=record.get('body_age', 0),
+            body_score=record.get('body_score', 0),
+            heart_rate=record.get('bpm', 0),  # 小米返回的心率字段
+            whr=record.get('whr', 0),  # 小米返回的腰臀比字段
+            body_shape=record.get('body_shape'),
+            fat_mass=record.get('fat_mass', 0),
+            # 八电极秤数据 - 左下肢
+            left_lower_limb_fat_mass=record.get('left_lower_limb_fat_mass', 0),
+            left_lower_limb_fat_rank=record.get('left_lower_limb_fat_rank', 0),
+            left_lower_limb_muscle_mass=record.get('left_lower_limb_muscle_mass', 0),
+            left_lower_limb_muscle_rank=record.get('left_lower_limb_muscle_rank', 0),
+            # 八电极秤数据 - 左上肢
+            left_upper_limb_fat_mass=record.get('left_upper_limb_fat_mass', 0),
+            left_upper_limb_fat_rank=record.get('left_upper_limb_fat_rank', 0),
+            left_upper_limb_muscle_mass=record.get('left_upper_limb_muscle_mass', 0),
+            left_upper_limb_muscle_rank=record.get('left_upper_limb_muscle_rank', 0),
+            # 八电极秤数据 - 右下肢
+            right_lower_limb_fat_mass=record.get('right_lower_limb_fat_mass', 0),
+            right_lower_limb_fat_rank=record.get('right_lower_limb_fat_rank', 0),
+            right_lower_limb_muscle_mass=record.get('right_lower_limb_muscle_mass', 0),
+            right_lower_limb_muscle_rank=record.get('right_lower_limb_muscle_rank', 0),
+            # 八电极秤数据 - 右上肢
+            right_upper_limb_fat_mass=record.get('right_upper_limb_fat_mass', 0),
+            right_upper_limb_fat_rank=record.get('right_upper_limb_fat_rank', 0),
+            right_upper_limb_muscle_mass=record.get('right_upper_limb_muscle_mass', 0),
+            right_upper_limb_muscle_rank=record.get('right_upper_limb_muscle_rank', 0),
+            # 八电极秤数据 - 躯干
+            trunk_fat_mass=record.get('trunk_fat_mass', 0),
+            trunk_fat_rank=record.get('trunk_fat_rank', 0),
+            trunk_muscle_mass=record.get('trunk_muscle_mass', 0),
+            trunk_muscle_rank=record.get('trunk_muscle_rank', 0),
+            # 八电极秤数据 - 平衡指标
+            limbs_fat_balance=record.get('limbs_fat_balance', 0),
+            limbs_muscle_balance=record.get('limbs_muscle_balance', 0),
+            limbs_skeletal_muscle_index=record.get('limbs_skeletal_muscle_index', 0),
+            lower_limb_fat_balance=record.get('lower_limb_fat_balance', 0),
+            lower_limb_muscle_balance=record.get('lower_limb_muscle_balance', 0),
+            upper_limb_fat_balance=record.get('upper_limb_fat_balance', 0),
+            upper_limb_muscle_balance=record.get('upper_limb_muscle_balance', 0),
+            # 其他指标
+            recommended_calories_intake=record.get('recommended_calories_intake', 0)
+        )
+    
+    @staticmethod
+    def _step_row(user_id: int, record: Dict) -> Dict:
+        return dict(
+            user_id=user_id,
+            data_source="xiaomi_sport",
+            data_hash=compute_data_hash(user_id, "xiaomi_sport", "steps", record),
+            step_date=datetime.fromtimestamp(record.get('date', 0) / 1000).date(),
+            steps=record.get('step', 0),
+            distance=record.get('distance', 0),
+            calories=record.get('calories', 0),
+            active_time=record.get('ttm', 0) // 60
+        )
+    
+    def _save_sleep_records(self, user_id: int, records: list) -> int:
+        """保存睡眠记录（批量处理）"""
+        return self._save_records(ExternalSleepRecord, self._sleep_row, user_id, records, "sleep", "睡眠")
+    
+    def _save_exercise_records(self, user_id: int, records: list) -> int:
+        """保存运动记录（批量处理）"""
+        return self._save_records(ExternalExerciseRecord, self._exercise_row, user_id, records, "exercise", "运动")
+    
+    def _save_weight_records(self, user_id: int, records: list) -> int:
+        """保存体重记录（批量处理）"""
+        return self._save_records(ExternalWeightRecord, self._weight_row, user_id, records, "weight", "体重")
     
     def _save_step_records(self, user_id: int, records: list) -> int:
         """保存步数记录（批量处理）"""
-        if not records:
-            return 0
-        
-        # 批量查询已存在的data_hash（包括已删除的）
-        data_hashes = [r.get('data_hash') for r in records]
-        existing_hashes = set(
-            row[0] for row in self.db.query(ExternalStepRecord.data_hash)
-            .filter(ExternalStepRecord.data_hash.in_(data_hashes))
-            .all()
-        )
-        
-        # 批量准备要插入的数据
-        batch_size = 3000
-        total_count = 0
-        new_records = []
-        
-        for record in records:
-            try:
-                # 跳过已存在的记录（包括已删除的，保持删除状态）
-                if record.get('data_hash') in existing_hashes:
-                    continue
-                
-                step_data = ExternalStepRecord(
-                    user_id=user_id,
-                    data_source="xiaomi_sport",
-                    data_hash=record.get('data_hash'),
-                    step_date=datetime.fromtimestamp(record.get('date', 0) / 1000).date(),
-                    steps=record.get('step', 0),
-                    distance=record.get('distance', 0),
-                    calories=record.get('calories', 0),
-                    active_time=record.get('ttm', 0) // 60,
-                    raw_data=json.dumps(record)
-                )
-                new_records.append(step_data)
-                
-                # 达到批量大小，执行批量插入
-                if len(new_records) >= batch_size:
-                    self.db.bulk_save_objects(new_records)
-                    self.db.commit()
-                    total_count += len(new_records)
-                    print(f"已批量保存 {len(new_records)} 条步数记录")
-                    new_records = []
-                    
-            except Exception as e:
-                print(f"处理步数记录失败: {e}")
-                continue
-        
-        # 保存剩余的记录
-        if new_records:
-            self.db.bulk_save_objects(new_records)
-            self.db.commit()
-            total_count += len(new_records)
-            print(f"已批量保存 {len(new_records)} 条步数记录")
-        
-        return total_count
+        return self._save_records(ExternalStepRecord, self._step_row, user_id, records, "steps", "步数")
     
     def sync_data(
         self,
@@ -433,7 +357,8 @@ class DataSyncService:
         data_type: str,
         sync_type: str = "manual",
         days: int = 30,
-        sync_yesterday: bool = False
+        sync_yesterday: bool = False,
+        incremental: bool = False
     ) -> Dict:
         """
         同步数据
@@ -443,6 +368,7 @@ class DataSyncService:
         :param sync_type: 同步类型（manual/auto）
         :param days: 同步最近多少天的数据，0表示全部数据
         :param sync_yesterday: 是否同步昨天数据（True=昨天整天，False=往前推N天）
+        :param incremental: 是否增量同步（从同步游标减去重叠时间开始，不早于上面计算的时间范围）
         :return: 同步结果
         """
         # 检查是否正在同步
@@ -465,10 +391,6 @@ class DataSyncService:
         try:
             # 获取小米数据同步服务
             if data_source == "xiaomi_sport":
-                sync_service = self._get_xiaomi_sync_service(user_id)
-                if not sync_service:
-                    raise Exception("未找到小米运动健康授权信息或授权未验证")
-                
                 # 计算时间范围
                 if sync_yesterday:
                     # 同步昨天的数据（昨天00:00:00 到 昨天23:59:59）
@@ -485,33 +407,59 @@ class DataSyncService:
                     end_time = datetime.now()
                     start_time = end_time - timedelta(days=days)
                 
-                # 根据数据类型调用不同的方法
-                if data_type == "sleep":
-                    records = sync_service.get_sleep_records(start_time, end_time)
-                    count = self._save_sleep_records(user_id, records)
-                elif data_type == "exercise":
-                    records = sync_service.get_exercise_records(start_time, end_time)
-                    count = self._save_exercise_records(user_id, records)
-                elif data_type == "weight":
-                    records = sync_service.get_weight_records(start_time, end_time)
-                    count = self._save_weight_records(user_id, records)
-                elif data_type == "steps":
-                    records = sync_service.get_step_records(start_time, end_time)
-                    count = self._save_step_records(user_id, records)
-                else:
+                config = self._get_sync_config(user_id, data_source, data_type)
+                range_start = start_time
+                if incremental and config and config.sync_cursor:
+                    # 已拉取到的最新数据之前的部分不再重复下载，只保留一小段重叠以接住延迟上传的数据
+                    cursor_start = datetime.fromtimestamp(
+                        max(config.sync_cursor - settings.SYNC_CURSOR_OVERLAP_SECONDS, 1)
+                    )
+                    start_time = max(start_time, cursor_start)
+                
+                savers = {
+                    "sleep": self._save_sleep_records,
+                    "exercise": self._save_exercise_records,
+                    "weight": self._save_weight_records,
+                    "steps": self._save_step_records,
+                }
+                if data_type not in savers:
                     raise Exception(f"不支持的数据类型: {data_type}")
                 
+                # 超过一个窗口的时间范围（如首次全量同步）切分窗口并发拉取
+                concurrent = end_time - start_time > timedelta(days=settings.XIAOMI_SYNC_WINDOW_DAYS)
+                sync_service = self._get_xiaomi_sync_service(user_id, concurrent=concurrent)
+                if not sync_service:
+                    raise Exception("未找到小米运动健康授权信息或授权未验证")
+                
+                # 逐页拉取、逐页入库，内存占用只与单页大小有关
+                if start_time > end_time:
+                    # 游标已越过本次时间范围（如按昨天同步时今天已同步过）
+                    pages = iter(())
+                elif concurrent:
+                    pages = sync_service.iter_pages_blocking(data_type, start_time, end_time)
+                else:
+                    pages = sync_service.iter_record_pages(data_type, start_time, end_time)
+                
+                count = 0
+                latest = None
+                try:
+                    for page_no, records in enumerate(pages, 1):
+                        count += savers[data_type](user_id, records)
+                        page_latest = max((int(r['source_id']) for r in records if r.get('source_id')), default=None)
+                        if page_latest is not None and (latest is None or page_latest > latest):
+                            latest = page_latest
+                        self.update_sync_progress(log.id, count)
+                        print(f"同步进度: 第{page_no}页 {len(records)} 条，累计新增 {count} 条")
+                finally:
+                    sync_service.close()
+                
                 # 更新同步日志为成功
                 self.update_sync_log(log.id, "success", count)
                 
-                # 更新配置的最后同步时间
-                config = self.db.query(DataSyncConfig).filter(
-                    DataSyncConfig.user_id == user_id,
-                    DataSyncConfig.data_source == data_source,
-                    DataSyncConfig.data_type == data_type
-                ).first()
+                # 更新配置的最后同步时间和同步游标
                 if config:
                     config.last_sync_time = datetime.now()  # type: ignore
+                    self._advance_sync_cursor(config, start_time, latest)
                     self.db.commit()
                 
                 # 统一读取【个人设置】决定是否自动同步到本地
@@ -540,7 +488,9 @@ class DataSyncService:
                         local_sync_count = sync_exercise_to_local(user_id, self.db, start_time, end_time)
                         print(f"已同步 {local_sync_count} 条运动数据到本地库")
                 
-                if sync_yesterday:
+                if start_time > range_start:
+                    sync_range = f"增量，{start_time.strftime('%Y-%m-%d %H:%M')}起"
+                elif sync_yesterday:
                     sync_range = "昨天数据"
                 elif days == 0:
                     sync_range = "全部数据"
@@ -556,6 +506,8 @@ class DataSyncService:
                 raise Exception(f"不支持的数据来源: {data_source}")
         
         except Exception as e:
+            # 入库时的数据错误会让会话处于失败状态，先回滚再写日志
+            self.db.rollback()
             # 更新同步日志为失败
             self.update_sync_log(log.id, "failed", error_message=str(e))
             return {
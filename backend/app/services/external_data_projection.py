@@ -0,0 +1,201 @@
+"""
+外部数据接口的列投影和序列化
+
+外部数据表（尤其是体重，带几十列八电极秤数据）整行加载成 ORM 对象再逐列手写转换，代价主要花在用不到的列上。
+这里为每种数据类型声明列表/详情各自要返回的列：
+- 只 SELECT 需要的列，结果是普通的行元组，不创建 ORM 对象
+- DECIMAL 列转为 float，其余类型原样交给 orjson 序列化
+- 原来手写的 `float(x) if x else None` 字段（同步时缺失的指标写入的是 0，按未测量返回 None）
+  逐个列在 zero_as_none 中，其中包括几个 Integer 列，返回结构与原来保持一致
+"""
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from sqlalchemy import Numeric
+
+from app.models.external_data import (
+    ExternalSleepRecord,
+    ExternalExerciseRecord,
+    ExternalWeightRecord,
+    ExternalStepRecord
+)
+from app.services.keyset_pagination import Keyset
+from app.utils.exercise_types import get_exercise_type_cn
+
+
+class Projection:
+    """只查询指定的列，并按列类型把结果行转换为字典"""
+
+    def __init__(
+        self,
+        model,
+        fields: Sequence[str],
+        zero_as_none: Iterable[str] = (),
+        extras: Sequence[Tuple[str, str, Callable[[dict], object]]] = ()
+    ):
+        """
+        :param fields: 返回的列（按顺序）
+        :param zero_as_none: 转为 float 且 0 视为未测量、返回 None 的列
+        :param extras: 附加字段 (名称, 放在哪一列之后, 根据已转换的字典计算值)
+        """
+        self.model = model
+        self.fields = tuple(fields)
+        self.columns = [getattr(model, field) for field in self.fields]
+        zero_as_none = set(zero_as_none)
+        unknown = zero_as_none - set(self.fields)
+        if unknown:
+            raise ValueError(f"zero_as_none 中的列不在返回列中: {sorted(unknown)}")
+        table = model.__table__
+        self._zero_as_none_fields = tuple(field for field in self.fields if field in zero_as_none)
+        self._decimal_fields = tuple(
+            field for field in self.fields
+            if field not in zero_as_none and isinstance(table.c[field].type, Numeric)
+        )
+        self._extras = tuple((name, compute) for name, _, compute in extras)
+        after = {previous: name for name, previous, _ in extras}
+        self._keys = tuple(
+            key for field in self.fields for key in ((field, after[field]) if field in after else (field,))
+        )
+
+    def serialize(self, row) -> dict:
+        item = dict(zip(self.fields, row))
+        for field in self._zero_as_none_fields:
+            value = item[field]
+            item[field] = float(value) if value else None
+        for field in self._decimal_fields:
+            value = item[field]
+            item[field] = float(value) if value is not None else None
+        if not self._extras:
+            return item
+        for name, compute in self._extras:
+            item[name] = compute(item)
+        return {key: item[key] for key in self._keys}
+
+    def serialize_all(self, rows: Iterable) -> List[dict]:
+        return [self.serialize(row) for row in rows]
+
+
+class ExternalDataSpec(NamedTuple):
+    """一种外部数据的模型、日期列、排序列和列表投影"""
+    model: type
+    date_field: str
+    order_fields: Tuple[str, ...]
+    list_view: Projection
+
+
+_BASE_FIELDS = ('id', 'user_id', 'data_source', 'created_at')
+
+# 体重成分指标（最新体重、体重详情共用）
+WEIGHT_COMPOSITION_FIELDS = (
+    # 基础指标
+    'weight', 'bmi', 'body_fat', 'muscle_mass', 'bone_mass', 'water', 'protein', 'bmr',
+    'visceral_fat', 'body_age', 'body_score', 'heart_rate', 'whr', 'body_shape', 'fat_mass',
+    # 左下肢
+    'left_lower_limb_fat_mass', 'left_lower_limb_fat_rank',
+    'left_lower_limb_muscle_mass', 'left_lower_limb_muscle_rank',
+    # 左上肢
+    'left_upper_limb_fat_mass', 'left_upper_limb_fat_rank',
+    'left_upper_limb_muscle_mass', 'left_upper_limb_muscle_rank',
+    # 右下肢
+    'right_lower_limb_fat_mass', 'right_lower_limb_fat_rank',
+    'right_lower_limb_muscle_mass', 'right_lower_limb_muscle_rank',
+    # 右上肢
+    'right_upper_limb_fat_mass', 'right_upper_limb_fat_rank',
+    'right_upper_limb_muscle_mass', 'right_upper_limb_muscle_rank',
+    # 躯干
+    'trunk_fat_mass', 'trunk_fat_rank', 'trunk_muscle_mass', 'trunk_muscle_rank',
+    # 平衡指标
+    'limbs_fat_balance', 'limbs_muscle_balance', 'limbs_skeletal_muscle_index',
+    'lower_limb_fat_balance', 'lower_limb_muscle_balance',
+    'upper_limb_fat_balance', 'upper_limb_muscle_balance',
+    # 其他
+    'recommended_calories_intake',
+)
+
+# 体重成分中 0 视为未测量的指标（left_lower_limb_muscle_mass 是 Integer 列，同样转为 float）
+WEIGHT_COMPOSITION_ZERO_AS_NONE = (
+    'weight', 'bmi', 'body_fat', 'muscle_mass', 'bone_mass', 'water', 'protein',
+    'visceral_fat', 'whr', 'fat_mass',
+    'left_lower_limb_fat_mass', 'left_lower_limb_muscle_mass',
+    'left_upper_limb_fat_mass', 'left_upper_limb_muscle_mass',
+    'right_lower_limb_fat_mass', 'right_lower_limb_muscle_mass',
+    'right_upper_limb_fat_mass', 'right_upper_limb_muscle_mass',
+    'trunk_fat_mass', 'trunk_muscle_mass',
+    'limbs_skeletal_muscle_index',
+)
+
+EXTERNAL_DATA_SPECS: Dict[str, ExternalDataSpec] = {
+    'sleep': ExternalDataSpec(
+        model=ExternalSleepRecord,
+        date_field='sleep_date',
+        order_fields=('sleep_date', 'start_time'),
+        list_view=Projection(ExternalSleepRecord, _BASE_FIELDS + (
+            'sleep_date', 'start_time', 'end_time', 'total_duration', 'deep_sleep',
+            'light_sleep', 'rem_sleep', 'awake_time', 'sleep_score',
+        )),
+    ),
+    'exercise': ExternalDataSpec(
+        model=ExternalExerciseRecord,
+        date_field='exercise_date',
+        order_fields=('exercise_date', 'start_time'),
+        list_view=Projection(
+            ExternalExerciseRecord,
+            _BASE_FIELDS + (
+                'exercise_date', 'start_time', 'end_time', 'exercise_type', 'duration',
+                'distance', 'calories', 'steps', 'avg_heart_rate', 'max_heart_rate',
+            ),
+            zero_as_none=('distance',),
+            extras=(('exercise_type_cn', 'exercise_type', lambda item: get_exercise_type_cn(item['exercise_type'])),)
+        ),
+    ),
+    'weight': ExternalDataSpec(
+        model=ExternalWeightRecord,
+        date_field='measure_date',
+        order_fields=('measure_date', 'measure_time'),
+        # 列表中 weight 原样转为 float（必填列），其余指标 0 视为未测量
+        list_view=Projection(
+            ExternalWeightRecord,
+            _BASE_FIELDS + (
+                'measure_date', 'measure_time', 'weight', 'bmi', 'body_fat', 'muscle_mass',
+                'bone_mass', 'water', 'protein', 'bmr', 'visceral_fat', 'body_age', 'body_score',
+                'fat_mass', 'note',
+            ),
+            zero_as_none=('bmi', 'body_fat', 'muscle_mass', 'bone_mass', 'water', 'protein',
+                          'visceral_fat', 'fat_mass'),
+        ),
+    ),
+    'steps': ExternalDataSpec(
+        model=ExternalStepRecord,
+        date_field='step_date',
+        order_fields=('step_date',),
+        list_view=Projection(
+            ExternalStepRecord,
+            _BASE_FIELDS + ('step_date', 'steps', 'distance', 'calories', 'active_time'),
+            zero_as_none=('distance',),
+        ),
+    ),
+}
+
+# 列表排序键：排序列 + id（列表投影中都包含这些列，可以直接从结果行生成游标）
+EXTERNAL_DATA_KEYSETS: Dict[str, Keyset] = {
+    data_type: Keyset(
+        f"external_data:{data_type}",
+        [getattr(spec.model, field) for field in spec.order_fields + ('id',)]
+    )
+    for data_type, spec in EXTERNAL_DATA_SPECS.items()
+}
+
+# 最新体重成分（人体成分报告）
+LATEST_WEIGHT_VIEW = Projection(
+    ExternalWeightRecord,
+    ('id', 'user_id', 'data_source', 'measure_date', 'measure_time')
+    + WEIGHT_COMPOSITION_FIELDS + ('created_at',),
+    zero_as_none=WEIGHT_COMPOSITION_ZERO_AS_NONE
+)
+
+# 体重记录详情（不含 body_shape）
+WEIGHT_DETAIL_VIEW = Projection(
+    ExternalWeightRecord,
+    ('id', 'measure_date', 'measure_time')
+    + tuple(field for field in WEIGHT_COMPOSITION_FIELDS if field != 'body_shape') + ('note',),
+    zero_as_none=WEIGHT_COMPOSITION_ZERO_AS_NONE
+)
@@ -0,0 +1,73 @@
+"""
+外部数据原始数据归档
+
+同步时接口返回的原始数据只在排查问题时才会用到，却占了外部数据表的大部分体积。
+这里把原始数据压缩（zlib）后单独存入 external_raw_data，按 (数据类型, data_hash) 与记录一一对应：
+- 记录表不再保存原始数据，列表/详情查询不会读到这部分
+- 只追加不修改，已存在的原始数据在键冲突时跳过（ON DUPLICATE KEY UPDATE，与记录表一致）
+- 只通过原始数据接口按需读取；归档前的旧数据仍在记录表的 raw_data 列中（延迟加载）
+"""
+import json
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.external_data import ExternalRawData
+
+settings = get_settings()
+
+COMPRESS_LEVEL = 6
+
+
+def pack(record: Dict) -> bytes:
+    """序列化并压缩"""
+    data = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+    return zlib.compress(data, COMPRESS_LEVEL)
+
+
+def unpack(payload: bytes) -> Dict:
+    return json.loads(zlib.decompress(payload))
+
+
+def archive_raw_payloads(db: Session, data_type: str, items: List[Tuple[bytes, Dict]]):
+    """
+    归档原始数据（已存在的跳过）
+    :param items: (data_hash, 原始记录) 列表
+    """
+    batch_size = settings.EXTERNAL_INSERT_BATCH_SIZE
+    for i in range(0, len(items), batch_size):
+        rows = [
+            {"data_type": data_type, "data_hash": data_hash, "payload": pack(record)}
+            for data_hash, record in items[i:i + batch_size]
+        ]
+        db.execute(
+            mysql_insert(ExternalRawData).values(rows)
+            .on_duplicate_key_update(data_hash=ExternalRawData.data_hash)
+        )
+        db.commit()
+
+
+def load_raw_payload(db: Session, data_type: str, record) -> Optional[Dict]:
+    """
+    读取一条外部数据记录的原始数据
+    :param record: 外部数据记录（ORM 对象）
+    """
+    payload = db.execute(
+        select(ExternalRawData.payload).where(
+            ExternalRawData.data_type == data_type,
+            ExternalRawData.data_hash == record.data_hash
+        )
+    ).scalar()
+    if payload is not None:
+        return unpack(payload)
+
+    # 归档前的旧数据：raw_data 列是延迟加载的，这里单独读取
+    model = type(record)
+    raw_data = db.execute(select(model.raw_data).where(model.id == record.id)).scalar()
+    while isinstance(raw_data, (str, bytes)):
+        raw_data = json.loads(raw_data)
+    return raw_data
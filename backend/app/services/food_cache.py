@@ -0,0 +1,218 @@
+"""
+食物营养信息进程内缓存
+
+食物详情、饮食录入等流程按 id / external_id 逐条查询 food_nutrition，每次都经过 Pydantic 转换 DECIMAL 字段。
+这里缓存紧凑的只读记录（NamedTuple，不持有 ORM 对象和会话），直接生成接口返回的字典：
+- LRU + TTL：多进程部署时其他进程的修改最多延迟 FOOD_CACHE_TTL 秒可见
+- 批量查询：未命中的 id 和 external_id 合并为一条 IN 查询
+- 启动时预热最近饮食记录中最常出现的食物
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.diet import DietRecord
+from app.models.food import FoodNutrition
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+WARM_DAYS = 30
+
+
+def _format_time(value) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+class FoodRecord(NamedTuple):
+    """食物营养信息（与 FoodNutritionResponse 字段一致）"""
+    id: int
+    external_id: Optional[str]
+    name: str
+    category: Optional[str]
+    calories: Decimal
+    protein: Optional[Decimal]
+    carbs: Optional[Decimal]
+    fat: Optional[Decimal]
+    image_url: Optional[str]
+    unit: str
+    source: str
+    is_custom: bool
+    created_at: Optional[str]
+    updated_at: Optional[str]
+
+    @classmethod
+    def from_row(cls, row) -> "FoodRecord":
+        return cls(
+            id=row.id,
+            external_id=row.external_id,
+            name=row.name,
+            category=row.category,
+            calories=row.calories,
+            protein=row.protein,
+            carbs=row.carbs,
+            fat=row.fat,
+            image_url=row.image_url,
+            unit=row.unit,
+            source=row.source,
+            is_custom=bool(row.is_custom),
+            created_at=_format_time(row.created_at),
+            updated_at=_format_time(row.updated_at),
+        )
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+_COLUMNS = [getattr(FoodNutrition, field) for field in FoodRecord._fields]
+
+
+class FoodCache:
+    """按 id 缓存的 LRU，另维护 external_id -> id 映射（线程安全）"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[int, Tuple[float, FoodRecord]]" = OrderedDict()
+        self._external: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, food_id: int, now: float) -> Optional[FoodRecord]:
+        entry = self._entries.get(food_id)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at <= now:
+            self._drop(food_id)
+            return None
+        self._entries.move_to_end(food_id)
+        return record
+
+    def _drop(self, food_id: int):
+        entry = self._entries.pop(food_id, None)
+        if entry is not None and entry[1].external_id:
+            self._external.pop(entry[1].external_id, None)
+
+    def put_many(self, records: Iterable[FoodRecord]):
+        if settings.FOOD_CACHE_SIZE <= 0:
+            return
+        expires_at = time.monotonic() + settings.FOOD_CACHE_TTL
+        with self._lock:
+            for record in records:
+                self._drop(record.id)
+                self._entries[record.id] = (expires_at, record)
+                if record.external_id:
+                    # 同一 external_id 有多条时保留先加载的（id 最小）
+                    self._external.setdefault(record.external_id, record.id)
+            while len(self._entries) > settings.FOOD_CACHE_SIZE:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, food_id: Optional[int] = None, external_ids: Iterable[str] = ()):
+        """食物修改/删除后调用"""
+        with self._lock:
+            if food_id is not None:
+                self._drop(food_id)
+            for external_id in external_ids:
+                cached_id = self._external.get(external_id)
+                if cached_id is not None:
+                    self._drop(cached_id)
+
+    def get_many(
+        self,
+        db: Session,
+        ids: Iterable[int] = (),
+        external_ids: Iterable[str] = ()
+    ) -> Tuple[Dict[int, FoodRecord], Dict[str, FoodRecord]]:
+        """
+        批量获取食物，未命中的一次查询补齐
+
+        :return: (id -> 记录, external_id -> 记录)，不存在的不在结果中
+        """
+        ids = list(dict.fromkeys(ids))
+        external_ids = list(dict.fromkeys(external_ids))
+        by_id: Dict[int, FoodRecord] = {}
+        by_external: Dict[str, FoodRecord] = {}
+        missing_ids: List[int] = []
+        missing_external: List[str] = []
+
+        now = time.monotonic()
+        with self._lock:
+            for food_id in ids:
+                record = self._get(food_id, now)
+                if record is None:
+                    missing_ids.append(food_id)
+                else:
+                    by_id[food_id] = record
+            for external_id in external_ids:
+                cached_id = self._external.get(external_id)
+                record = self._get(cached_id, now) if cached_id is not None else None
+                if record is None:
+                    missing_external.append(external_id)
+                else:
+                    by_external[external_id] = record
+
+        if missing_ids or missing_external:
+            conditions = []
+            if missing_ids:
+                conditions.append(FoodNutrition.id.in_(missing_ids))
+            if missing_external:
+                conditions.append(FoodNutrition.external_id.in_(missing_external))
+            # 同一 external_id 有多条时取 id 最小的一条（与 .first() 的结果一致）
+            rows = db.execute(select(*_COLUMNS).where(or_(*conditions)).order_by(FoodNutrition.id)).all()
+            loaded = [FoodRecord.from_row(row) for row in rows]
+            wanted_ids = set(missing_ids)
+            wanted_external = set(missing_external)
+            for record in loaded:
+                if record.id in wanted_ids:
+                    by_id[record.id] = record
+                if record.external_id in wanted_external and record.external_id not in by_external:
+                    by_external[record.external_id] = record
+            self.put_many(loaded)
+
+        return by_id, by_external
+
+    def get(self, db: Session, food_id: int) -> Optional[FoodRecord]:
+        return self.get_many(db, ids=[food_id])[0].get(food_id)
+
+    def get_by_external_id(self, db: Session, external_id: str) -> Optional[FoodRecord]:
+        return self.get_many(db, external_ids=[external_id])[1].get(external_id)
+
+    def warm(self, db: Session) -> int:
+        """预热：最近 WARM_DAYS 天饮食记录中出现次数最多的食物"""
+        if settings.FOOD_CACHE_WARM_SIZE <= 0:
+            return 0
+        names = db.execute(
+            select(DietRecord.food_name)
+            .where(DietRecord.record_date >= date.today() - timedelta(days=WARM_DAYS))
+            .group_by(DietRecord.food_name)
+            .order_by(func.count().desc())
+            .limit(settings.FOOD_CACHE_WARM_SIZE)
+        ).scalars().all()
+        if not names:
+            return 0
+        rows = db.execute(select(*_COLUMNS).where(FoodNutrition.name.in_(names))).all()
+        self.put_many(FoodRecord.from_row(row) for row in rows)
+        logger.info(f"食物缓存预热完成: {len(rows)} 条")
+        return len(rows)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+food_cache = FoodCache()
+
+
+def warm_food_cache(db: Session):
+    """启动任务入口"""
+    try:
+        food_cache.warm(db)
+    except Exception as e:
+        logger.error(f"食物缓存预热失败: {e}")
@@ -0,0 +1,225 @@
+"""
+食物图片转存流水线
+
+在线搜索到的新食物先以原始图片链接入库，之后由本流水线把图片转存到自己的存储并回填 image_url：
+下载（异步、限流、重试）→ 可选压缩重编码 → 上传 → 回填
+
+- 全局并发数和每个图片域名的并发数都有上限，避免打满上游或存储
+- 按内容哈希去重：同一张图片（不同食物、不同链接）只上传一次
+- 回填时只更新仍为原始链接的行，不覆盖用户在此期间手动修改的图片
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import urllib.parse
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import update
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_redis
+from app.models.food import FoodNutrition
+from app.services.food_cache import food_cache
+from app.utils.storage import upload_file
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+IMAGE_HASH_KEY = "food_image:{digest}"  # 内容哈希 -> 已上传的URL
+IMAGE_HASH_TTL = 86400 * 30
+IMAGE_FOLDER = "foods/"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+# 同一批次/同时进行的相同内容只上传一次
+_uploading: Dict[str, "asyncio.Future"] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """图片下载专用客户端（懒创建）"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=settings.FOOD_IMAGE_TIMEOUT,
+            verify=False,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=settings.FOOD_IMAGE_CONCURRENCY,
+                max_keepalive_connections=settings.FOOD_IMAGE_CONCURRENCY
+            )
+        )
+    return _client
+
+
+async def close_http_client():
+    """应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urllib.parse.urlsplit(url).netloc
+    semaphore = _host_limits.get(host)
+    if semaphore is None:
+        semaphore = _host_limits[host] = asyncio.Semaphore(settings.FOOD_IMAGE_PER_HOST)
+    return semaphore
+
+
+def _file_ext(url: str) -> str:
+    ext = os.path.splitext(urllib.parse.urlsplit(url).path)[1].lower()
+    return ext if ext in (".jpg", ".jpeg", ".png", ".webp", ".gif") else ".jpg"
+
+
+async def _download(url: str) -> Optional[bytes]:
+    """下载图片，网络错误和 5xx/429 时按指数退避重试"""
+    client = get_http_client()
+    for attempt in range(settings.FOOD_IMAGE_RETRIES + 1):
+        try:
+            async with _host_limit(url):
+                resp = await client.get(url)
+            if resp.status_code == 200:
+                if len(resp.content) > settings.MAX_UPLOAD_SIZE:
+                    logger.warning(f"图片过大，跳过: {url}")
+                    return None
+                return resp.content
+            if resp.status_code not in RETRY_STATUS:
+                logger.warning(f"下载图片失败: {url} status={resp.status_code}")
+                return None
+        except httpx.HTTPError as e:
+            logger.warning(f"下载图片失败: {url} {e}（第{attempt + 1}次）")
+        if attempt < settings.FOOD_IMAGE_RETRIES:
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    return None
+
+
+def _reencode(data: bytes, file_ext: str) -> Tuple[bytes, str]:
+    """按最长边缩小并重新编码为 JPEG（阻塞调用，在线程池中执行）"""
+    from PIL import Image
+
+    max_edge = settings.FOOD_IMAGE_MAX_EDGE
+    with Image.open(io.BytesIO(data)) as image:
+        if max(image.size) <= max_edge:
+            return data, file_ext
+        image.thumbnail((max_edge, max_edge))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=85, optimize=True)
+    return output.getvalue(), ".jpg"
+
+
+def _read_uploaded(digest: str) -> Optional[str]:
+    try:
+        return get_redis().get(IMAGE_HASH_KEY.format(digest=digest))
+    except Exception as e:
+        logger.warning(f"读取图片去重缓存失败: {e}")
+        return None
+
+
+def _write_uploaded(digest: str, url: str):
+    try:
+        get_redis().setex(IMAGE_HASH_KEY.format(digest=digest), IMAGE_HASH_TTL, url)
+    except Exception as e:
+        logger.warning(f"写入图片去重缓存失败: {e}")
+
+
+async def _upload(data: bytes, file_ext: str) -> Optional[str]:
+    if settings.FOOD_IMAGE_MAX_EDGE > 0:
+        try:
+            data, file_ext = await run_in_threadpool(_reencode, data, file_ext)
+        except Exception as e:
+            # 无法识别的图片按原样上传
+            logger.warning(f"图片重编码失败: {e}")
+    result = await upload_file(data, file_ext, folder=IMAGE_FOLDER)
+    if not result.get("success"):
+        logger.warning(f"图片上传失败: {result.get('error')}")
+        return None
+    return result.get("url")
+
+
+async def _store(data: bytes, file_ext: str) -> Optional[str]:
+    """按内容哈希去重后上传，返回存储后的URL"""
+    digest = hashlib.sha256(data).hexdigest()
+    uploaded = _read_uploaded(digest)
+    if uploaded:
+        return uploaded
+
+    pending = _uploading.get(digest)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.ensure_future(_upload(data, file_ext))
+    _uploading[digest] = future
+    try:
+        url = await asyncio.shield(future)
+    finally:
+        _uploading.pop(digest, None)
+    if url:
+        _write_uploaded(digest, url)
+    return url
+
+
+async def _backfill(external_ids: List[str], original_url: str, new_url: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(FoodNutrition)
+            .where(
+                FoodNutrition.external_id.in_(external_ids),
+                FoodNutrition.image_url == original_url
+            )
+            .values(image_url=new_url)
+        )
+        await db.commit()
+    food_cache.invalidate(external_ids=external_ids)
+
+
+async def _ingest_one(original_url: str, external_ids: List[str], limit: asyncio.Semaphore) -> bool:
+    async with limit:
+        data = await _download(original_url)
+        if data is None:
+            return False
+        new_url = await _store(data, _file_ext(original_url))
+    if not new_url:
+        return False
+    await _backfill(external_ids, original_url, new_url)
+    return True
+
+
+async def ingest_food_images(foods: List[dict]) -> int:
+    """
+    转存食物图片并回填 image_url
+
+    :param foods: 已入库的食物（需包含 external_id、image_url，image_url 为原始链接）
+    :return: 成功回填的图片数
+    """
+    # 同一链接只下载一次
+    by_url: Dict[str, List[str]] = defaultdict(list)
+    for food in foods:
+        url = food.get("image_url")
+        if url and url.startswith(("http://", "https://")):
+            by_url[url].append(food["external_id"])
+    if not by_url:
+        return 0
+
+    limit = asyncio.Semaphore(settings.FOOD_IMAGE_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_ingest_one(url, ids, limit) for url, ids in by_url.items()),
+        return_exceptions=True
+    )
+    done = 0
+    for url, result in zip(by_url, results):
+        if isinstance(result, Exception):
+            logger.warning(f"转存图片失败: {url} {result}")
+        elif result:
+            done += 1
+    logger.info(f"食物图片转存完成: {done}/{len(by_url)}")
+    return done
@@ -0,0 +1,190 @@
+"""
+本地食物库随机推荐
+
+ORDER BY RAND() 需要为全表每一行生成随机数再排序，数据量越大越慢。这里改为：
+- 定时把全部食物 id（以及每个分类的 id）打乱后写入 Redis 列表
+- 取样时从随机位置读取连续的一段，打乱后的列表中任意连续片段都是随机样本，代价只与 page_size 有关
+- 传入会话标识时记录该会话的读取位置和已返回的 id，翻页/换一批不会重复，取完一轮后重新开始
+
+Redis 不可用或列表尚未生成时，按主键范围随机取样（随机起点 + 主键顺序读取，同样只读 page_size 行）。
+"""
+import logging
+import random
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.models.food import FoodNutrition
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+POOL_KEY = "food_random:pool:{category}"  # 打乱后的 id 列表，category 为 * 时表示全部
+CATEGORIES_KEY = "food_random:categories"  # 已生成列表的分类
+SESSION_KEY = "food_random:session:{user_id}:{session}:{category}"  # hash: cursor
+SEEN_KEY = "food_random:seen:{user_id}:{session}"  # 会话已返回的 id
+LOCK_KEY = "food_random:lock"
+LOCK_TIMEOUT = 600
+ALL = "*"
+CHUNK_SIZE = 5000
+
+
+def _pool_key(category: Optional[str]) -> str:
+    return POOL_KEY.format(category=category or ALL)
+
+
+def rebuild_random_pools(db: Session) -> int:
+    """
+    重新生成所有随机列表（定时任务调用，多进程时只有一个进程执行）
+
+    :return: 食物总数，未获取到锁时返回 -1
+    """
+    redis_client = get_redis()
+    if not redis_client.set(LOCK_KEY, "1", nx=True, ex=LOCK_TIMEOUT):
+        return -1
+    try:
+        rows = db.execute(select(FoodNutrition.id, FoodNutrition.category)).all()
+        pools: Dict[str, List[int]] = {ALL: []}
+        for row in rows:
+            pools[ALL].append(row.id)
+            if row.category:
+                pools.setdefault(row.category, []).append(row.id)
+
+        old_categories = redis_client.smembers(CATEGORIES_KEY)
+        pipe = redis_client.pipeline()
+        for category, ids in pools.items():
+            random.shuffle(ids)
+            # 先写临时 key 再 RENAME，读取方不会看到写了一半的列表
+            key = POOL_KEY.format(category=category)
+            tmp_key = f"{key}:tmp"
+            pipe.delete(tmp_key)
+            for i in range(0, len(ids), CHUNK_SIZE):
+                pipe.rpush(tmp_key, *ids[i:i + CHUNK_SIZE])
+            if ids:
+                pipe.rename(tmp_key, key)
+            else:
+                pipe.delete(key)
+        for category in old_categories - set(pools):
+            pipe.delete(POOL_KEY.format(category=category))
+        pipe.delete(CATEGORIES_KEY)
+        pipe.sadd(CATEGORIES_KEY, *pools.keys())
+        pipe.execute()
+        logger.info(f"食物随机列表已更新: {len(rows)} 条, {len(pools) - 1} 个分类")
+        return len(rows)
+    finally:
+        redis_client.delete(LOCK_KEY)
+
+
+def _read_window(redis_client, key: str, start: int, count: int, total: int) -> List[int]:
+    """从 start 开始读取 count 个 id，到末尾后从头继续"""
+    count = min(count, total)
+    end = start + count - 1
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.lrange(key, start, min(end, total - 1))
+    if end >= total:
+        pipe.lrange(key, 0, end - total)
+    return [int(i) for part in pipe.execute() for i in part]
+
+
+def _sample_from_pool(
+    size: int,
+    category: Optional[str],
+    user_id: Optional[int],
+    session: Optional[str]
+) -> Optional[Tuple[int, List[int]]]:
+    """从 Redis 随机列表取样，列表不存在时返回 None"""
+    redis_client = get_redis()
+    key = _pool_key(category)
+    total = redis_client.llen(key)
+    if not total:
+        return None
+
+    if not session or user_id is None:
+        return total, _read_window(redis_client, key, random.randrange(total), size, total)
+
+    session_key = SESSION_KEY.format(user_id=user_id, session=session, category=category or ALL)
+    seen_key = SEEN_KEY.format(user_id=user_id, session=session)
+    cursor = redis_client.hget(session_key, "cursor")
+    cursor = int(cursor) % total if cursor is not None else random.randrange(total)
+
+    picked: List[int] = []
+    scanned = 0
+    # 列表定时重新打乱，会话游标之后的片段可能包含已返回过的 id，按已返回集合过滤
+    while len(picked) < size and scanned < total:
+        batch = min(size * 2, total - scanned)
+        window = _read_window(redis_client, key, cursor, batch, total)
+        pipe = redis_client.pipeline(transaction=False)
+        for food_id in window:
+            pipe.sismember(seen_key, food_id)
+        flags = pipe.execute()
+        for offset, (food_id, seen) in enumerate(zip(window, flags)):
+            if not seen:
+                picked.append(food_id)
+                if len(picked) >= size:
+                    cursor = (cursor + offset + 1) % total
+                    break
+        else:
+            cursor = (cursor + batch) % total
+        scanned += batch
+
+    pipe = redis_client.pipeline(transaction=False)
+    if not picked:
+        # 本会话已看完全部食物，重新开始一轮
+        picked = _read_window(redis_client, key, cursor, size, total)
+        cursor = (cursor + len(picked)) % total
+        pipe.delete(seen_key)
+    pipe.sadd(seen_key, *picked)
+    pipe.hset(session_key, "cursor", cursor)
+    pipe.expire(seen_key, settings.FOOD_RANDOM_SESSION_TTL)
+    pipe.expire(session_key, settings.FOOD_RANDOM_SESSION_TTL)
+    pipe.execute()
+    return total, picked
+
+
+def _sample_by_id_range(db: Session, size: int, category: Optional[str]) -> Tuple[int, List[int]]:
+    """按主键范围随机取样：随机起点后按主键顺序读取，不足时从头补齐"""
+    conditions = [FoodNutrition.category == category] if category else []
+    min_id, max_id, total = db.execute(
+        select(func.min(FoodNutrition.id), func.max(FoodNutrition.id), func.count(FoodNutrition.id))
+        .where(*conditions)
+    ).one()
+    if not total:
+        return 0, []
+
+    start = random.randint(min_id, max_id)
+    ids = list(db.execute(
+        select(FoodNutrition.id).where(*conditions, FoodNutrition.id >= start)
+        .order_by(FoodNutrition.id).limit(size)
+    ).scalars())
+    if len(ids) < size:
+        ids += db.execute(
+            select(FoodNutrition.id).where(*conditions, FoodNutrition.id < start)
+            .order_by(FoodNutrition.id).limit(size - len(ids))
+        ).scalars()
+    random.shuffle(ids)
+    return total, ids
+
+
+def sample_food_ids(
+    db: Session,
+    size: int,
+    category: Optional[str] = None,
+    user_id: Optional[int] = None,
+    session: Optional[str] = None
+) -> Tuple[int, List[int]]:
+    """
+    随机取样食物 id
+
+    :param session: 会话标识（如前端每次进入推荐页生成的随机串），同一会话内不重复返回
+    :return: (可选食物总数, id 列表)
+    """
+    try:
+        sampled = _sample_from_pool(size, category, user_id, session)
+        if sampled is not None:
+            return sampled
+    except Exception as e:
+        logger.warning(f"读取食物随机列表失败，改用主键范围取样: {e}")
+    return _sample_by_id_range(db, size, category)
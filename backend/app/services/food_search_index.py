@@ -0,0 +1,341 @@
+"""
+本地食物库内存检索索引
+
+food_nutrition 的名称模糊查询（LIKE '%关键词%'）无法使用索引，数据量增长后每次搜索都是全表扫描。
+这里在进程内维护一份轻量索引（只保存 id、名称、分类、更新时间）：
+- 名称 n-gram 倒排：单字 + 二元组，求交集后再做子串校验，结果与 LIKE 一致
+- 拼音键：全拼、首字母以及从后续音节开始的全拼，支持 "mifan"、"mf"、"fan" 搜到 "米饭"
+- 分类倒排：category 过滤
+结果按相关度排序（完全匹配 > 前缀 > 拼音 > 子串，名称越短越靠前），
+接口只用命中的 id 一次主键 IN 查询取出当前页的完整记录。
+
+索引在启动后由定时任务构建，之后定时增量同步（按 updated_at 拉取变更，数量不一致时全量重建），
+本进程内的新增/编辑/删除接口直接更新索引。索引未就绪时调用方回退到数据库查询。
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.food import FoodNutrition
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 未安装时只支持按名称检索
+    lazy_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+_ASCII_QUERY = re.compile(r'^[a-z0-9]+$')
+_NON_WORD = re.compile(r'[\s·・,，()（）\[\]【】/、\-_]+')
+
+# 相关度分值
+SCORE_EXACT = 100
+SCORE_PREFIX = 80
+SCORE_PINYIN_EXACT = 70
+SCORE_PINYIN_PREFIX = 60
+SCORE_SUBSTRING = 40
+SCORE_PINYIN_INNER = 30
+
+
+def normalize(text: str) -> str:
+    """小写并去掉空白和常见标点"""
+    return _NON_WORD.sub("", (text or "").lower())
+
+
+def _grams(text: str) -> Set[str]:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _pinyin_keys(name: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    返回 (从首音节开始的键, 从后续音节开始的键)
+
+    前者为全拼和首字母（"mifan"、"mf"），后者为全拼从第2个音节起的后缀（"fan"）
+    """
+    if lazy_pinyin is None or not name or name.isascii():
+        return (), ()
+    syllables = [s for s in (normalize(s) for s in lazy_pinyin(name)) if s]
+    if not syllables:
+        return (), ()
+    initials = [s[0] for s in syllables]
+    heads = {"".join(syllables), "".join(initials)}
+    inner = {"".join(syllables[i:]) for i in range(1, len(syllables))}
+    return tuple(heads), tuple(inner - heads)
+
+
+@dataclass
+class FoodSearchHit:
+    id: int
+    name: str
+    category: Optional[str]
+
+
+class _Doc:
+    __slots__ = ("id", "name", "norm", "category", "updated_at", "pinyin_heads", "pinyin_inner", "order")
+
+    def __init__(self, food_id: int, name: str, category: Optional[str], updated_at: Optional[datetime]):
+        self.id = food_id
+        self.name = name
+        self.norm = normalize(name)
+        self.category = category
+        self.updated_at = updated_at or datetime.min
+        self.pinyin_heads, self.pinyin_inner = _pinyin_keys(self.norm)
+        # 同分时的排序键：名称短的在前，其次最近更新的在前
+        self.order = (len(self.norm), -self.updated_at.timestamp() if updated_at else 0.0, food_id)
+
+
+class FoodSearchIndex:
+    """进程内食物检索索引（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._docs: Dict[int, _Doc] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._categories: Dict[str, Set[int]] = {}
+        # 有序 (键, id)，用于前缀查找；从首音节开始的键与后续音节的键分开，区间内分值相同
+        self._pinyin_heads: List[Tuple[str, int]] = []
+        self._pinyin_inner: List[Tuple[str, int]] = []
+        self._recent: Optional[List[int]] = None  # 按更新时间倒序的 id，变更后懒重建
+        self._high_water: Optional[datetime] = None
+        self.ready = False
+
+    # ---------- 维护 ----------
+
+    def _add(self, doc: _Doc, sort: bool = True):
+        self._docs[doc.id] = doc
+        for gram in _grams(doc.norm):
+            self._grams.setdefault(gram, set()).add(doc.id)
+        if doc.category:
+            self._categories.setdefault(doc.category, set()).add(doc.id)
+        for keys, entries in ((doc.pinyin_heads, self._pinyin_heads), (doc.pinyin_inner, self._pinyin_inner)):
+            for key in keys:
+                if sort:
+                    bisect.insort(entries, (key, doc.id))
+                else:
+                    entries.append((key, doc.id))
+        if self._high_water is None or doc.updated_at > self._high_water:
+            self._high_water = doc.updated_at
+
+    def _remove(self, food_id: int):
+        doc = self._docs.pop(food_id, None)
+        if doc is None:
+            return
+        for gram in _grams(doc.norm):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(food_id)
+                if not ids:
+                    del self._grams[gram]
+        if doc.category:
+            ids = self._categories.get(doc.category)
+            if ids is not None:
+                ids.discard(food_id)
+                if not ids:
+                    del self._categories[doc.category]
+        for keys, entries in ((doc.pinyin_heads, self._pinyin_heads), (doc.pinyin_inner, self._pinyin_inner)):
+            for key in keys:
+                i = bisect.bisect_left(entries, (key, food_id))
+                if i < len(entries) and entries[i] == (key, food_id):
+                    del entries[i]
+
+    def upsert(self, food: FoodNutrition):
+        """新增或更新一条食物（接口写入后调用）"""
+        self._upsert(food.id, food.name, food.category, food.updated_at or datetime.now())
+
+    def _upsert(self, food_id, name, category, updated_at):
+        doc = _Doc(food_id, name, category, updated_at)
+        with self._lock:
+            self._remove(food_id)
+            self._add(doc)
+            self._recent = None
+
+    def remove(self, food_id: int):
+        """删除一条食物（接口删除后调用）"""
+        with self._lock:
+            self._remove(food_id)
+            self._recent = None
+
+    def build(self, db: Session):
+        """全量构建：只读取检索需要的列，构建完成后整体替换"""
+        rows = db.execute(
+            select(FoodNutrition.id, FoodNutrition.name, FoodNutrition.category, FoodNutrition.updated_at)
+        ).all()
+        fresh = FoodSearchIndex()
+        for row in rows:
+            fresh._add(_Doc(row.id, row.name, row.category, row.updated_at), sort=False)
+        # 拼音键批量追加后统一排序，避免逐条 insort
+        fresh._pinyin_heads.sort()
+        fresh._pinyin_inner.sort()
+        with self._lock:
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k != "_lock"})
+            self.ready = True
+        logger.info(f"食物检索索引构建完成: {len(rows)} 条")
+
+    def sync(self, db: Session):
+        """增量同步其他进程/后台任务的写入；行数对不上（有删除）时全量重建"""
+        if not self.ready:
+            self.build(db)
+            return
+        with self._lock:
+            high_water = self._high_water
+        if high_water is not None:
+            # TIMESTAMP 精度为秒，回看 1 秒，重复应用是幂等的
+            rows = db.execute(
+                select(FoodNutrition.id, FoodNutrition.name, FoodNutrition.category, FoodNutrition.updated_at)
+                .where(FoodNutrition.updated_at >= high_water - timedelta(seconds=1))
+            ).all()
+            for row in rows:
+                doc = self._docs.get(row.id)
+                if doc is None or doc.name != row.name or doc.category != row.category \
+                        or doc.updated_at != row.updated_at:
+                    self._upsert(row.id, row.name, row.category, row.updated_at)
+        total = db.execute(select(func.count(FoodNutrition.id))).scalar() or 0
+        if total != len(self._docs):
+            self.build(db)
+
+    # ---------- 查询 ----------
+
+    def _name_matches(self, query: str) -> Set[int]:
+        if len(query) == 1:
+            grams = {query}
+        else:
+            grams = {query[i:i + 2] for i in range(len(query) - 1)}
+        postings = [self._grams.get(g) for g in grams]
+        if any(p is None for p in postings):
+            return set()
+        postings.sort(key=len)
+        ids = set(postings[0])
+        for p in postings[1:]:
+            ids &= p
+            if not ids:
+                return ids
+        # 二元组命中不代表连续出现，做一次子串校验
+        if len(query) > 2:
+            ids = {i for i in ids if query in self._docs[i].norm}
+        return ids
+
+    @staticmethod
+    def _prefix_range(entries: List[Tuple[str, int]], query: str) -> Tuple[int, int, int]:
+        """前缀为 query 的区间 [start, stop)，以及其中键恰好等于 query 的部分的结束位置"""
+        start = bisect.bisect_left(entries, (query,))
+        exact_stop = bisect.bisect_left(entries, (query + "\0",), start)
+        stop = bisect.bisect_left(entries, (query + "\uffff",), exact_stop)
+        return start, exact_stop, stop
+
+    def _pinyin_matches(self, query: str, scores: Dict[int, int]):
+        """拼音前缀匹配，按分值从低到高写入 scores（高分覆盖低分）"""
+        start, _, stop = self._prefix_range(self._pinyin_inner, query)
+        for _, food_id in self._pinyin_inner[start:stop]:
+            if scores.get(food_id, 0) < SCORE_PINYIN_INNER:
+                scores[food_id] = SCORE_PINYIN_INNER
+        heads = self._pinyin_heads
+        start, exact_stop, stop = self._prefix_range(heads, query)
+        for lo, hi, score in ((exact_stop, stop, SCORE_PINYIN_PREFIX), (start, exact_stop, SCORE_PINYIN_EXACT)):
+            for _, food_id in heads[lo:hi]:
+                if scores.get(food_id, 0) < score:
+                    scores[food_id] = score
+
+    def _ordered_recent(self) -> List[int]:
+        if self._recent is None:
+            self._recent = sorted(self._docs, key=lambda i: (self._docs[i].updated_at, i), reverse=True)
+        return self._recent
+
+    def search(
+        self,
+        keyword: Optional[str] = None,
+        category: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[int, List[int]]:
+        """
+        检索食物 id
+
+        有关键词时按相关度排序，否则按更新时间倒序（与原列表接口一致）。
+        只对 offset + limit 以内的结果排序。
+
+        :return: (命中总数, 当前页 id 列表)
+        """
+        query = normalize(keyword) if keyword else ""
+        end = offset + limit if limit is not None else None
+        with self._lock:
+            category_ids = self._categories.get(category, set()) if category else None
+
+            if not query:
+                ordered = self._ordered_recent()
+                if category_ids is None:
+                    return len(ordered), ordered[offset:end]
+                page = []
+                for food_id in ordered:
+                    if food_id in category_ids:
+                        page.append(food_id)
+                        if end is not None and len(page) >= end:
+                            break
+                return len(category_ids), page[offset:]
+
+            scores: Dict[int, int] = {}
+            for food_id in self._name_matches(query):
+                norm = self._docs[food_id].norm
+                if norm == query:
+                    scores[food_id] = SCORE_EXACT
+                elif norm.startswith(query):
+                    scores[food_id] = SCORE_PREFIX
+                else:
+                    scores[food_id] = SCORE_SUBSTRING
+            if _ASCII_QUERY.match(query):
+                self._pinyin_matches(query, scores)
+
+            if category_ids is not None:
+                scores = {i: s for i, s in scores.items() if i in category_ids}
+            docs = self._docs
+
+            def rank(i):
+                return -scores[i], docs[i].order
+
+            if end is None:
+                ranked = sorted(scores, key=rank)
+            else:
+                ranked = heapq.nsmallest(end, scores, key=rank)
+            return len(scores), ranked[offset:]
+
+    def suggest(self, prefix: str, limit: int = 10, category: Optional[str] = None) -> List[FoodSearchHit]:
+        """输入联想：按相关度返回前 limit 个名称"""
+        hits = []
+        seen = set()
+        # 同名食物只保留一个，多取一些候选
+        _, ids = self.search(prefix, category, limit=limit * 3)
+        for food_id in ids:
+            doc = self._docs.get(food_id)
+            if doc is None or doc.name in seen:
+                continue
+            seen.add(doc.name)
+            hits.append(FoodSearchHit(id=doc.id, name=doc.name, category=doc.category))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def __len__(self):
+        return len(self._docs)
+
+
+food_search_index = FoodSearchIndex()
+
+
+def sync_food_search_index(db: Session):
+    """定时任务入口：首次全量构建，之后增量同步"""
+    try:
+        food_search_index.sync(db)
+    except Exception as e:
+        logger.error(f"食物检索索引同步失败: {e}")
@@ -0,0 +1,191 @@
+"""
+夜间批量体重预测任务
+
+一条按 (user_id, record_date) 排序的查询流式读取所有活跃用户的体重序列，
+按用户分段后用 np.add.reduceat 一次性拟合所有用户的趋势直线和减重速率，
+结果写入 Redis（ml_service.FORECAST_CACHE_KEY），/weight/predict 和 /user/progress 直接读取。
+
+批量之后有体重记录变化的用户，其结果会在写入时被清除，接口回退为按需拟合。
+"""
+import json
+import logging
+from datetime import date, timedelta
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.models.weight import WeightRecord
+from app.services.ml_service import (
+    FORECAST_CACHE_KEY, FORECAST_HORIZON, GOAL_MIN_RECORDS, MIN_RECORDS,
+    MODEL_CACHE_KEY, MODEL_CACHE_TTL, WeightTrendModel
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+LOCK_KEY = "forecast_batch:lock"
+LOCK_TIMEOUT = 3600
+STREAM_CHUNK_ROWS = 50000  # 每批处理的行数（按用户边界切分）
+
+
+def fit_segments(ordinals: np.ndarray, weights: np.ndarray, starts: np.ndarray, today: date) -> Dict[str, np.ndarray]:
+    """
+    对按用户分段、段内按日期升序的序列批量做最小二乘拟合，并计算减重速率
+
+    :param ordinals: 记录日期的 date.toordinal()
+    :param weights: 体重
+    :param starts: 每个用户第一条记录的下标
+    :return: 每个用户一个元素的数组：slope/intercept/std_dev/base/last/count/goal_daily_change
+    """
+    counts = np.diff(np.append(starts, len(ordinals)))
+    seg = np.repeat(np.arange(len(starts)), counts)
+    last = starts + counts - 1
+
+    # 趋势直线：x 为距该用户首条记录的天数
+    base = ordinals[starts]
+    x = ordinals - base[seg]
+    x_mean = np.add.reduceat(x, starts) / counts
+    y_mean = np.add.reduceat(weights, starts) / counts
+    x_centered = x - x_mean[seg]
+    var_x = np.add.reduceat(x_centered * x_centered, starts)
+    cov_xy = np.add.reduceat(x_centered * (weights - y_mean[seg]), starts)
+    slope = np.divide(cov_xy, var_x, out=np.zeros_like(var_x), where=var_x > 0)
+    intercept = y_mean - slope * x_mean
+    residuals = weights - (intercept[seg] + slope[seg] * x)
+    std_dev = np.sqrt(np.add.reduceat(residuals * residuals, starts) / counts)
+
+    # 减重速率：按记录频率选择 60/45/30 天窗口，窗口内不足5条时回退到全部数据
+    total_days = ordinals[last] - base
+    frequency = np.divide(counts, total_days, out=np.zeros(len(starts)), where=total_days > 0)
+    days_range = np.where(frequency >= 0.7, 60, np.where(frequency >= 0.4, 45, 30))
+    in_window = ordinals >= (today.toordinal() - days_range)[seg]
+    window_count = np.add.reduceat(in_window.astype(np.int64), starts)
+    use_window = window_count >= GOAL_MIN_RECORDS
+    first = np.where(use_window, last + 1 - window_count, starts)
+    span = ordinals[last] - ordinals[first]
+    valid = (counts >= MIN_RECORDS) & (total_days > 0) & (use_window | (counts >= GOAL_MIN_RECORDS)) & (span > 0)
+    goal_daily_change = np.full(len(starts), np.nan)
+    goal_daily_change[valid] = (weights[last] - weights[first])[valid] / span[valid]
+
+    return {
+        "slope": slope,
+        "intercept": intercept,
+        "std_dev": std_dev,
+        "base": base,
+        "last": ordinals[last],
+        "count": counts,
+        "goal_daily_change": goal_daily_change,
+    }
+
+
+def _write_results(user_ids: List[int], fitted: Dict[str, np.ndarray], today: date):
+    """批量写入预测结果：一次 pipeline，预测区间对所有用户一次数组运算"""
+    offsets = np.arange(1, FORECAST_HORIZON + 1, dtype=np.float64)
+    # 形状 (用户数, 预测天数)
+    x = (fitted["last"] - fitted["base"])[:, None] + offsets[None, :]
+    predicted = fitted["intercept"][:, None] + fitted["slope"][:, None] * x
+    margin = (1.96 * fitted["std_dev"])[:, None]
+    predicted_rounded = np.round(predicted, 2).tolist()
+    lower_rounded = np.round(predicted - margin, 2).tolist()
+    upper_rounded = np.round(predicted + margin, 2).tolist()
+
+    pipe = get_redis().pipeline(transaction=False)
+    for i, user_id in enumerate(user_ids):
+        count = int(fitted["count"][i])
+        last_date = date.fromordinal(int(fitted["last"][i]))
+        goal_daily_change = fitted["goal_daily_change"][i]
+        mapping = {
+            "computed_on": today.isoformat(),
+            "goal_daily_change": "" if np.isnan(goal_daily_change) else float(goal_daily_change),
+        }
+
+        if count >= MIN_RECORDS:
+            future_dates = [(last_date + timedelta(days=d)).isoformat() for d in range(1, FORECAST_HORIZON + 1)]
+            mapping["predictions"] = json.dumps(list(zip(
+                future_dates, predicted_rounded[i], lower_rounded[i], upper_rounded[i]
+            )))
+            model = WeightTrendModel(
+                slope=float(fitted["slope"][i]),
+                intercept=float(fitted["intercept"][i]),
+                std_dev=float(fitted["std_dev"][i]),
+                base_date=date.fromordinal(int(fitted["base"][i])),
+                last_date=last_date,
+                sample_count=count
+            )
+            pipe.setex(MODEL_CACHE_KEY.format(user_id=user_id), MODEL_CACHE_TTL, json.dumps(model.to_dict()))
+
+        key = FORECAST_CACHE_KEY.format(user_id=user_id)
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, MODEL_CACHE_TTL)
+    pipe.execute()
+
+
+def _process_chunk(user_ids: List[int], ordinals: List[int], weights: List[float], starts: List[int], today: date):
+    """拟合并写入一批完整用户的数据"""
+    if not user_ids:
+        return
+    fitted = fit_segments(
+        np.asarray(ordinals, dtype=np.float64),
+        np.asarray(weights, dtype=np.float64),
+        np.asarray(starts, dtype=np.int64),
+        today
+    )
+    _write_results(user_ids, fitted, today)
+
+
+def run_forecast_batch(db: Session, today: date = None) -> int:
+    """
+    为所有活跃用户（最近 FORECAST_ACTIVE_DAYS 天内有体重记录）批量计算预测
+
+    :return: 处理的用户数
+    """
+    today = today or date.today()
+    redis_client = get_redis()
+    # 多个 worker 同时触发时只执行一次
+    if not redis_client.set(LOCK_KEY, "1", nx=True, ex=LOCK_TIMEOUT):
+        logger.info("批量体重预测正在其他进程执行，跳过")
+        return 0
+
+    try:
+        active_users = db.query(WeightRecord.user_id).group_by(WeightRecord.user_id).having(
+            func.max(WeightRecord.record_date) >= today - timedelta(days=settings.FORECAST_ACTIVE_DAYS)
+        ).subquery()
+
+        rows = db.query(
+            WeightRecord.user_id, WeightRecord.record_date, WeightRecord.weight
+        ).filter(
+            WeightRecord.user_id.in_(active_users.select())
+        ).order_by(
+            WeightRecord.user_id, WeightRecord.record_date
+        ).yield_per(5000)
+
+        processed = 0
+        user_ids: List[int] = []
+        ordinals: List[int] = []
+        weights: List[float] = []
+        starts: List[int] = []
+
+        for user_id, record_date, weight in rows:
+            if not user_ids or user_ids[-1] != user_id:
+                # 在用户边界处切分，保证每个用户的序列完整地落在同一批里
+                if len(ordinals) >= STREAM_CHUNK_ROWS:
+                    _process_chunk(user_ids, ordinals, weights, starts, today)
+                    processed += len(user_ids)
+                    user_ids, ordinals, weights, starts = [], [], [], []
+                user_ids.append(user_id)
+                starts.append(len(ordinals))
+            ordinals.append(record_date.toordinal())
+            weights.append(weight)
+
+        _process_chunk(user_ids, ordinals, weights, starts, today)
+        processed += len(user_ids)
+
+        logger.info(f"批量体重预测完成: {processed} 个用户")
+        return processed
+    finally:
+        redis_client.delete(LOCK_KEY)
@@ -0,0 +1,445 @@
+"""
+首页概览聚合服务
+
+首页需要的四份数据（今日概览、减肥进度、营养分析、热量趋势）原来分别由四个接口各自查询，
+这里用两条查询一次取齐：
+- 体重：一条 UNION ALL 取最新、今天、今天之前最近一条、最早一条记录
+- 饮食/运动：一条 UNION ALL 取今天的明细 + 趋势窗口内的每日营养汇总（daily_nutrition_summary）
+
+组装结果按 (用户, 日期) 缓存在 Redis 中。饮食/运动/体重/饮水写入都会标记历史汇总脏日期，
+在那里（daily_rollup_service.mark_daily_history_dirty_many）统一清除缓存；用户资料变化时也会清除。
+
+各个 build_* 函数同时被原有的单独接口使用，保证两边返回的数据一致。
+"""
+import json
+import logging
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import Float, Integer, String, desc, literal, null, select, type_coerce, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.models.daily_nutrition_summary import DailyNutritionSummary
+from app.models.diet import DietRecord
+from app.models.exercise import ExerciseRecord
+from app.models.user import User
+from app.models.weight import WeightRecord
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+OVERVIEW_CACHE_KEY = "home_overview:{user_id}:{date}"
+TREND_DAYS = 30  # 热量趋势天数（与 /home/calories-trend 默认值一致）
+CALORIE_DEFICIT = 500  # 减肥热量缺口（千卡/天）
+
+
+def build_dashboard(latest_weight, diet_rows, exercise_rows) -> Dict:
+    """今日概览：最新体重、今日摄入/消耗热量和明细"""
+    return {
+        "latest_weight": {
+            "weight": float(latest_weight.weight),
+            "record_date": latest_weight.record_date.strftime("%Y-%m-%d")
+        } if latest_weight else None,
+        "today_calories": round(sum(float(d.calories or 0) for d in diet_rows), 1),
+        "today_exercise_calories": round(sum(float(e.calories or 0) for e in exercise_rows), 1),
+        "today_diet_records": [{
+            "id": d.id,
+            "meal_type": d.meal_type,
+            "food_name": d.food_name,
+            "calories": float(d.calories or 0),
+            "portion": d.portion or "",
+            "record_date": d.record_date.strftime("%Y-%m-%d")
+        } for d in diet_rows],
+        "today_exercise_records": [{
+            "id": e.id,
+            "exercise_type": e.exercise_type,
+            "duration": e.duration,
+            "calories": float(e.calories or 0),
+            "distance": float(e.distance or 0),
+            "record_date": e.record_date.strftime("%Y-%m-%d")
+        } for e in exercise_rows]
+    }
+
+
+def build_progress(user: User, today: date, today_weight: Optional[float], previous_record, first_record,
+                   get_daily_change: Callable[[], Optional[float]]) -> Dict:
+    """
+    减肥进度
+
+    :param today_weight: 今天的体重记录，没有时使用用户表中的当前体重
+    :param previous_record: 今天之前最近一条体重记录（weight, record_date）
+    :param first_record: 最早一条体重记录（weight, record_date）
+    :param get_daily_change: 需要预计达标天数时才调用，返回减重速率
+    """
+    from app.services.ml_service import estimate_days_to_goal
+
+    current_weight = today_weight if today_weight is not None else user.current_weight
+
+    # 相比昨天（或上次记录）的变化
+    weight_change = None
+    weight_change_date = None
+    if previous_record:
+        weight_change = current_weight - previous_record.weight
+        weight_change_date = previous_record.record_date.isoformat()
+
+    # 已减去的体重和耗时
+    weight_lost = None
+    days_elapsed = None
+    if first_record:
+        weight_lost = first_record.weight - current_weight  # 正数表示减重，负数表示增重
+        days_elapsed = (today - first_record.record_date).days
+
+    # 距离目标还有多少
+    weight_to_goal = None
+    if user.target_weight:
+        weight_to_goal = current_weight - user.target_weight
+
+    # 预计达到目标需要的天数
+    estimated_days_to_goal = None
+    if user.target_weight and weight_to_goal and weight_to_goal > 0:
+        estimated_days_to_goal = estimate_days_to_goal(weight_to_goal, get_daily_change())
+
+    return {
+        "current_weight": current_weight,
+        "target_weight": user.target_weight,
+        "weight_change": weight_change,  # 相比昨天的变化（kg）
+        "weight_change_date": weight_change_date,  # 对比的日期
+        "weight_lost": weight_lost,  # 已减去的体重（kg）
+        "weight_to_goal": weight_to_goal,  # 距离目标还有多少（kg）
+        "days_elapsed": days_elapsed,  # 耗时天数
+        "estimated_days_to_goal": estimated_days_to_goal  # 预计达到目标需要的天数
+    }
+
+
+def build_nutrition_analysis(user: User, target_date: date, summary: Optional[DailyNutritionSummary]) -> Dict:
+    """
+    营养成分分析：摄入营养素、推荐量、热量缺口和建议
+
+    :param summary: 当天的营养汇总行，没有记录时为 None
+    """
+    user_bmr = user.bmr or 0  # 基础代谢
+
+    # 摄入营养成分和运动消耗
+    total_calories = float(summary.intake_calories) if summary else 0.0
+    total_protein = float(summary.protein) if summary else 0.0
+    total_carbs = float(summary.carbs) if summary else 0.0
+    total_fat = float(summary.fat) if summary else 0.0
+    exercise_calories = float(summary.exercise_calories) if summary else 0.0
+
+    # 计算总能量消耗（TDEE）= 基础代谢 + 实际运动消耗
+    # 不使用固定活动系数，而是使用真实的运动数据
+    tdee = user_bmr + exercise_calories if user_bmr > 0 else 2000 + exercise_calories
+
+    # 推荐摄入量 = TDEE - 热量缺口
+    recommended_intake = tdee - CALORIE_DEFICIT
+
+    # 推荐营养素比例（蛋白质20%、碳水50%、脂肪30%）
+    recommended_protein = (recommended_intake * 0.20) / 4  # 1g蛋白质 = 4千卡
+    recommended_carbs = (recommended_intake * 0.50) / 4    # 1g碳水 = 4千卡
+    recommended_fat = (recommended_intake * 0.30) / 9      # 1g脂肪 = 9千卡
+
+    # 计算营养素占比
+    total_macro_calories = (total_protein * 4) + (total_carbs * 4) + (total_fat * 9)
+    protein_ratio = round((total_protein * 4 / total_macro_calories * 100), 1) if total_macro_calories > 0 else 0
+    carbs_ratio = round((total_carbs * 4 / total_macro_calories * 100), 1) if total_macro_calories > 0 else 0
+    fat_ratio = round((total_fat * 9 / total_macro_calories * 100), 1) if total_macro_calories > 0 else 0
+
+    # 计算热量缺口
+    calories_remaining = recommended_intake - total_calories  # 还能摄入的热量
+
+    # 准备营养摄入数据（只包含蛋白质、碳水、脂肪）
+    nutrition_data = [
+        {
+            "name": "蛋白质",
+            "current": round(total_protein, 1),
+            "target": round(recommended_protein, 1),
+            "unit": "g"
+        },
+        {
+            "name": "碳水化合物",
+            "current": round(total_carbs, 1),
+            "target": round(recommended_carbs, 1),
+            "unit": "g"
+        },
+        {
+            "name": "脂肪",
+            "current": round(total_fat, 1),
+            "target": round(recommended_fat, 1),
+            "unit": "g"
+        }
+    ]
+
+    # 生成营养建议
+    recommendations = []
+
+    # 热量建议
+    if total_calories < user_bmr * 0.8:
+        recommendations.append({
+            "title": "热量摄入不足",
+            "content": f"您今天的饮食摄入({round(total_calories)}千卡)低于基础代谢的80%，建议适当增加饮食，以免影响基础代谢和健康。",
+            "type": "warning"
+        })
+    elif total_calories > recommended_intake * 1.2:
+        recommendations.append({
+            "title": "热量摄入过高",
+            "content": f"您今天的饮食摄入({round(total_calories)}千卡)超过推荐量的20%，建议适当控制饮食或增加运动。",
+            "type": "warning"
+        })
+    else:
+        recommendations.append({
+            "title": "热量摄入合理",
+            "content": f"您今天的饮食摄入({round(total_calories)}千卡)在推荐范围内，保持每天{CALORIE_DEFICIT}千卡热量缺口有助于减重。",
+            "type": "good"
+        })
+
+    # 蛋白质建议
+    protein_percentage = (total_protein / recommended_protein * 100) if recommended_protein > 0 else 0
+    if protein_percentage < 70:
+        recommendations.append({
+            "title": "增加蛋白质摄入",
+            "content": f"您的蛋白质摄入({round(total_protein, 1)}g)较低，建议增加鸡胸肉、鱼类、豆制品等优质蛋白来源。",
+            "type": "warning"
+        })
+    elif protein_percentage >= 80:
+        recommendations.append({
+            "title": "蛋白质摄入充足",
+            "content": f"您的蛋白质摄入({round(total_protein, 1)}g)达到推荐量，有助于肌肉恢复和维护。",
+            "type": "good"
+        })
+
+    # 碳水化合物建议
+    carbs_percentage = (total_carbs / recommended_carbs * 100) if recommended_carbs > 0 else 0
+    if carbs_percentage > 120:
+        recommendations.append({
+            "title": "控制碳水化合物",
+            "content": f"您的碳水化合物摄入({round(total_carbs, 1)}g)偏高，建议减少精制碳水，多选择全谷物和蔬菜。",
+            "type": "warning"
+        })
+
+    # 脂肪建议
+    fat_percentage = (total_fat / recommended_fat * 100) if recommended_fat > 0 else 0
+    if fat_percentage > 120:
+        recommendations.append({
+            "title": "注意脂肪摄入",
+            "content": f"您的脂肪摄入({round(total_fat, 1)}g)偏高，建议减少油炸食品，选择健康脂肪来源如坚果、橄榄油。",
+            "type": "warning"
+        })
+
+    # 运动建议
+    if exercise_calories == 0:
+        recommendations.append({
+            "title": "增加运动量",
+            "content": "您今天还没有运动记录，建议每天至少进行30分钟中等强度运动，如快走、慢跑或游泳。",
+            "type": "warning"
+        })
+    else:
+        recommendations.append({
+            "title": "运动表现良好",
+            "content": f"您今天消耗了{round(exercise_calories)}千卡，坚持运动有助于保持健康体重。",
+            "type": "good"
+        })
+
+    return {
+        "date": target_date.isoformat(),
+        "summary": {
+            "total_calories": round(total_calories, 1),
+            "exercise_calories": round(exercise_calories, 1),
+            "calories_remaining": round(calories_remaining, 1),
+            "bmr": round(user_bmr, 1),
+            "tdee": round(tdee, 1),
+            "recommended_intake": round(recommended_intake, 1),
+            "calorie_deficit": CALORIE_DEFICIT,
+            "protein_ratio": protein_ratio,
+            "carbs_ratio": carbs_ratio,
+            "fat_ratio": fat_ratio,
+            "total_protein": round(total_protein, 1),
+            "total_carbs": round(total_carbs, 1),
+            "total_fat": round(total_fat, 1)
+        },
+        "nutrition_data": nutrition_data,
+        "recommendations": recommendations
+    }
+
+
+def build_calories_trend(start_date: date, days: int, diet_map: Dict[str, float], exercise_map: Dict[str, float]) -> List[Dict]:
+    """热量趋势：补齐日期序列，键为 YYYY-MM-DD"""
+    data = []
+    for i in range(days):
+        date_str = str(start_date + timedelta(days=i))
+        data.append({
+            "date": date_str,
+            "intake": round(diet_map.get(date_str, 0), 1),
+            "consume": round(exercise_map.get(date_str, 0), 1)
+        })
+    return data
+
+
+def _null(type_):
+    return type_coerce(null(), type_)
+
+
+def _weights_query(user_id: int, today: date):
+    """一次取出最新、今天、今天之前最近一条、最早一条体重记录"""
+    def pick(kind: str, *conditions, order_by):
+        return select(
+            literal(kind).label("kind"), WeightRecord.weight, WeightRecord.record_date
+        ).where(WeightRecord.user_id == user_id, *conditions).order_by(*order_by).limit(1)
+
+    return union_all(
+        pick("latest", order_by=(desc(WeightRecord.record_date), desc(WeightRecord.updated_at), desc(WeightRecord.id))),
+        pick("today", WeightRecord.record_date == today, order_by=(desc(WeightRecord.id),)),
+        pick("previous", WeightRecord.record_date < today, order_by=(desc(WeightRecord.record_date),)),
+        pick("first", order_by=(WeightRecord.record_date.asc(),)),
+    )
+
+
+def _calories_query(user_id: int, today: date, start_date: date):
+    """一次取出今天的饮食/运动明细和趋势窗口内的每日营养汇总"""
+    diet_today = select(
+        literal("diet").label("kind"), DietRecord.id, DietRecord.record_date,
+        DietRecord.meal_type.label("meal_type"), DietRecord.food_name.label("name"),
+        DietRecord.portion.label("portion"), DietRecord.calories.label("calories"),
+        DietRecord.protein.label("protein"), DietRecord.carbs.label("carbs"), DietRecord.fat.label("fat"),
+        _null(Integer).label("duration"), _null(Float).label("distance"),
+        _null(Float).label("exercise_calories")
+    ).where(DietRecord.user_id == user_id, DietRecord.record_date == today)
+
+    exercise_today = select(
+        literal("exercise"), ExerciseRecord.id, ExerciseRecord.record_date,
+        _null(String), ExerciseRecord.exercise_type,
+        _null(String), ExerciseRecord.calories,
+        _null(Float), _null(Float), _null(Float),
+        ExerciseRecord.duration, ExerciseRecord.distance,
+        _null(Float)
+    ).where(ExerciseRecord.user_id == user_id, ExerciseRecord.record_date == today)
+
+    days = select(
+        literal("day"), DailyNutritionSummary.id, DailyNutritionSummary.record_date,
+        _null(String), _null(String),
+        _null(String), DailyNutritionSummary.intake_calories,
+        DailyNutritionSummary.protein, DailyNutritionSummary.carbs, DailyNutritionSummary.fat,
+        _null(Integer), _null(Float),
+        DailyNutritionSummary.exercise_calories
+    ).where(
+        DailyNutritionSummary.user_id == user_id,
+        DailyNutritionSummary.record_date >= start_date,
+        DailyNutritionSummary.record_date <= today
+    )
+
+    rows = union_all(diet_today, exercise_today, days).subquery()
+    return select(rows).order_by(rows.c.kind, rows.c.id)
+
+
+class _DaySummary:
+    """把 UNION 行适配成营养汇总字段"""
+
+    __slots__ = ("intake_calories", "protein", "carbs", "fat", "exercise_calories")
+
+    def __init__(self, row):
+        self.intake_calories = row.calories
+        self.protein = row.protein
+        self.carbs = row.carbs
+        self.fat = row.fat
+        self.exercise_calories = row.exercise_calories
+
+
+class _DietRow:
+    """把 UNION 行适配成 build_* 使用的饮食记录字段"""
+
+    __slots__ = ("id", "meal_type", "food_name", "calories", "portion", "protein", "carbs", "fat", "record_date")
+
+    def __init__(self, row):
+        self.id = row.id
+        self.meal_type = row.meal_type
+        self.food_name = row.name
+        self.calories = row.calories
+        self.portion = row.portion
+        self.protein = row.protein
+        self.carbs = row.carbs
+        self.fat = row.fat
+        self.record_date = row.record_date
+
+
+class _ExerciseRow:
+    """把 UNION 行适配成 build_* 使用的运动记录字段"""
+
+    __slots__ = ("id", "exercise_type", "duration", "calories", "distance", "record_date")
+
+    def __init__(self, row):
+        self.id = row.id
+        self.exercise_type = row.name
+        self.duration = row.duration
+        self.calories = row.calories
+        self.distance = row.distance
+        self.record_date = row.record_date
+
+
+def _cache_key(user_id: int, day: date) -> str:
+    return OVERVIEW_CACHE_KEY.format(user_id=user_id, date=day.isoformat())
+
+
+def invalidate_home_overview(user_id: int, day: Optional[date] = None):
+    """清除用户首页概览缓存（默认今天）"""
+    try:
+        get_redis().delete(_cache_key(user_id, day or date.today()))
+    except Exception as e:
+        logger.warning(f"清除首页概览缓存失败: user_id={user_id}, {e}")
+
+
+async def get_home_overview(db: AsyncSession, user: User) -> Dict:
+    """读取（或计算并缓存）用户今天的首页概览（同步的 Redis 调用放到线程池执行）"""
+    today = date.today()
+    key = _cache_key(user.id, today)
+    redis_client = get_redis()
+    cached = await run_in_threadpool(redis_client.get, key)
+    if cached:
+        return json.loads(cached)
+
+    weights = {row.kind: row for row in (await db.execute(_weights_query(user.id, today))).all()}
+
+    start_date = today - timedelta(days=TREND_DAYS)
+    diet_rows: List[_DietRow] = []
+    exercise_rows: List[_ExerciseRow] = []
+    diet_map: Dict[str, float] = {}
+    exercise_map: Dict[str, float] = {}
+    today_summary = None
+    for row in (await db.execute(_calories_query(user.id, today, start_date))).all():
+        if row.kind == "diet":
+            diet_rows.append(_DietRow(row))
+        elif row.kind == "exercise":
+            exercise_rows.append(_ExerciseRow(row))
+        elif row.kind == "day":
+            diet_map[str(row.record_date)] = float(row.calories or 0)
+            exercise_map[str(row.record_date)] = float(row.exercise_calories or 0)
+            if row.record_date == today:
+                today_summary = _DaySummary(row)
+
+    # 只有设置了目标且未达标时才需要减重速率（通常命中夜间批量结果，不查库）
+    daily_change = None
+    today_record = weights.get("today")
+    current_weight = today_record.weight if today_record else user.current_weight
+    if user.target_weight and current_weight and current_weight - user.target_weight > 0:
+        from app.services import ml_service
+        hit, daily_change = await run_in_threadpool(ml_service.read_cached_goal_daily_change, user.id, today)
+        if not hit:
+            dates, weights_series = await db.run_sync(lambda session: ml_service.load_weight_series(session, user.id))
+            daily_change = ml_service.compute_goal_daily_change(dates, weights_series, today)
+            await run_in_threadpool(ml_service.cache_goal_daily_change, user.id, today, daily_change)
+
+    overview = {
+        "dashboard": build_dashboard(weights.get("latest"), diet_rows, exercise_rows),
+        "progress": build_progress(
+            user, today, today_record.weight if today_record else None,
+            weights.get("previous"), weights.get("first"), lambda: daily_change
+        ),
+        "nutrition": build_nutrition_analysis(user, today, today_summary),
+        "calories_trend": build_calories_trend(start_date, TREND_DAYS, diet_map, exercise_map),
+    }
+
+    await run_in_threadpool(
+        redis_client.setex, key, settings.HOME_OVERVIEW_CACHE_TTL, json.dumps(overview, ensure_ascii=False)
+    )
+    return overview
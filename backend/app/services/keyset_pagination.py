@@ -0,0 +1,131 @@
+"""
+列表接口的游标（keyset）翻页
+
+按页码翻页用 OFFSET 跳过前面的行，翻得越深扫描越多，而且每一页都要再 COUNT 一遍总数。
+游标翻页记住上一页最后一行的排序键（如 (日期, id)），下一页直接从索引上的这个位置往后取：
+- 列表统一按排序键倒序，最后一列是 id，保证顺序唯一、翻页不重不漏
+- 游标是不透明的字符串（排序键的 base64 编码），带列表标识，不能拿到别的列表使用
+- 游标模式默认不返回总数；需要时按 (列表, 用户, 筛选条件) 在 Redis 中缓存一段时间（LIST_COUNT_CACHE_TTL）
+- 按页码翻页的响应也带 next_cursor，客户端可以从任意一页切换到游标翻页
+"""
+import base64
+import hashlib
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+import redis
+from sqlalchemy import and_, or_
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+COUNT_CACHE_KEY = "list_count:{scope}:{user_id}:{filters}"
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析或不属于当前列表"""
+
+
+class Keyset:
+    """一个列表的排序键（全部倒序，最后一列应为 id）"""
+
+    def __init__(self, scope: str, columns: Sequence):
+        """
+        :param scope: 列表标识，写入游标中用于校验
+        :param columns: 排序列（模型属性）
+        """
+        self.scope = scope
+        self.columns = tuple(columns)
+        self._parsers = tuple(_parser_for(column.type.python_type) for column in self.columns)
+
+    @property
+    def order_by(self) -> List:
+        return [column.desc() for column in self.columns]
+
+    def cursor_for(self, row) -> str:
+        """根据一行（ORM 对象或查询结果行）生成指向它之后的游标"""
+        values = [_dump(getattr(row, column.key)) for column in self.columns]
+        data = json.dumps([self.scope] + values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    def page(self, rows: Sequence, page_size: int) -> Tuple[Sequence, Optional[str]]:
+        """
+        截取一页（查询时多取一行用于判断是否还有下一页）
+        :return: (本页的行, 下一页游标，没有下一页时为 None)
+        """
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        return rows, self.cursor_for(rows[-1])
+
+    def decode(self, cursor: str) -> List[Any]:
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            scope, values = data[0], data[1:]
+            if scope != self.scope or len(values) != len(self.columns):
+                raise InvalidCursor("游标不属于当前列表")
+            return [parse(value) for parse, value in zip(self._parsers, values)]
+        except InvalidCursor:
+            raise
+        except (ValueError, TypeError, IndexError, KeyError) as e:
+            raise InvalidCursor(f"无效的游标: {e}")
+
+    def after(self, cursor: str):
+        """
+        游标之后（排序更靠后）的行的条件：
+        c1 <= v1 AND (c1 < v1 OR (c1 = v1 AND (c2 < v2 OR ...)))
+        外层的 c1 <= v1 让 MySQL 可以直接在 (user_id, c1, ...) 索引上做范围扫描
+        """
+        values = self.decode(cursor)
+        pairs = list(zip(self.columns, values))
+        column, value = pairs[-1]
+        condition = column < value
+        for column, value in reversed(pairs[:-1]):
+            condition = or_(column < value, and_(column == value, condition))
+        first_column, first_value = pairs[0]
+        return and_(first_column <= first_value, condition)
+
+
+def _dump(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _parser_for(python_type):
+    if python_type is datetime:
+        return datetime.fromisoformat
+    if python_type is date:
+        return date.fromisoformat
+    if python_type is int:
+        return int
+    return lambda value: value
+
+
+def count_cache_key(scope: str, user_id: int, **filters) -> str:
+    digest = hashlib.md5(
+        json.dumps(filters, sort_keys=True, default=str).encode(), usedforsecurity=False
+    ).hexdigest()
+    return COUNT_CACHE_KEY.format(scope=scope, user_id=user_id, filters=digest)
+
+
+def get_cached_count(key: str) -> Optional[int]:
+    """读取缓存的总数（Redis 不可用时视为未命中）"""
+    try:
+        cached = get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"读取列表总数缓存失败: {e}")
+        return None
+    return int(cached) if cached is not None else None
+
+
+def set_cached_count(key: str, total: int):
+    try:
+        get_redis().setex(key, settings.LIST_COUNT_CACHE_TTL, total)
+    except redis.RedisError as e:
+        logger.warning(f"写入列表总数缓存失败: {e}")
@@ -0,0 +1,234 @@
+"""
+减肥榜物化服务
+
+排名存放在 Redis 有序集合中（score = 减重斤数），每个用户的统计数据存放在 Hash 中：
+- 体重记录变化时（update_user_health_stats）增量刷新该用户
+- 修改数据公开设置时只更新 data_public 字段
+- 读取时 ZREVRANGE 分页 + 一次 IN 查询补充昵称头像，耗时与用户总数无关
+
+Redis 数据丢失时首次读取会自动全量重建，也可以手动执行 rebuild_leaderboard.py
+"""
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.redis import get_redis
+from app.models.user import User
+from app.models.user_settings import UserSettings
+from app.models.weight import WeightRecord
+
+logger = logging.getLogger(__name__)
+
+RANKING_KEY = "leaderboard:weight_lost"  # ZSET，member = user_id，score = 减重斤数
+STATS_KEY = "leaderboard:user:{user_id}"  # HASH，first_weight/current_weight/start_date/data_public
+BUILT_KEY = "leaderboard:built"  # 全量构建完成标记
+
+
+def _stats_key(user_id: int) -> str:
+    return STATS_KEY.format(user_id=user_id)
+
+
+def _weight_lost_jin(first_weight: float, current_weight: float) -> float:
+    """减重斤数（1公斤 = 2斤）"""
+    return round((first_weight - current_weight) * 2, 1)
+
+
+def _write_entry(pipe, user_id: int, first_weight: Optional[float], current_weight: Optional[float],
+                 start_date: Optional[date], data_public: Optional[bool]):
+    """写入单个用户的榜单数据；没有减重（或没有体重数据）的用户从榜单移除"""
+    key = _stats_key(user_id)
+    if first_weight is None or not current_weight or current_weight <= 0:
+        pipe.zrem(RANKING_KEY, user_id)
+        pipe.delete(key)
+        return
+
+    mapping = {
+        "first_weight": first_weight,
+        "current_weight": current_weight,
+        "start_date": start_date.isoformat(),
+    }
+    if data_public is not None:
+        mapping["data_public"] = int(bool(data_public))
+    pipe.hset(key, mapping=mapping)
+
+    weight_lost = _weight_lost_jin(first_weight, current_weight)
+    if weight_lost > 0:
+        pipe.zadd(RANKING_KEY, {user_id: weight_lost})
+    else:
+        pipe.zrem(RANKING_KEY, user_id)
+
+
+def refresh_user(db: Session, user: User):
+    """
+    增量刷新单个用户的榜单数据（体重记录增删改后调用）
+
+    当前体重取用户表中的 current_weight（即最新一条体重记录）
+    """
+    first_record = db.query(WeightRecord.weight, WeightRecord.record_date).filter(
+        WeightRecord.user_id == user.id
+    ).order_by(WeightRecord.record_date.asc()).first()
+
+    data_public = None
+    if first_record and not get_redis().hexists(_stats_key(user.id), "data_public"):
+        setting = db.query(UserSettings.data_public).filter(UserSettings.user_id == user.id).first()
+        data_public = bool(setting.data_public) if setting else False
+
+    pipe = get_redis().pipeline()
+    _write_entry(
+        pipe, user.id,
+        first_record.weight if first_record else None,
+        user.current_weight,
+        first_record.record_date if first_record else None,
+        data_public
+    )
+    pipe.execute()
+
+
+def set_data_public(user_id: int, data_public: bool):
+    """更新用户数据公开设置（仅在用户已上榜时写入）"""
+    redis_client = get_redis()
+    key = _stats_key(user_id)
+    if redis_client.exists(key):
+        redis_client.hset(key, "data_public", int(bool(data_public)))
+
+
+def remove_user(user_id: int):
+    """从榜单中移除用户（账号删除/合并时调用）"""
+    pipe = get_redis().pipeline()
+    pipe.zrem(RANKING_KEY, user_id)
+    pipe.delete(_stats_key(user_id))
+    pipe.execute()
+
+
+def rebuild_leaderboard(db: Session) -> int:
+    """
+    全量重建榜单（用于恢复或首次上线）
+
+    三条聚合查询取出所有用户的首次体重、当前体重和公开设置，不按用户逐个查询
+    :return: 上榜人数
+    """
+    first_dates = db.query(
+        WeightRecord.user_id,
+        func.min(WeightRecord.record_date).label("first_date")
+    ).group_by(WeightRecord.user_id).subquery()
+
+    # 同一天有多条记录时取 id 最小的一条
+    first_rows = db.query(
+        WeightRecord.user_id, WeightRecord.weight, WeightRecord.record_date
+    ).join(
+        first_dates,
+        (WeightRecord.user_id == first_dates.c.user_id) &
+        (WeightRecord.record_date == first_dates.c.first_date)
+    ).order_by(WeightRecord.id.desc()).all()
+    first_by_user = {row.user_id: row for row in first_rows}
+
+    current_weights = dict(db.query(User.id, User.current_weight).filter(
+        User.id.in_(list(first_by_user.keys()))
+    ).all()) if first_by_user else {}
+    public_settings = dict(db.query(UserSettings.user_id, UserSettings.data_public).all())
+
+    redis_client = get_redis()
+    old_members = redis_client.zrange(RANKING_KEY, 0, -1)
+
+    pipe = redis_client.pipeline()
+    pipe.delete(RANKING_KEY)
+    for member in old_members:
+        pipe.delete(_stats_key(int(member)))
+    for user_id, row in first_by_user.items():
+        _write_entry(
+            pipe, user_id, row.weight, current_weights.get(user_id), row.record_date,
+            bool(public_settings.get(user_id, False))
+        )
+    pipe.set(BUILT_KEY, date.today().isoformat())
+    pipe.execute()
+
+    ranked = redis_client.zcard(RANKING_KEY)
+    logger.info(f"减肥榜重建完成: {ranked} 人上榜")
+    return ranked
+
+
+def _read_page(current_user_id: int, page: int, page_size: Optional[int]):
+    """
+    从 Redis 读取一页排名：成员、总数、当前用户名次和每个成员的统计字段
+    :param page_size: 为 None 时读取完整榜单
+    """
+    redis_client = get_redis()
+    if page_size:
+        start = (page - 1) * page_size
+        stop = start + page_size - 1
+    else:
+        start, stop = 0, -1
+    members = redis_client.zrevrange(RANKING_KEY, start, stop, withscores=True)
+    total = redis_client.zcard(RANKING_KEY)
+    my_rank = redis_client.zrevrank(RANKING_KEY, current_user_id)
+
+    pipe = redis_client.pipeline()
+    for member, _ in members:
+        pipe.hmget(_stats_key(int(member)), "start_date", "data_public")
+    stats = pipe.execute()
+    return members, total, my_rank, stats
+
+
+def _build_rankings(members, total: int, my_rank: Optional[int], stats, users: Dict, current_user_id: int) -> Dict:
+    """组装榜单返回数据"""
+    today = date.today()
+    rankings: List[Dict] = []
+    for (member, score), (start_date, data_public) in zip(members, stats):
+        user_id = int(member)
+        user = users.get(user_id)
+        if not user or not start_date:
+            continue
+        rankings.append({
+            "user_id": user_id,
+            "nickname": user.nickname,
+            "username": user.phone[-4:] if user.phone else "",  # 手机号后4位作为用户名
+            "avatar": user.avatar,
+            "weight_lost": score,
+            "days": (today - date.fromisoformat(start_date)).days,
+            "is_current_user": user_id == current_user_id,
+            "data_public": data_public == "1"  # 是否允许查看详情
+        })
+
+    return {
+        "items": rankings,
+        "total": total,
+        "my_rank": my_rank + 1 if my_rank is not None else None
+    }
+
+
+def get_rankings(db: Session, current_user_id: int, page: int, page_size: Optional[int]) -> Dict:
+    """分页读取榜单"""
+    if not get_redis().exists(BUILT_KEY):
+        rebuild_leaderboard(db)
+
+    members, total, my_rank, stats = _read_page(current_user_id, page, page_size)
+    user_ids = [int(member) for member, _ in members]
+    users = {
+        u.id: u for u in db.query(User.id, User.nickname, User.phone, User.avatar).filter(
+            User.id.in_(user_ids)
+        ).all()
+    } if user_ids else {}
+
+    return _build_rankings(members, total, my_rank, stats, users, current_user_id)
+
+
+async def get_rankings_async(db: AsyncSession, current_user_id: int, page: int, page_size: Optional[int]) -> Dict:
+    """分页读取榜单（异步会话版本，供接口使用；同步的 Redis 调用放到线程池执行）"""
+    if not await run_in_threadpool(get_redis().exists, BUILT_KEY):
+        await db.run_sync(rebuild_leaderboard)
+
+    members, total, my_rank, stats = await run_in_threadpool(_read_page, current_user_id, page, page_size)
+    user_ids = [int(member) for member, _ in members]
+    users = {}
+    if user_ids:
+        result = await db.execute(
+            select(User.id, User.nickname, User.phone, User.avatar).where(User.id.in_(user_ids))
+        )
+        users = {u.id: u for u in result.all()}
+
+    return _build_rankings(members, total, my_rank, stats, users, current_user_id)
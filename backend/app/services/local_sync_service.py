@@ -6,6 +6,7 @@ from app.models.sleep import SleepRecord
 from app.models.exercise import ExerciseRecord
 from app.models.external_data import ExternalWeightRecord, ExternalSleepRecord, ExternalExerciseRecord
 from app.utils.health_calculator import calculate_bmi, update_user_health_stats
+from app.services.daily_rollup_service import mark_daily_history_dirty_many
 from typing import List, Dict, Set
 import logging
 
@@ -171,10 +172,8 @@ def sync_weight_to_local(user_id: int, db: Session, start_date: datetime, end_da
     
     db.commit()
     
-    # 触发历史记录重算
-    from app.api.v1.weight import trigger_daily_history_recalculate
-    for sync_date in synced_dates:
-        trigger_daily_history_recalculate(db, user_id, sync_date)
+    # 标记历史记录待重算（所有日期一次提交给后台汇总任务）
+    mark_daily_history_dirty_many(db, user_id, synced_dates)
     
     # 更新用户的健康数据（当前体重、BMI、基础代谢）
     if synced_count > 0:
@@ -238,10 +237,8 @@ def sync_sleep_to_local(user_id: int, db: Session, start_date: datetime, end_dat
     
     db.commit()
     
-    # 触发历史记录重算
-    from app.api.v1.weight import trigger_daily_history_recalculate
-    for sync_date in synced_dates:
-        trigger_daily_history_recalculate(db, user_id, sync_date)
+    # 标记历史记录待重算（所有日期一次提交给后台汇总任务）
+    mark_daily_history_dirty_many(db, user_id, synced_dates)
     
     return synced_count
 
@@ -302,9 +299,7 @@ def sync_exercise_to_local(user_id: int, db: Session, start_date: datetime, end_
     
     db.commit()
     
-    # 触发历史记录重算
-    from app.api.v1.weight import trigger_daily_history_recalculate
-    for sync_date in synced_dates:
-        trigger_daily_history_recalculate(db, user_id, sync_date)
+    # 标记历史记录待重算（所有日期一次提交给后台汇总任务）
+    mark_daily_history_dirty_many(db, user_id, synced_dates)
     
     return synced_count
@@ -0,0 +1,224 @@
+"""
+喵喵食物网（miaofoods）搜索客户端
+
+- 进程内共享一个 httpx.AsyncClient，连接池保持长连接，不阻塞事件循环
+- 搜索结果按关键词两级缓存：进程内 LRU（短 TTL）+ Redis（长 TTL），无结果的关键词也缓存（较短 TTL）
+- 同一关键词并发请求只发出一次上游请求（singleflight），其他请求等待同一个结果
+- __NUXT__ 数据由纯 Python 解码器解析（app/utils/nuxt_decoder.py），不再启动 JS 运行时
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.utils.nuxt_decoder import NuxtDecodeError, decode_nuxt, extract_nuxt_expression
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SEARCH_URL = "https://www.miaofoods.com/search/{keyword}.html"
+SEARCH_CACHE_KEY = "food_search:{keyword}"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36",
+    "Accept-Encoding": "gzip, deflate",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+}
+
+DECIMAL_FIELDS = ("calories", "protein", "carbs", "fat")
+
+
+class MiaofoodsError(Exception):
+    """上游页面请求或解析失败"""
+
+
+class _LocalCache:
+    """进程内关键词缓存（LRU + TTL）"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, keyword: str) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._entries.get(keyword)
+            if entry is None:
+                return None
+            expires_at, foods = entry
+            if expires_at <= time.monotonic():
+                del self._entries[keyword]
+                return None
+            self._entries.move_to_end(keyword)
+            return foods
+
+    def put(self, keyword: str, foods: List[dict]):
+        if settings.FOOD_SEARCH_LOCAL_CACHE_SIZE <= 0:
+            return
+        with self._lock:
+            self._entries[keyword] = (time.monotonic() + settings.FOOD_SEARCH_LOCAL_TTL, foods)
+            self._entries.move_to_end(keyword)
+            while len(self._entries) > settings.FOOD_SEARCH_LOCAL_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+
+_client: Optional[httpx.AsyncClient] = None
+_local_cache = _LocalCache()
+_inflight: Dict[str, "asyncio.Future"] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """共享的异步 HTTP 客户端（懒创建）"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=settings.MIAOFOODS_TIMEOUT,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=settings.MIAOFOODS_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MIAOFOODS_MAX_CONNECTIONS
+            )
+        )
+    return _client
+
+
+async def close_http_client():
+    """应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def normalize_keyword(keyword: str) -> str:
+    return keyword.strip().lower()
+
+
+def _extract_foods(nuxt_data: dict) -> List[dict]:
+    """从 __NUXT__ 数据中提取食物列表（数值字段保存为字符串，便于缓存）"""
+    data_list = nuxt_data.get('data', [{}])[0].get('curSearchFoodList', [])
+
+    foods = []
+    for item in data_list:
+        try:
+            # 处理图片URL中的unicode编码
+            image_url = item.get('foodIcon', '')
+            if image_url:
+                image_url = image_url.replace('\\u002F', '/')
+
+            foods.append({
+                "external_id": str(item.get('foodId', hash(item.get('foodName')))),
+                "name": item.get('foodName', ''),
+                "calories": str(item.get('foodCaloriesVal', 0)),
+                "protein": str(item.get('foodProteinVal', 0)),
+                "carbs": str(item.get('foodCarbohydrateVal', 0)),
+                "fat": str(item.get('foodFatVal', 0)),
+                "image_url": image_url,
+                "category": item.get('cateName'),
+                "source": "miaofoods",
+                "unit": "100克"
+            })
+        except Exception as e:
+            logger.warning(f"解析食物项失败: {e}")
+    return foods
+
+
+async def _fetch(keyword: str) -> List[dict]:
+    """请求上游搜索页并解析"""
+    url = SEARCH_URL.format(keyword=urllib.parse.quote(keyword))
+    try:
+        resp = await get_http_client().get(url)
+        resp.raise_for_status()
+    except httpx.HTTPError as e:
+        raise MiaofoodsError(f"请求喵喵食物网失败: {e}") from e
+
+    resp.encoding = "utf-8"
+    js_expression = extract_nuxt_expression(resp.text)
+    if js_expression is None:
+        raise MiaofoodsError("未能找到食物数据")
+
+    # 一个搜索页解码约 1~2ms，直接在事件循环中执行
+    try:
+        nuxt_data = decode_nuxt(js_expression)
+    except NuxtDecodeError as e:
+        raise MiaofoodsError(f"解析食物数据失败: {e}") from e
+    return _extract_foods(nuxt_data)
+
+
+def _read_redis(keyword: str) -> Optional[List[dict]]:
+    try:
+        cached = get_redis().get(SEARCH_CACHE_KEY.format(keyword=keyword))
+    except Exception as e:
+        logger.warning(f"读取食物搜索缓存失败: {e}")
+        return None
+    return json.loads(cached) if cached is not None else None
+
+
+def _write_redis(keyword: str, foods: List[dict]):
+    # 无结果的关键词使用较短的 TTL，避免反复请求上游，又能较快发现新收录的食物
+    ttl = settings.FOOD_SEARCH_CACHE_TTL if foods else settings.FOOD_SEARCH_NEGATIVE_TTL
+    try:
+        get_redis().setex(SEARCH_CACHE_KEY.format(keyword=keyword), ttl, json.dumps(foods, ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"写入食物搜索缓存失败: {e}")
+
+
+def to_food_items(foods: List[dict]) -> List[dict]:
+    """把缓存格式转换为接口返回格式（数值字段转为 Decimal）"""
+    return [
+        {**food, **{field: Decimal(food[field]) for field in DECIMAL_FIELDS}}
+        for food in foods
+    ]
+
+
+async def _load(keyword: str) -> Tuple[List[dict], bool]:
+    cached = _read_redis(keyword)
+    if cached is not None:
+        _local_cache.put(keyword, cached)
+        return cached, False
+
+    foods = await _fetch(keyword)
+    _write_redis(keyword, foods)
+    _local_cache.put(keyword, foods)
+    return foods, True
+
+
+async def search_foods(keyword: str) -> Tuple[List[dict], bool]:
+    """
+    按关键词搜索食物
+
+    :return: (缓存格式的食物列表, 是否为本次从上游新获取的数据)
+    """
+    keyword = normalize_keyword(keyword)
+
+    foods = _local_cache.get(keyword)
+    if foods is not None:
+        return foods, False
+
+    # 同一关键词已有请求在进行中时直接等待它的结果
+    pending = _inflight.get(keyword)
+    if pending is not None:
+        foods, _ = await asyncio.shield(pending)
+        return foods, False
+
+    future = asyncio.ensure_future(_load(keyword))
+    _inflight[keyword] = future
+    future.add_done_callback(lambda f: _finish_inflight(keyword, f))
+    # shield：发起请求的客户端断开时，上游请求继续完成并写入缓存，等待中的请求不受影响
+    return await asyncio.shield(future)
+
+
+def _finish_inflight(keyword: str, future: "asyncio.Future"):
+    if _inflight.get(keyword) is future:
+        del _inflight[keyword]
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"食物搜索失败: keyword={keyword}, {future.exception()}")
@@ -1,66 +1,291 @@
+"""
+体重趋势预测
+
+- 只查询 record_date / weight 两列，直接转换为 NumPy 数组
+- 闭式最小二乘拟合直线，整个预测区间一次数组运算完成
+- 拟合参数按用户缓存在 Redis 中，体重记录变化时失效
+- 夜间批量任务（forecast_batch_service）预先写入预测结果和减重速率，接口优先直接读取
+"""
+import json
+import logging
+from bisect import bisect_left
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from typing import List
+from typing import List, Optional, Tuple
+from app.core.redis import get_redis
 from app.models.weight import WeightRecord
 from app.schemas.weight import WeightPrediction
 
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_KEY = "weight_model:{user_id}"
+MODEL_CACHE_TTL = 7 * 24 * 60 * 60  # 7天，体重记录变化时主动失效
+MIN_RECORDS = 3  # 至少需要3条记录才能预测
+
+# 夜间批量预测结果（HASH）：predictions / goal_daily_change / computed_on
+FORECAST_CACHE_KEY = "weight_forecast:{user_id}"
+FORECAST_HORIZON = 90  # 批量预测天数，7/30天预测取前缀
+GOAL_MIN_RECORDS = 5  # 计算减重速率至少需要的记录数
+
+
+class WeightTrendModel:
+    """线性体重趋势模型：weight = intercept + slope * (日期 - base_date)"""
+    
+    __slots__ = ("slope", "intercept", "std_dev", "base_date", "last_date", "sample_count")
+    
+    def __init__(self, slope: float, intercept: float, std_dev: float,
+                 base_date: date, last_date: date, sample_count: int):
+        self.slope = slope
+        self.intercept = intercept
+        self.std_dev = std_dev
+        self.base_date = base_date
+        self.last_date = last_date
+        self.sample_count = sample_count
+    
+    def to_dict(self) -> dict:
+        return {
+            "slope": self.slope,
+            "intercept": self.intercept,
+            "std_dev": self.std_dev,
+            "base_date": self.base_date.isoformat(),
+            "last_date": self.last_date.isoformat(),
+            "sample_count": self.sample_count
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "WeightTrendModel":
+        return cls(
+            slope=data["slope"],
+            intercept=data["intercept"],
+            std_dev=data["std_dev"],
+            base_date=date.fromisoformat(data["base_date"]),
+            last_date=date.fromisoformat(data["last_date"]),
+            sample_count=data["sample_count"]
+        )
+
+
+def load_weight_series(db: Session, user_id: int) -> Tuple[List[date], np.ndarray]:
+    """按日期升序读取用户的体重序列（只查询两列，不构造ORM对象）"""
+    rows = db.query(WeightRecord.record_date, WeightRecord.weight).filter(
+        WeightRecord.user_id == user_id
+    ).order_by(WeightRecord.record_date).all()
+    
+    dates = [row[0] for row in rows]
+    weights = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    return dates, weights
+
+
+def fit_weight_trend(dates: List[date], weights: np.ndarray) -> Optional[WeightTrendModel]:
+    """
+    闭式最小二乘拟合：slope = cov(x, y) / var(x)
+    
+    所有记录在同一天时斜率为0；置信区间使用残差的标准差
+    """
+    if len(dates) < MIN_RECORDS:
+        return None
+    
+    base_date = dates[0]
+    x = np.fromiter(((d - base_date).days for d in dates), dtype=np.float64, count=len(dates))
+    y = weights
+    
+    x_mean = x.mean()
+    y_mean = y.mean()
+    x_centered = x - x_mean
+    var_x = np.dot(x_centered, x_centered)
+    slope = float(np.dot(x_centered, y - y_mean) / var_x) if var_x > 0 else 0.0
+    intercept = float(y_mean - slope * x_mean)
+    
+    residuals = y - (intercept + slope * x)
+    std_dev = float(np.std(residuals))
+    
+    return WeightTrendModel(slope, intercept, std_dev, base_date, dates[-1], len(dates))
+
+
+def get_weight_trend_model(db: Session, user_id: int) -> Optional[WeightTrendModel]:
+    """获取用户的趋势模型：优先读取Redis缓存，未命中时拟合并写入缓存"""
+    redis_client = get_redis()
+    cache_key = MODEL_CACHE_KEY.format(user_id=user_id)
+    
+    try:
+        cached = redis_client.get(cache_key)
+        if cached:
+            data = json.loads(cached)
+            return WeightTrendModel.from_dict(data) if data else None
+    except Exception as e:
+        logger.warning(f"读取体重模型缓存失败: {e}")
+    
+    dates, weights = load_weight_series(db, user_id)
+    model = fit_weight_trend(dates, weights)
+    
+    try:
+        # 数据不足时也缓存空结果，避免重复查询
+        redis_client.setex(cache_key, MODEL_CACHE_TTL, json.dumps(model.to_dict() if model else None))
+    except Exception as e:
+        logger.warning(f"写入体重模型缓存失败: {e}")
+    
+    return model
+
+
+def invalidate_weight_trend_model(user_id: int):
+    """体重记录变化后清除模型缓存和批量预测结果（之后按需重新拟合）"""
+    get_redis().delete(
+        MODEL_CACHE_KEY.format(user_id=user_id),
+        FORECAST_CACHE_KEY.format(user_id=user_id)
+    )
+
+
+def get_precomputed_predictions(user_id: int, days: int) -> Optional[List[WeightPrediction]]:
+    """读取批量任务预先计算的预测结果，未命中返回 None"""
+    if days <= 0:
+        # 与按需计算一致：不预测
+        return []
+    if days > FORECAST_HORIZON:
+        return None
+    try:
+        cached = get_redis().hget(FORECAST_CACHE_KEY.format(user_id=user_id), "predictions")
+    except Exception as e:
+        logger.warning(f"读取批量预测结果失败: {e}")
+        return None
+    if cached is None:
+        return None
+    
+    return [
+        WeightPrediction(
+            date=predict_date,
+            predicted_weight=predicted_weight,
+            confidence_interval_lower=lower,
+            confidence_interval_upper=upper
+        )
+        for predict_date, predicted_weight, lower, upper in json.loads(cached)[:days]
+    ]
+
+
+def compute_goal_daily_change(dates: List[date], weights: np.ndarray, today: date) -> Optional[float]:
+    """
+    按记录频率选择时间窗口，计算平均每天的体重变化（负数表示在减重）
+    
+    - 记录频率 >= 0.7（约每天都记录）使用最近60天，>= 0.4 使用最近45天，否则30天
+    - 窗口内少于5条记录时回退到全部数据
+    """
+    if len(dates) < MIN_RECORDS:
+        return None
+    total_days = (dates[-1] - dates[0]).days
+    if total_days <= 0:
+        return None
+    
+    record_frequency = len(dates) / total_days
+    if record_frequency >= 0.7:
+        days_range = 60
+    elif record_frequency >= 0.4:
+        days_range = 45
+    else:
+        days_range = 30
+    
+    window_start = today - timedelta(days=days_range)
+    first_index = bisect_left(dates, window_start)
+    if len(dates) - first_index < GOAL_MIN_RECORDS:
+        if len(dates) < GOAL_MIN_RECORDS:
+            return None
+        first_index = 0
+    
+    days_span = (dates[-1] - dates[first_index]).days
+    if days_span <= 0:
+        return None
+    return float((weights[-1] - weights[first_index]) / days_span)
+
+
+def read_cached_goal_daily_change(user_id: int, today: date) -> Tuple[bool, Optional[float]]:
+    """读取当天已计算的减重速率，返回 (是否命中, 速率)"""
+    cache_key = FORECAST_CACHE_KEY.format(user_id=user_id)
+    try:
+        computed_on, cached = get_redis().hmget(cache_key, "computed_on", "goal_daily_change")
+        if computed_on == today.isoformat() and cached is not None:
+            return True, float(cached) if cached else None
+    except Exception as e:
+        logger.warning(f"读取减重速率缓存失败: {e}")
+    return False, None
+
+
+def cache_goal_daily_change(user_id: int, today: date, daily_change: Optional[float]):
+    """写回按需计算的减重速率"""
+    cache_key = FORECAST_CACHE_KEY.format(user_id=user_id)
+    try:
+        redis_client = get_redis()
+        redis_client.hset(cache_key, mapping={
+            "computed_on": today.isoformat(),
+            "goal_daily_change": "" if daily_change is None else daily_change
+        })
+        redis_client.expire(cache_key, MODEL_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"写入减重速率缓存失败: {e}")
+
+
+def get_goal_daily_change(db: Session, user_id: int, today: Optional[date] = None) -> Optional[float]:
+    """获取减重速率：优先读取当天的批量结果，否则按需计算并写回"""
+    today = today or date.today()
+    hit, daily_change = read_cached_goal_daily_change(user_id, today)
+    if hit:
+        return daily_change
+    
+    dates, weights = load_weight_series(db, user_id)
+    daily_change = compute_goal_daily_change(dates, weights, today)
+    cache_goal_daily_change(user_id, today, daily_change)
+    return daily_change
+
+
+def estimate_days_to_goal(weight_to_goal: Optional[float], daily_change: Optional[float]) -> Optional[int]:
+    """根据减重速率估算达到目标的天数（限制在1-1000天，超过则不显示）"""
+    if not weight_to_goal or weight_to_goal <= 0 or daily_change is None or daily_change >= 0:
+        return None
+    days = int(abs(weight_to_goal / daily_change))
+    if days < 1:
+        return 1
+    if days > 1000:
+        return None
+    return days
+
+
+def forecast_weights(model: WeightTrendModel, days: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    一次数组运算预测未来 days 天的体重
+    
+    :return: (距最后记录日的天数 1..days, 预测体重)
+    """
+    offsets = np.arange(1, days + 1, dtype=np.float64)
+    x = (model.last_date - model.base_date).days + offsets
+    return offsets, model.intercept + model.slope * x
+
 
 async def predict_weight_trend(db: Session, user_id: int, days: int) -> List[WeightPrediction]:
     """
     基于历史数据预测未来体重趋势
-    使用线性回归模型进行简单预测
+    使用线性回归模型进行简单预测，优先读取夜间批量任务的结果
     """
-    # 获取用户的历史体重记录（最近90天）
-    records = db.query(WeightRecord).filter(
-        WeightRecord.user_id == user_id
-    ).order_by(WeightRecord.record_date).all()
+    precomputed = get_precomputed_predictions(user_id, days)
+    if precomputed is not None:
+        return precomputed
     
-    if len(records) < 3:
+    model = get_weight_trend_model(db, user_id)
+    if model is None or days <= 0:
         # 数据不足，无法预测
         return []
     
-    # 准备训练数据
-    dates = []
-    weights = []
-    base_date = records[0].record_date
-    
-    for record in records:
-        days_diff = (record.record_date - base_date).days
-        dates.append(days_diff)
-        weights.append(record.weight)
-    
-    # 转换为numpy数组
-    X = np.array(dates).reshape(-1, 1)
-    y = np.array(weights)
-    
-    # 训练线性回归模型
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    # 预测未来体重
-    predictions = []
-    last_record_date = records[-1].record_date
-    
-    for i in range(1, days + 1):
-        predict_date = last_record_date + timedelta(days=i)
-        days_diff = (predict_date - base_date).days
-        
-        predicted_weight = model.predict([[days_diff]])[0]
-        
-        # 计算置信区间（简化版，使用标准差）
-        residuals = y - model.predict(X)
-        std_dev = np.std(residuals)
-        
-        predictions.append(WeightPrediction(
-            date=predict_date,
-            predicted_weight=round(predicted_weight, 2),
-            confidence_interval_lower=round(predicted_weight - 1.96 * std_dev, 2),
-            confidence_interval_upper=round(predicted_weight + 1.96 * std_dev, 2)
-        ))
+    offsets, predicted = forecast_weights(model, days)
+    margin = 1.96 * model.std_dev
+    predicted_list = np.round(predicted, 2).tolist()
+    lower_list = np.round(predicted - margin, 2).tolist()
+    upper_list = np.round(predicted + margin, 2).tolist()
     
-    return predictions
+    return [
+        WeightPrediction(
+            date=model.last_date + timedelta(days=int(offset)),
+            predicted_weight=predicted_weight,
+            confidence_interval_lower=lower,
+            confidence_interval_upper=upper
+        )
+        for offset, predicted_weight, lower, upper in zip(offsets, predicted_list, lower_list, upper_list)
+    ]
 
 
 async def calculate_bmi(weight: float, height: float) -> float:
@@ -0,0 +1,154 @@
+"""
+每日营养汇总（daily_nutrition_summary）维护服务
+
+每个 (user_id, date) 一行：摄入热量和三大营养素、运动消耗和时长、饮水量、睡眠时长。
+饮食/运动/饮水/睡眠的所有写入（包括小米同步导入）都会调用
+daily_rollup_service.mark_daily_history_dirty_many，在那里同步刷新受影响日期的汇总行：
+一条 UNION ALL 分组查询 + 一条 INSERT ... ON DUPLICATE KEY UPDATE。
+
+热量趋势、营养分析、用户详情直接读取汇总表，365天趋势只需读取365行。
+"""
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, func, literal, null, select, tuple_, type_coerce, union_all
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+
+from app.models.daily_nutrition_summary import DailyNutritionSummary
+from app.models.diet import DietRecord
+from app.models.exercise import ExerciseRecord
+from app.models.sleep import SleepRecord
+from app.models.user import User
+from app.models.water import WaterRecord
+
+logger = logging.getLogger(__name__)
+
+DayKey = Tuple[int, date]
+
+SUMMARY_FIELDS = (
+    "intake_calories", "protein", "carbs", "fat",
+    "exercise_calories", "exercise_duration", "water", "sleep_duration"
+)
+REBUILD_USER_BATCH = 200  # 全量回填时每批处理的用户数
+
+
+def _null():
+    return type_coerce(null(), Float)
+
+
+def _aggregate_query(day_filter):
+    """按 (user_id, record_date) 分组汇总四张子表，day_filter(model) 返回过滤条件"""
+    diet = select(
+        literal("diet").label("kind"), DietRecord.user_id, DietRecord.record_date,
+        func.sum(DietRecord.calories).label("v1"), func.sum(DietRecord.protein).label("v2"),
+        func.sum(DietRecord.carbs).label("v3"), func.sum(DietRecord.fat).label("v4")
+    ).where(day_filter(DietRecord)).group_by(DietRecord.user_id, DietRecord.record_date)
+
+    exercise = select(
+        literal("exercise"), ExerciseRecord.user_id, ExerciseRecord.record_date,
+        func.sum(ExerciseRecord.calories), func.sum(ExerciseRecord.duration),
+        _null(), _null()
+    ).where(day_filter(ExerciseRecord)).group_by(ExerciseRecord.user_id, ExerciseRecord.record_date)
+
+    water = select(
+        literal("water"), WaterRecord.user_id, WaterRecord.record_date,
+        func.sum(WaterRecord.amount), _null(), _null(), _null()
+    ).where(day_filter(WaterRecord)).group_by(WaterRecord.user_id, WaterRecord.record_date)
+
+    sleep = select(
+        literal("sleep"), SleepRecord.user_id, SleepRecord.record_date,
+        func.sum(SleepRecord.duration), _null(), _null(), _null()
+    ).where(day_filter(SleepRecord)).group_by(SleepRecord.user_id, SleepRecord.record_date)
+
+    return union_all(diet, exercise, water, sleep)
+
+
+def _empty_summary() -> Dict[str, float]:
+    return {field: 0 for field in SUMMARY_FIELDS}
+
+
+def _collect(rows, summaries: Dict[DayKey, Dict[str, float]]):
+    """把分组查询结果合并到每天的汇总字段"""
+    for row in rows:
+        summary = summaries.setdefault((row.user_id, row.record_date), _empty_summary())
+        if row.kind == "diet":
+            summary["intake_calories"] = float(row.v1 or 0)
+            summary["protein"] = float(row.v2 or 0)
+            summary["carbs"] = float(row.v3 or 0)
+            summary["fat"] = float(row.v4 or 0)
+        elif row.kind == "exercise":
+            summary["exercise_calories"] = float(row.v1 or 0)
+            summary["exercise_duration"] = int(row.v2 or 0)
+        elif row.kind == "water":
+            summary["water"] = float(row.v1 or 0)
+        elif row.kind == "sleep":
+            summary["sleep_duration"] = float(row.v1 or 0)
+
+
+def _upsert(db: Session, summaries: Dict[DayKey, Dict[str, float]]):
+    """批量写入汇总行（一条 INSERT ... ON DUPLICATE KEY UPDATE）"""
+    if not summaries:
+        return
+    values = [
+        {"user_id": user_id, "record_date": record_date, **fields}
+        for (user_id, record_date), fields in summaries.items()
+    ]
+    stmt = insert(DailyNutritionSummary).values(values)
+    stmt = stmt.on_duplicate_key_update({field: stmt.inserted[field] for field in SUMMARY_FIELDS})
+    db.execute(stmt)
+
+
+def refresh_nutrition_summaries(db: Session, keys: Iterable[DayKey]):
+    """
+    重算一批 (user_id, date) 的营养汇总并提交
+
+    没有任何记录的日期写入全 0 行（记录被全部删除时覆盖旧值）
+    """
+    keys = list(set(keys))
+    if not keys:
+        return
+
+    summaries = {key: _empty_summary() for key in keys}
+    rows = db.execute(_aggregate_query(
+        lambda model: tuple_(model.user_id, model.record_date).in_(keys)
+    )).all()
+    _collect(rows, summaries)
+    _upsert(db, summaries)
+    db.commit()
+
+
+def rebuild_nutrition_summaries(db: Session) -> int:
+    """
+    全量回填所有用户的营养汇总（建表后或数据修复时执行）
+
+    :return: 写入的天数
+    """
+    user_ids = [row.id for row in db.query(User.id).order_by(User.id).all()]
+    written = 0
+    for i in range(0, len(user_ids), REBUILD_USER_BATCH):
+        batch = user_ids[i:i + REBUILD_USER_BATCH]
+        summaries: Dict[DayKey, Dict[str, float]] = {}
+        _collect(db.execute(_aggregate_query(lambda model: model.user_id.in_(batch))).all(), summaries)
+        _upsert(db, summaries)
+        db.commit()
+        written += len(summaries)
+    logger.info(f"营养汇总回填完成: {written} 天")
+    return written
+
+
+def summary_range_query(user_id: int, start_date: date, end_date: Optional[date] = None):
+    """读取用户某个日期范围内的汇总行（同步、异步会话通用）"""
+    query = select(DailyNutritionSummary).where(
+        DailyNutritionSummary.user_id == user_id,
+        DailyNutritionSummary.record_date >= start_date
+    )
+    if end_date:
+        query = query.where(DailyNutritionSummary.record_date <= end_date)
+    return query.order_by(DailyNutritionSummary.record_date.asc())
+
+
+def get_summaries(db: Session, user_id: int, start_date: date, end_date: Optional[date] = None) -> List[DailyNutritionSummary]:
+    """读取汇总行（按日期升序）"""
+    return db.execute(summary_range_query(user_id, start_date, end_date)).scalars().all()
@@ -6,7 +6,22 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.data_sync import DataSyncConfig
 from app.services.data_sync_service import DataSyncService
+from app.services.daily_rollup_service import flush_dirty_days
+from app.services.forecast_batch_service import run_forecast_batch
+from app.services.food_search_index import sync_food_search_index
+from app.services.food_random_service import rebuild_random_pools
+from app.services.food_cache import warm_food_cache
+from app.core.config import get_settings
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+DAILY_ROLLUP_JOB_ID = "daily_rollup_flush"
+FORECAST_BATCH_JOB_ID = "forecast_batch"
+FOOD_INDEX_JOB_ID = "food_search_index_sync"
+FOOD_RANDOM_JOB_ID = "food_random_pools"
+FOOD_CACHE_WARM_JOB_ID = "food_cache_warm"
 
 
 class SchedulerService:
@@ -35,14 +50,15 @@ class SchedulerService:
         db: Session = next(get_db())
         try:
             sync_service = DataSyncService(db)
-            # 执行自动同步，使用配置的同步天数
+            # 执行自动同步，使用配置的同步天数，已同步过的部分按游标增量拉取
             sync_service.sync_data(
                 user_id=user_id,
                 data_source=data_source,
                 data_type=data_type,
                 sync_type="auto",
                 days=sync_days,
-                sync_yesterday=sync_yesterday
+                sync_yesterday=sync_yesterday,
+                incremental=True
             )
             
             # 更新最后同步时间
@@ -53,6 +69,110 @@ class SchedulerService:
         finally:
             db.close()
     
+    def _daily_rollup_task(self):
+        """后台汇总任务：批量重算被标记的每日历史数据"""
+        db: Session = next(get_db())
+        try:
+            # 一轮处理不完时继续处理，直到没有已过防抖时间的脏日期
+            while flush_dirty_days(db) > 0:
+                pass
+        except Exception as e:
+            logger.error(f"每日历史汇总失败: {e}")
+        finally:
+            db.close()
+    
+    def add_daily_rollup_job(self):
+        """添加每日历史汇总任务"""
+        self._scheduler.add_job(
+            func=self._daily_rollup_task,
+            trigger=IntervalTrigger(seconds=get_settings().DAILY_ROLLUP_INTERVAL_SECONDS),
+            id=DAILY_ROLLUP_JOB_ID,
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    def _forecast_batch_task(self):
+        """夜间批量体重预测任务"""
+        db: Session = next(get_db())
+        try:
+            run_forecast_batch(db)
+        except Exception as e:
+            logger.error(f"批量体重预测失败: {e}")
+        finally:
+            db.close()
+    
+    def add_forecast_batch_job(self):
+        """添加夜间批量体重预测任务"""
+        settings = get_settings()
+        self._scheduler.add_job(
+            func=self._forecast_batch_task,
+            trigger=CronTrigger(hour=settings.FORECAST_BATCH_HOUR, minute=settings.FORECAST_BATCH_MINUTE),
+            id=FORECAST_BATCH_JOB_ID,
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    def _food_index_task(self):
+        """食物检索索引构建/增量同步任务"""
+        db: Session = next(get_db())
+        try:
+            sync_food_search_index(db)
+        finally:
+            db.close()
+    
+    def add_food_index_job(self):
+        """添加食物检索索引任务（启动后立即构建一次，之后定时增量同步）"""
+        self._scheduler.add_job(
+            func=self._food_index_task,
+            trigger=IntervalTrigger(seconds=get_settings().FOOD_INDEX_SYNC_SECONDS),
+            id=FOOD_INDEX_JOB_ID,
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    def _food_random_task(self):
+        """重新打乱食物随机推荐列表"""
+        db: Session = next(get_db())
+        try:
+            rebuild_random_pools(db)
+        except Exception as e:
+            logger.error(f"更新食物随机列表失败: {e}")
+        finally:
+            db.close()
+    
+    def add_food_random_job(self):
+        """添加食物随机列表任务（启动后立即生成一次，之后定时重新打乱）"""
+        self._scheduler.add_job(
+            func=self._food_random_task,
+            trigger=IntervalTrigger(seconds=get_settings().FOOD_RANDOM_REFRESH_SECONDS),
+            id=FOOD_RANDOM_JOB_ID,
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    def _food_cache_warm_task(self):
+        """预热食物缓存"""
+        db: Session = next(get_db())
+        try:
+            warm_food_cache(db)
+        finally:
+            db.close()
+    
+    def add_food_cache_warm_job(self):
+        """添加食物缓存预热任务（启动后执行一次）"""
+        self._scheduler.add_job(
+            func=self._food_cache_warm_task,
+            id=FOOD_CACHE_WARM_JOB_ID,
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+    
     def add_job(self, config: DataSyncConfig):
         """
         添加定时任务
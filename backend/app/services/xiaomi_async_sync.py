@@ -0,0 +1,219 @@
+"""
+小米运动健康数据并发拉取
+
+XiaomiDataSyncService 按 next_key 逐页串行请求，首次全量同步（从1970年开始）是一长串签名请求，耗时取决于往返延迟。
+这里把时间范围切成互不依赖的窗口（默认30天）并发拉取：
+- 每个窗口内部仍按 next_key 翻页，同时进行的请求数受 XIAOMI_SYNC_CONCURRENCY 限制
+- 每个授权记录复用一个连接池（httpx.AsyncClient），多次同步之间保持长连接
+- 多个窗口同时遇到 token 过期时只刷新一次，其余窗口用新凭证重试
+- 刷新 token 在工作线程中使用独立的短期数据库会话，不与调用方入库用的会话交叉使用
+
+同步代码（定时任务线程、BackgroundTasks）通过 iter_pages_blocking 调用，
+协程在独立的后台事件循环中执行，连接池因此可以跨请求、跨线程复用。
+每拉到一页就交给调用方入库，页队列有上限，调用方入库慢时拉取自动暂停，内存占用与时间范围无关。
+"""
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.services.xiaomi_data_sync import DATA_TYPES, XiaomiDataSyncService, XiaomiTokenExpired
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_DONE = object()  # 流式拉取结束标记
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """后台事件循环（懒创建，守护线程）"""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="xiaomi-sync", daemon=True).start()
+    return _loop
+
+
+def _get_client(key: str) -> httpx.AsyncClient:
+    """按授权记录复用的连接池（只在后台事件循环中使用）"""
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = _clients[key] = httpx.AsyncClient(
+            timeout=60.0,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=settings.XIAOMI_SYNC_CONCURRENCY,
+                max_keepalive_connections=settings.XIAOMI_SYNC_CONCURRENCY
+            )
+        )
+    return client
+
+
+async def close_http_clients():
+    """应用关闭时释放连接池并停止后台事件循环"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+
+    async def _close():
+        for client in list(_clients.values()):
+            await client.aclose()
+        _clients.clear()
+
+    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_close(), _loop))
+    _loop.call_soon_threadsafe(_loop.stop)
+    _loop = None
+
+
+def split_windows(start_time: datetime, end_time: datetime) -> List[Tuple[int, int]]:
+    """
+    把时间范围切分为首尾相接、互不重叠的窗口（秒级时间戳，闭区间）
+
+    早于 XIAOMI_SYNC_EARLIEST_YEAR 的部分不会有数据，合并为一个窗口，避免全量同步时发出几百个空请求。
+    """
+    start = int(start_time.timestamp())
+    end = int(end_time.timestamp())
+    step = max(settings.XIAOMI_SYNC_WINDOW_DAYS, 1) * 86400
+    earliest = int(datetime(settings.XIAOMI_SYNC_EARLIEST_YEAR, 1, 1).timestamp())
+
+    windows = []
+    if start < earliest < end:
+        windows.append((start, earliest - 1))
+        start = earliest
+    while start <= end:
+        window_end = min(start + step - 1, end)
+        windows.append((start, window_end))
+        start = window_end + 1
+    return windows
+
+
+class AsyncXiaomiDataSyncService(XiaomiDataSyncService):
+    """小米数据同步服务（异步、按时间窗口并发拉取）"""
+
+    def __init__(self, token: str, ssecurity: str, cookies: str, auth_id: int = None):
+        self._set_credentials(token, ssecurity, cookies)
+        self.auth_id = auth_id
+        self.db = None  # 只在刷新token时临时设置，见 _refresh_token_isolated
+        self._client_key = str(auth_id) if auth_id else f"user:{self.user_id}"
+        self._refresh_lock = asyncio.Lock()
+        self._generation = 0  # 每刷新一次token加一
+        self._refresh_error: Optional[str] = None
+
+    def _refresh_token_isolated(self) -> bool:
+        """
+        在工作线程中刷新token
+        调用方的会话同时在另一个线程里逐页入库，Session 不是线程安全的，这里用独立的短期会话读写授权记录
+        """
+        db = SessionLocal()
+        try:
+            self.db = db
+            return self._refresh_token()
+        finally:
+            self.db = None
+            db.close()
+
+    async def _arequest(self, endpoint: str, params: str) -> Dict:
+        """发送请求（token过期时刷新后重试一次）"""
+        url = f"{self._get_fitness_url()}{endpoint}"
+        for attempt in range(2):
+            generation = self._generation
+            signed_nonce, request_data, headers = self._build_request(endpoint, params)
+            response = await _get_client(self._client_key).post(url, data=request_data, headers=headers)
+            try:
+                return self._decode_response(signed_nonce, response.status_code, response.text)
+            except XiaomiTokenExpired as e:
+                if attempt:
+                    raise Exception(f"Token过期且刷新失败: {e}")
+                async with self._refresh_lock:
+                    if self._refresh_error:
+                        raise Exception(self._refresh_error)
+                    # 其他窗口已经刷新过时直接用新凭证重试
+                    if self._generation == generation:
+                        logger.info(f"小米token过期，刷新后重试: auth_id={self.auth_id}")
+                        # 刷新过程是同步的（登录请求+数据库写入），放到线程中执行，不阻塞其他窗口
+                        if not await asyncio.to_thread(self._refresh_token_isolated):
+                            self._refresh_error = f"Token过期且刷新失败: {e}"
+                            raise Exception(self._refresh_error)
+                        self._generation += 1
+
+    async def _iter_window(
+        self,
+        data_type: str,
+        start: int,
+        end: int,
+        limit: asyncio.Semaphore
+    ) -> AsyncIterator[List[Dict]]:
+        """逐页产出一个窗口内的原始数据（窗口内按 next_key 翻页）"""
+        endpoint, key, list_field = DATA_TYPES[data_type]
+        params = {"start_time": start, "end_time": end}
+        if key:
+            params["key"] = key
+
+        while True:
+            async with limit:
+                result = await self._arequest(endpoint, json.dumps(params))
+            yield result.get(list_field, [])
+            next_key = result.get('next_key', '') if result.get('has_more', False) else ''
+            if not next_key:
+                return
+            params["next_key"] = next_key
+
+    async def _stream(self, data_type: str, start_time: datetime, end_time: datetime, queue: asyncio.Queue):
+        """并发拉取各窗口，把解析后的页放入队列；结束时放入结束标记，出错时放入异常"""
+        limit = asyncio.Semaphore(settings.XIAOMI_SYNC_CONCURRENCY)
+
+        async def produce(start: int, end: int):
+            async for items in self._iter_window(data_type, start, end, limit):
+                await queue.put(self._parse_page(data_type, items))
+
+        tasks = [asyncio.ensure_future(produce(start, end)) for start, end in split_windows(start_time, end_time)]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            # 某个窗口失败时其余窗口不再继续
+            for task in tasks:
+                task.cancel()
+            await queue.put(e)
+            return
+        finally:
+            # 调用方提前退出时本协程被取消，连带取消尚未完成的窗口
+            for task in tasks:
+                task.cancel()
+        await queue.put(_DONE)
+
+    def iter_pages_blocking(self, data_type: str, start_time: datetime, end_time: datetime) -> Iterator[List[Dict]]:
+        """
+        并发拉取并逐页产出记录（供同步代码调用）
+
+        页的顺序取决于各窗口的完成先后，不保证按时间排序；窗口之间不重叠，重复数据由入库时的 data_hash 去重。
+        """
+        if data_type not in DATA_TYPES:
+            raise Exception(f"不支持的数据类型: {data_type}")
+        loop = _get_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.XIAOMI_SYNC_CONCURRENCY * 2)
+        producer = asyncio.run_coroutine_threadsafe(self._stream(data_type, start_time, end_time, queue), loop)
+        try:
+            while True:
+                page = asyncio.run_coroutine_threadsafe(queue.get(), loop).result()
+                if page is _DONE:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            producer.cancel()
+
+    def close(self):
+        """连接池按授权记录共享，由 close_http_clients 统一释放"""
+        pass
@@ -6,12 +6,26 @@ import time
 import os
 import struct
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 import httpx
 from Crypto.Cipher import ARC4
 from app.services.xiaomi_auth import XiaomiAuth
 
 
+# 数据类型 -> (接口, key参数, 结果列表字段)
+DATA_TYPES: Dict[str, Tuple[str, Optional[str], str]] = {
+    "sleep": ("/app/v1/data/get_fitness_data_by_time", "sleep", "data_list"),
+    "weight": ("/app/v1/data/get_fitness_data_by_time", "weight", "data_list"),
+    "steps": ("/app/v1/data/get_fitness_data_by_time", "steps", "data_list"),
+    "exercise": ("/app/v1/data/get_sport_records_by_time", None, "sport_records"),
+}
+
+
+class XiaomiTokenExpired(Exception):
+    """小米API返回token过期（code=3, auth err）"""
+    pass
+
+
 class XiaomiDataSyncService:
     """小米数据同步服务"""
     
@@ -24,15 +38,19 @@ class XiaomiDataSyncService:
         :param auth_id: 授权记录ID（用于token刷新）
         :param db_session: 数据库会话（用于token刷新）
         """
+        self._set_credentials(token, ssecurity, cookies)
+        self.auth_id = auth_id
+        self.db = db_session
+        self.client = httpx.Client(timeout=60.0, verify=False)
+    
+    def _set_credentials(self, token: str, ssecurity: str, cookies: str):
+        """设置登录凭证（初始化和刷新token时使用）"""
         self.token = token
         self.ssecurity = base64.b64decode(ssecurity)  # 解码ssecurity
         self.cookies = cookies
-        self.auth_id = auth_id
-        self.db = db_session
         user_id, pass_token = token.split(':', 1)
         self.user_id = int(user_id)
         self.pass_token = pass_token
-        self.client = httpx.Client(timeout=60.0, verify=False)
     
     def _get_fitness_url(self, region: str = "") -> str:
         """获取健康数据API基础URL"""
@@ -40,12 +58,6 @@ class XiaomiDataSyncService:
             return f"https://{region}.hlth.io.mi.com"
         return "https://hlth.io.mi.com"
     
-    def _calculate_data_hash(self, data: Dict) -> str:
-        """计算数据哈希值（用于防重）"""
-        # 使用数据的关键字段生成唯一哈希
-        hash_str = json.dumps(data, sort_keys=True)
-        return hashlib.sha256(hash_str.encode()).hexdigest()
-    
     def _generate_nonce(self) -> bytes:
         """
         生成nonce（随机8字节 + 4字节时间戳）
@@ -138,12 +150,7 @@ class XiaomiDataSyncService:
             result = xiaomi_auth.login_with_token(self.token)
             
             # 更新token信息
-            self.token = result['token']
-            self.ssecurity = base64.b64decode(result['ssecurity'])
-            self.cookies = result['cookies']
-            user_id, pass_token = self.token.split(':', 1)
-            self.user_id = int(user_id)
-            self.pass_token = pass_token
+            self._set_credentials(result['token'], result['ssecurity'], result['cookies'])
             
             # 更新数据库
             auth.token = result['token']
@@ -161,13 +168,12 @@ class XiaomiDataSyncService:
             traceback.print_exc()
             return False
     
-    def _request(self, url: str, endpoint: str, params: str, retry_on_401: bool = True) -> Dict:
+    def _build_request(self, endpoint: str, params: str) -> Tuple[bytes, Dict, Dict]:
         """
-        发送请求到小米API（完整实现Go版本的签名机制）
-        :param url: API基础URL
+        生成签名后的请求（完整实现Go版本的签名机制）
         :param endpoint: API端点
         :param params: 请求参数（JSON字符串）
-        :return: 响应数据
+        :return: (signedNonce, 表单数据, 请求头)
         """
         # 1. 生成nonce（12字节）
         nonce = self._generate_nonce()
@@ -195,21 +201,68 @@ class XiaomiDataSyncService:
             'Cookie': self.cookies,
             'Content-Type': 'application/x-www-form-urlencoded'
         }
-        
-        full_url = f"{url}{endpoint}"
-        
         request_data = {
             'data': encrypted_data,
             'rc4_hash__': encrypted_hash,
             'signature': signature,
             '_nonce': base64.b64encode(nonce).decode()
         }
+        return signed_nonce, request_data, headers
+    
+    def _decode_response(self, signed_nonce: bytes, status_code: int, text: str) -> Dict:
+        """
+        解密并校验响应
+        :return: 响应中的result部分
+        :raises XiaomiTokenExpired: token过期（由调用方决定是否刷新后重试）
+        """
+        # 特殊处理：HTTP 401时，小米API直接返回明文JSON，不加密
+        if status_code == 401:
+            try:
+                result = json.loads(text)
+            except json.JSONDecodeError:
+                raise Exception(f"请求失败: {status_code}, 响应: {text}")
+            self._check_result(result, "HTTP 401, ")
+        
+        # 其他错误状态码
+        if status_code != 200:
+            raise Exception(f"请求失败: {status_code}, 响应: {text}")
+        
+        # RC4解密响应数据
+        try:
+            result = json.loads(self._rc4_decrypt(signed_nonce, text))
+        except Exception as e:
+            raise Exception(f"解密响应失败: {e}")
+        
+        # 检查响应code（解密成功后再检查）
+        self._check_result(result)
+        return result.get('result', result)
+    
+    @staticmethod
+    def _check_result(result: Dict, prefix: str = ""):
+        """检查响应code，code=3且message为auth err时表示token过期"""
+        error_code = result.get('code')
+        if error_code == 0:
+            return
+        error_msg = result.get('message', 'Unknown error')
+        if error_code == 3 and 'auth err' in error_msg.lower():
+            raise XiaomiTokenExpired(f"API返回错误 ({prefix}code={error_code}): {error_msg}")
+        raise Exception(f"API返回错误 ({prefix}code={error_code}): {error_msg}")
+    
+    def _request(self, url: str, endpoint: str, params: str, retry_on_401: bool = True) -> Dict:
+        """
+        发送请求到小米API
+        :param url: API基础URL
+        :param endpoint: API端点
+        :param params: 请求参数（JSON字符串）
+        :return: 响应数据
+        """
+        signed_nonce, request_data, headers = self._build_request(endpoint, params)
+        full_url = f"{url}{endpoint}"
         
         print(f"\n=== 小米API请求 ===")
         print(f"URL: {full_url}")
-        print(f"Nonce: {base64.b64encode(nonce).decode()}")
-        print(f"SignedNonce: {signed_nonce_b64}")
-        print(f"Signature: {signature}")
+        print(f"Nonce: {request_data['_nonce']}")
+        print(f"Signature: {request_data['signature']}")
         
         response = self.client.post(
             full_url,
@@ -219,75 +272,72 @@ class XiaomiDataSyncService:
         
         print(f"响应状态: {response.status_code}")
         print(f"响应内容长度: {len(response.text)}")
-        print(f"响应内容（前500字符）: {response.text[:500]}")
         
-        # 特殊处理：HTTP 401时，小米API直接返回明文JSON，不加密
-        if response.status_code == 401:
+        try:
+            return self._decode_response(signed_nonce, response.status_code, response.text)
+        except XiaomiTokenExpired as e:
+            if not retry_on_401:
+                raise
+            print(f"\n⚠️  检测到Token过期 ({e})")
+            # 尝试刷新token
+            if self._refresh_token():
+                print(f"✅ Token刷新成功，重试请求...")
+                # 重试请求（retry_on_401=False 防止无限循环）
+                return self._request(url, endpoint, params, retry_on_401=False)
+            print(f"❌ Token刷新失败")
+            raise Exception(f"Token过期且刷新失败: {e}")
+    
+    def _parse_record(self, data_type: str, item: Dict) -> Dict:
+        """
+        把接口返回的一条原始数据转换为记录（value字段为JSON字符串）
+        :param data_type: 数据类型（sleep/exercise/weight/steps）
+        """
+        value = json.loads(item['value'])
+        value['source_id'] = str(item.get('time', ''))
+        if data_type == "weight":
+            value['timestamp'] = item.get('time', 0)
+        elif data_type == "exercise":
+            value['category'] = item.get('category', '')
+        return value
+    
+    def _parse_page(self, data_type: str, items: List[Dict]) -> List[Dict]:
+        """解析一页原始数据，单条解析失败时跳过"""
+        records = []
+        for item in items:
             try:
-                result = json.loads(response.text)
-                error_code = result.get('code')
-                error_msg = result.get('message', 'Unknown error')
-                
-                # 检查是否为token过期错误
-                if error_code == 3 and 'auth err' in error_msg.lower() and retry_on_401:
-                    print(f"\n⚠️  检测到Token过期 (HTTP 401, code={error_code}, message={error_msg})")
-                    
-                    # 尝试刷新token
-                    if self._refresh_token():
-                        print(f"✅ Token刷新成功，重试请求...")
-                        # 重试请求（retry_on_401=False 防止无限循环）
-                        return self._request(url, endpoint, params, retry_on_401=False)
-                    else:
-                        print(f"❌ Token刷新失败")
-                        raise Exception(f"Token过期且刷新失败: {error_msg}")
-                else:
-                    raise Exception(f"API返回错误 (HTTP 401, code={error_code}): {error_msg}")
-            except json.JSONDecodeError:
-                raise Exception(f"请求失败: {response.status_code}, 响应: {response.text}")
+                records.append(self._parse_record(data_type, item))
+            except Exception as e:
+                print(f"解析{data_type}记录失败: {e}")
+        return records
+    
+    def iter_record_pages(self, data_type: str, start_time: datetime, end_time: datetime) -> Iterator[List[Dict]]:
+        """
+        按 next_key 逐页拉取记录，每拉到一页就解析并产出
         
-        # 其他错误状态码
-        if response.status_code != 200:
-            raise Exception(f"请求失败: {response.status_code}, 响应: {response.text}")
+        调用方处理完一页（入库）后才会请求下一页，内存占用只与单页大小有关，与时间范围无关。
+        :param data_type: 数据类型（sleep/exercise/weight/steps）
+        :param start_time: 开始时间
+        :param end_time: 结束时间
+        """
+        if data_type not in DATA_TYPES:
+            raise Exception(f"不支持的数据类型: {data_type}")
+        endpoint, key, list_field = DATA_TYPES[data_type]
         
-        # RC4解密响应数据
-        try:
-            response_text = response.text
-            decrypted_data = self._rc4_decrypt(signed_nonce, response_text)
-            print(f"\n=== 解密后的完整响应 ===")
-            print(f"解密数据长度: {len(decrypted_data)}")
-            print(f"解密数据: {decrypted_data}")
-            
-            result = json.loads(decrypted_data)
-            print(f"\n=== 解析后的JSON ===")
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            
-        except Exception as e:
-            print(f"解密失败: {e}")
-            import traceback
-            traceback.print_exc()
-            raise Exception(f"解密响应失败: {e}")
+        params = {
+            "start_time": int(start_time.timestamp()),
+            "end_time": int(end_time.timestamp())
+        }
+        if key:
+            params["key"] = key
         
-        # 检查响应code（解密成功后再检查）
-        if result.get('code') != 0:
-            error_code = result.get('code')
-            error_msg = result.get('message', 'Unknown error')
+        while True:
+            result = self._request(self._get_fitness_url(), endpoint, json.dumps(params))
+            yield self._parse_page(data_type, result.get(list_field, []))
             
-            # 检查是否为401错误（token过期）
-            if error_code == 3 and 'auth err' in error_msg.lower() and retry_on_401:
-                print(f"\n⚠️  检测到Token过期 (code={error_code}, message={error_msg})")
-                
-                # 尝试刷新token
-                if self._refresh_token():
-                    print(f"✅ Token刷新成功，重试请求...")
-                    # 重试请求（retry_on_401=False 防止无限循环）
-                    return self._request(url, endpoint, params, retry_on_401=False)
-                else:
-                    print(f"❌ Token刷新失败")
-                    raise Exception(f"Token过期且刷新失败: {error_msg}")
-            else:
-                raise Exception(f"API返回错误 (code={error_code}): {error_msg}")
-        
-        return result.get('result', result)
+            next_key = result.get('next_key', '') if result.get('has_more', False) else ''
+            if not next_key:
+                return
+            params["next_key"] = next_key
     
     def get_sleep_records(self, start_time: datetime, end_time: datetime) -> List[Dict]:
         """
@@ -296,66 +346,7 @@ class XiaomiDataSyncService:
         :param end_time: 结束时间
         :return: 睡眠记录列表
         """
-        import sys
-        print(f"\n========== 获取睡眠数据 ==========", flush=True)
-        print(f"开始时间: {start_time} ({int(start_time.timestamp())})", flush=True)
-        print(f"结束时间: {end_time} ({int(end_time.timestamp())})", flush=True)
-        sys.stdout.flush()
-        
-        params = json.dumps({
-            "start_time": int(start_time.timestamp()),
-            "end_time": int(end_time.timestamp()),
-            "key": "sleep"
-        })
-        
-        all_records = []
-        next_key = ""
-        
-        while True:
-            if next_key:
-                request_params = json.dumps({
-                    "start_time": int(start_time.timestamp()),
-                    "end_time": int(end_time.timestamp()),
-                    "key": "sleep",
-                    "next_key": next_key
-                })
-            else:
-                request_params = params
-            
-            result = self._request(
-                self._get_fitness_url(),
-                "/app/v1/data/get_fitness_data_by_time",
-                request_params
-            )
-            
-            print(f"\n小米API返回结果: {json.dumps(result, indent=2, ensure_ascii=False)}")
-            
-            for idx, item in enumerate(result.get('data_list', [])):
-                try:
-                    print(f"\n--- 原始记录 #{idx + 1} ---")
-                    print(f"完整item: {json.dumps(item, indent=2, ensure_ascii=False)}")
-                    
-                    value = json.loads(item['value'])
-                    print(f"解析后的value: {json.dumps(value, indent=2, ensure_ascii=False)}")
-                    
-                    value['data_hash'] = self._calculate_data_hash(item)
-                    value['source_id'] = str(item.get('time', ''))
-                    all_records.append(value)
-                except Exception as e:
-                    print(f"解析记录失败: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
-            
-            if not result.get('has_more', False):
-                break
-            
-            next_key = result.get('next_key', '')
-            if not next_key:
-                break
-        
-        print(f"\n总共获取到 {len(all_records)} 条睡眠记录")
-        return all_records
+        return [r for page in self.iter_record_pages("sleep", start_time, end_time) for r in page]
     
     def get_exercise_records(self, start_time: datetime, end_time: datetime) -> List[Dict]:
         """
@@ -364,48 +355,7 @@ class XiaomiDataSyncService:
         :param end_time: 结束时间
         :return: 运动记录列表
         """
-        params = json.dumps({
-            "start_time": int(start_time.timestamp()),
-            "end_time": int(end_time.timestamp())
-        })
-        
-        all_records = []
-        next_key = ""
-        
-        while True:
-            if next_key:
-                request_params = json.dumps({
-                    "start_time": int(start_time.timestamp()),
-                    "end_time": int(end_time.timestamp()),
-                    "next_key": next_key
-                })
-            else:
-                request_params = params
-            
-            result = self._request(
-                self._get_fitness_url(),
-                "/app/v1/data/get_sport_records_by_time",
-                request_params
-            )
-            
-            for item in result.get('sport_records', []):
-                try:
-                    value = json.loads(item.get('value', '{}'))
-                    value['data_hash'] = self._calculate_data_hash(item)
-                    value['source_id'] = str(item.get('time', ''))
-                    value['category'] = item.get('category', '')
-                    all_records.append(value)
-                except:
-                    continue
-            
-            if not result.get('has_more', False):
-                break
-            
-            next_key = result.get('next_key', '')
-            if not next_key:
-                break
-        
-        return all_records
+        return [r for page in self.iter_record_pages("exercise", start_time, end_time) for r in page]
     
     def get_weight_records(self, start_time: datetime, end_time: datetime) -> List[Dict]:
         """
@@ -414,63 +364,7 @@ class XiaomiDataSyncService:
         :param end_time: 结束时间
         :return: 体重记录列表
         """
-        print(f"\n========== 获取体重数据 ==========")
-        print(f"开始时间: {start_time} ({int(start_time.timestamp())})")
-        print(f"结束时间: {end_time} ({int(end_time.timestamp())})")
-        
-        params = json.dumps({
-            "start_time": int(start_time.timestamp()),
-            "end_time": int(end_time.timestamp()),
-            "key": "weight"
-        })
-        
-        all_records = []
-        next_key = ""
-        
-        while True:
-            if next_key:
-                request_params = json.dumps({
-                    "start_time": int(start_time.timestamp()),
-                    "end_time": int(end_time.timestamp()),
-                    "key": "weight",
-                    "next_key": next_key
-                })
-            else:
-                request_params = params
-            
-            result = self._request(
-                self._get_fitness_url(),
-                "/app/v1/data/get_fitness_data_by_time",
-                request_params
-            )
-            
-            print(f"\n小米API返回结果: {json.dumps(result, indent=2, ensure_ascii=False)}")
-            
-            for idx, item in enumerate(result.get('data_list', [])):
-                try:
-                    print(f"\n--- 原始记录 #{idx + 1} ---")
-                    print(f"完整item: {json.dumps(item, indent=2, ensure_ascii=False)}")
-                    
-                    value = json.loads(item['value'])
-                    print(f"解析后的value: {json.dumps(value, indent=2, ensure_ascii=False)}")
-                    
-                    value['data_hash'] = self._calculate_data_hash(item)
-                    value['source_id'] = str(item.get('time', ''))
-                    value['timestamp'] = item.get('time', 0)
-                    all_records.append(value)
-                except Exception as e:
-                    print(f"解析记录失败: {e}")
-                    continue
-            
-            if not result.get('has_more', False):
-                break
-            
-            next_key = result.get('next_key', '')
-            if not next_key:
-                break
-        
-        print(f"\n总共获取到 {len(all_records)} 条体重记录")
-        return all_records
+        return [r for page in self.iter_record_pages("weight", start_time, end_time) for r in page]
     
     def get_step_records(self, start_time: datetime, end_time: datetime) -> List[Dict]:
         """
@@ -479,29 +373,7 @@ class XiaomiDataSyncService:
         :param end_time: 结束时间
         :return: 步数记录列表
         """
-        params = json.dumps({
-            "start_time": int(start_time.timestamp()),
-            "end_time": int(end_time.timestamp()),
-            "key": "steps"
-        })
-        
-        result = self._request(
-            self._get_fitness_url(),
-            "/app/v1/data/get_fitness_data_by_time",
-            params
-        )
-        
-        records = []
-        for item in result.get('data_list', []):
-            try:
-                value = json.loads(item['value'])
-                value['data_hash'] = self._calculate_data_hash(item)
-                value['source_id'] = str(item.get('time', ''))
-                records.append(value)
-            except:
-                continue
-        
-        return records
+        return [r for page in self.iter_record_pages("steps", start_time, end_time) for r in page]
     
     def close(self):
         """关闭HTTP客户端"""
@@ -0,0 +1,59 @@
+"""
+外部数据防重标识
+
+同步的外部数据按 data_hash（16字节，BINARY(16) 唯一索引）防重，计算方式由 DATA_HASH_STRATEGY 配置：
+- identity（默认）：只对标识字段（用户、来源、数据类型、数据时间等）做摘要，与数据内容无关
+- content：对整条记录（规范化 JSON）做摘要，内容有任何变化都视为新记录
+
+MD5 在这里只用来生成定长的键，不涉及安全性。
+切换策略后需要用 rehash_external_data.py 重新计算已有数据的标识。
+"""
+import hashlib
+import json
+from typing import Callable, Dict, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def identity_fields(data_type: str, record: Dict) -> Tuple:
+    """
+    记录的标识字段（均取自同步时保存的记录，已入库的数据可以从 raw_data 重新计算）
+    - 数据时间：接口返回的 time（记录中的 source_id）
+    - 运动记录附加运动类型
+    - 步数按天累计，当天的记录会不断更新，附加步数后每次变化仍保留一条（与按内容防重时一致）
+    """
+    fields: Tuple = (record.get('source_id', ''),)
+    if data_type == "exercise":
+        fields += (record.get('category', ''),)
+    elif data_type == "steps":
+        fields += (record.get('step', 0),)
+    return fields
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.md5(key.encode(), usedforsecurity=False).digest()
+
+
+def identity_hash(user_id: int, data_source: str, data_type: str, record: Dict) -> bytes:
+    """按标识字段计算"""
+    fields = (user_id, data_source, data_type) + identity_fields(data_type, record)
+    return _digest("|".join(str(field) for field in fields))
+
+
+def content_hash(user_id: int, data_source: str, data_type: str, record: Dict) -> bytes:
+    """按整条记录计算"""
+    content = json.dumps(record, sort_keys=True, separators=(",", ":"))
+    return _digest(f"{user_id}|{data_source}|{data_type}|{content}")
+
+
+STRATEGIES: Dict[str, Callable[[int, str, str, Dict], bytes]] = {
+    "identity": identity_hash,
+    "content": content_hash,
+}
+
+
+def compute_data_hash(user_id: int, data_source: str, data_type: str, record: Dict) -> bytes:
+    """按配置的策略计算防重标识（16字节）"""
+    return STRATEGIES[settings.DATA_HASH_STRATEGY](user_id, data_source, data_type, record)
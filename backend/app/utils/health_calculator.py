@@ -4,6 +4,9 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.models.weight import WeightRecord
+from app.core.principal_cache import invalidate_user_principals
+from app.services import leaderboard_service
+from app.services.ml_service import invalidate_weight_trend_model
 
 
 def calculate_bmi(weight: float, height: float) -> float:
@@ -108,9 +111,21 @@ def update_user_health_stats(db: Session, user_id: int) -> bool:
             )
         
         db.commit()
-        return True
+        invalidate_user_principals(user_id)
         
     except Exception as e:
         print(f"更新用户健康数据失败: {str(e)}")
         db.rollback()
         return False
+    
+    # 体重记录变化后增量刷新减肥榜，并清除体重预测模型缓存
+    try:
+        leaderboard_service.refresh_user(db, user)
+    except Exception as e:
+        print(f"刷新减肥榜失败: {str(e)}")
+    try:
+        invalidate_weight_trend_model(user_id)
+    except Exception as e:
+        print(f"清除体重预测缓存失败: {str(e)}")
+    
+    return True
@@ -0,0 +1,410 @@
+"""
+Nuxt __NUXT__ 数据解码（纯 Python，不依赖 JS 运行时）
+
+Nuxt 2 服务端渲染页面把状态序列化为一个立即执行函数：
+
+    window.__NUXT__=(function(a,b,c){a.x=b;return {layout:"default",data:[{...}]}}(1,"米饭",null));
+
+这里实现一个只覆盖该格式的小型解析器：
+- 字面量：对象、数组、字符串（单/双引号及转义）、数字、true/false/null/undefined/void 0
+- 参数引用：函数形参替换为调用实参
+- 返回前的赋值语句：a.x=...、a["x"]=...、a[0]=...（devalue 用来表达重复引用）
+
+遇到不支持的语法时抛出 NuxtDecodeError。
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+__all__ = ["NuxtDecodeError", "decode_nuxt", "extract_nuxt_expression", "parse_nuxt_html"]
+
+NUXT_SCRIPT_PATTERN = re.compile(r'<script>window\.__NUXT__\s*=\s*(.*?)</script>', re.S)
+
+_IDENT_START = re.compile(r'[A-Za-z_$]')
+_IDENT = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*')
+_WHITESPACE = re.compile(r'(?:\s|/\*.*?\*/)*', re.S)
+_BLOCK_TOKEN = re.compile(r'[{}"\']')
+_STRING_STOP = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_NUMBER = re.compile(r'-?(?:0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)')
+_SIMPLE_ESCAPES = {
+    "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "v": "\v", "0": "\0",
+    "\\": "\\", "'": "'", '"': '"', "/": "/", "\n": "",
+}
+
+
+class _Undefined:
+    """JS 的 undefined，解码完成后按 JSON.stringify 的规则处理"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "undefined"
+
+
+_UNDEFINED = _Undefined()
+
+
+class NuxtDecodeError(ValueError):
+    """__NUXT__ 表达式不是支持的格式"""
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.scope: Dict[str, Any] = {}
+        self.saw_undefined = False
+
+    # ---------- 基础 ----------
+
+    def error(self, message: str):
+        snippet = self.text[self.pos:self.pos + 30]
+        raise NuxtDecodeError(f"{message}（位置 {self.pos}: {snippet!r}）")
+
+    def skip_ws(self):
+        # 压缩后的页面几乎没有空白，先做廉价判断
+        if self.pos < len(self.text) and self.text[self.pos] in " \t\r\n/":
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+    def peek(self) -> str:
+        self.skip_ws()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def expect(self, token: str):
+        self.skip_ws()
+        if not self.text.startswith(token, self.pos):
+            self.error(f"期望 {token!r}")
+        self.pos += len(token)
+
+    def accept(self, token: str) -> bool:
+        self.skip_ws()
+        if self.text.startswith(token, self.pos):
+            self.pos += len(token)
+            return True
+        return False
+
+    def identifier(self) -> str:
+        self.skip_ws()
+        match = _IDENT.match(self.text, self.pos)
+        if not match:
+            self.error("期望标识符")
+        self.pos = match.end()
+        return match.group()
+
+    # ---------- 顶层结构 ----------
+
+    def parse_program(self) -> Any:
+        """(function(形参){语句;return 值}(实参))"""
+        self.accept(";")
+        wrapped = self.accept("(")
+        self.expect("function")
+        self.accept_name()
+        self.expect("(")
+        params: List[str] = []
+        while not self.accept(")"):
+            params.append(self.identifier())
+            self.accept(",")
+
+        self.expect("{")
+        body_start = self.pos
+        self.skip_block()
+        body_end = self.pos - 1
+
+        # 调用实参：function(){...}(args) 或 (function(){...})(args)
+        if wrapped and self.accept(")"):
+            wrapped = False
+        self.expect("(")
+        args = []
+        while not self.accept(")"):
+            args.append(self.value())
+            self.accept(",")
+        if wrapped:
+            self.expect(")")
+        self.accept(";")
+        self.skip_ws()
+        if self.pos != len(self.text):
+            self.error("表达式后有多余内容")
+
+        if len(args) < len(params):
+            self.saw_undefined = True
+        self.scope = {name: args[i] if i < len(args) else _UNDEFINED for i, name in enumerate(params)}
+        return self.run_body(body_start, body_end)
+
+    def accept_name(self):
+        self.skip_ws()
+        if self.pos < len(self.text) and _IDENT_START.match(self.text[self.pos]):
+            self.identifier()
+
+    def skip_block(self):
+        """跳过函数体（匹配花括号，忽略字符串中的括号）"""
+        depth = 1
+        while True:
+            match = _BLOCK_TOKEN.search(self.text, self.pos)
+            if not match:
+                break
+            ch = match.group()
+            self.pos = match.start()
+            if ch in "\"'":
+                self.string()
+                continue
+            self.pos += 1
+            if ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return
+        self.error("函数体不完整")
+
+    def run_body(self, start: int, end: int) -> Any:
+        """执行函数体：若干赋值语句 + return"""
+        self.pos = start
+        while True:
+            self.skip_ws()
+            if self.pos >= end:
+                return None
+            if self.accept("return"):
+                result = self.value()
+                self.accept(";")
+                return result
+            self.assignment()
+            self.accept(";")
+
+    def assignment(self):
+        """a.x=值 / a["x"]=值 / a[0]=值"""
+        name = self.identifier()
+        if name not in self.scope:
+            self.error(f"未定义的变量 {name}")
+        target = self.scope[name]
+        key = self.member_key()
+        while True:
+            self.skip_ws()
+            if self.peek() in (".", "["):
+                target = self.get_member(target, key)
+                key = self.member_key()
+            else:
+                break
+        self.expect("=")
+        self.set_member(target, key, self.value())
+
+    def member_key(self):
+        if self.accept("."):
+            return self.identifier()
+        if self.accept("["):
+            key = self.value()
+            self.expect("]")
+            return key
+        self.error("期望属性访问")
+
+    @staticmethod
+    def get_member(target, key):
+        if isinstance(target, list):
+            if isinstance(key, int) or (isinstance(key, str) and key.isdigit()):
+                return target[int(key)]
+            return {}
+        return target[key if isinstance(key, str) else _number_key(key)]
+
+    def set_member(self, target, key, value):
+        if isinstance(target, list):
+            if not isinstance(key, int):
+                if not (isinstance(key, str) and key.isdigit()):
+                    # 数组上的非下标属性不会出现在 JSON 中
+                    return
+                key = int(key)
+            index = key
+            if index >= len(target):
+                self.saw_undefined = True
+                target.extend([_UNDEFINED] * (index + 1 - len(target)))
+            target[index] = value
+        elif isinstance(target, dict):
+            target[key if isinstance(key, str) else _number_key(key)] = value
+        else:
+            self.error("只能给对象或数组的成员赋值")
+
+    # ---------- 值 ----------
+
+    def value(self) -> Any:
+        ch = self.peek()
+        if not ch:
+            self.error("表达式不完整")
+        if ch == "{":
+            return self.obj()
+        if ch == "[":
+            return self.array()
+        if ch in "\"'":
+            return self.string()
+        if ch == "-" or ch == "." or ch.isdigit():
+            return self.number()
+        if ch and _IDENT_START.match(ch):
+            return self.word()
+        self.error("无法识别的值")
+
+    def obj(self) -> Dict[str, Any]:
+        self.expect("{")
+        result: Dict[str, Any] = {}
+        while not self.accept("}"):
+            ch = self.peek()
+            if ch and ch in "\"'":
+                key = self.string()
+            elif ch.isdigit():
+                key = _number_key(self.number())
+            else:
+                key = self.identifier()
+            self.expect(":")
+            result[key] = self.value()
+            if not self.accept(","):
+                self.expect("}")
+                break
+        return result
+
+    def array(self) -> List[Any]:
+        self.expect("[")
+        result: List[Any] = []
+        while not self.accept("]"):
+            if self.peek() == ",":
+                # 稀疏数组的空位
+                self.pos += 1
+                self.saw_undefined = True
+                result.append(_UNDEFINED)
+                continue
+            result.append(self.value())
+            if not self.accept(","):
+                self.expect("]")
+                break
+        return result
+
+    def number(self):
+        self.skip_ws()
+        match = _NUMBER.match(self.text, self.pos)
+        if not match:
+            self.error("无效的数字")
+        self.pos = match.end()
+        literal = match.group()
+        if literal.lstrip("-")[:2] in ("0x", "0X"):
+            return int(literal, 16)
+        if any(c in literal for c in ".eE"):
+            number = float(literal)
+            # JS 只有一种数字类型，与 JSON.stringify 一致：整数值输出为 int
+            return int(number) if number.is_integer() and abs(number) < 2 ** 53 else number
+        return int(literal)
+
+    def string(self) -> str:
+        self.skip_ws()
+        text = self.text
+        quote = text[self.pos]
+        stop = _STRING_STOP[quote]
+        pos = self.pos + 1
+        parts = []
+        while True:
+            match = stop.search(text, pos)
+            if not match:
+                self.error("字符串未结束")
+            end = match.start()
+            parts.append(text[pos:end])
+            if text[end] == quote:
+                self.pos = end + 1
+                return "".join(parts)
+            # 转义
+            esc = text[end + 1]
+            if esc == "u":
+                if text[end + 2] == "{":
+                    close = text.index("}", end + 3)
+                    parts.append(chr(int(text[end + 3:close], 16)))
+                    pos = close + 1
+                else:
+                    code = int(text[end + 2:end + 6], 16)
+                    pos = end + 6
+                    # 代理对
+                    if 0xD800 <= code <= 0xDBFF and text.startswith("\\u", pos):
+                        low = int(text[pos + 2:pos + 6], 16)
+                        if 0xDC00 <= low <= 0xDFFF:
+                            code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                            pos += 6
+                    parts.append(chr(code))
+            elif esc == "x":
+                parts.append(chr(int(text[end + 2:end + 4], 16)))
+                pos = end + 4
+            else:
+                parts.append(_SIMPLE_ESCAPES.get(esc, esc))
+                pos = end + 2
+
+    def word(self) -> Any:
+        name = self.identifier()
+        if name == "true":
+            return True
+        if name == "false":
+            return False
+        if name == "null":
+            return None
+        if name == "undefined":
+            self.saw_undefined = True
+            return _UNDEFINED
+        if name == "void":
+            self.value()
+            self.saw_undefined = True
+            return _UNDEFINED
+        if name in ("NaN", "Infinity"):
+            # JSON.stringify 输出为 null
+            return None
+        if name in self.scope:
+            return self.scope[name]
+        self.error(f"未定义的变量 {name}")
+
+
+def _strip_undefined(value: Any) -> Any:
+    """按 JSON.stringify 的规则处理 undefined：对象中删除该键，数组中变为 None"""
+    if isinstance(value, dict):
+        return {k: _strip_undefined(v) for k, v in value.items() if v is not _UNDEFINED}
+    if isinstance(value, list):
+        return [None if v is _UNDEFINED else _strip_undefined(v) for v in value]
+    return None if value is _UNDEFINED else value
+
+
+def _number_key(value) -> str:
+    """JS 对象的数字键转为字符串（1.0 -> "1"）"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def decode_nuxt(expression: str) -> Any:
+    """
+    解码 window.__NUXT__= 右侧的表达式
+
+    也接受直接的对象字面量（部分页面不使用函数包装）。
+    结果与 execjs.eval 一致（即 JSON.stringify 后再解析的结果）。
+    """
+    parser = _Parser(expression.strip())
+    try:
+        if parser.peek() in ("{", "["):
+            result = parser.value()
+            parser.accept(";")
+            parser.skip_ws()
+            if parser.pos != len(parser.text):
+                parser.error("表达式后有多余内容")
+        else:
+            result = parser.parse_program()
+    except NuxtDecodeError:
+        raise
+    except (IndexError, KeyError, ValueError) as e:
+        # 截断的转义序列、越界下标等
+        raise NuxtDecodeError(f"无法解析的表达式: {e}") from e
+    # 只有出现过 undefined 时才需要再遍历一次
+    return _strip_undefined(result) if parser.saw_undefined else result
+
+
+def extract_nuxt_expression(html: str) -> Optional[str]:
+    """从页面 HTML 中取出 __NUXT__ 表达式，没有时返回 None"""
+    match = NUXT_SCRIPT_PATTERN.search(html)
+    if not match:
+        return None
+    expression = match.group(1).strip()
+    if expression.endswith(";"):
+        expression = expression[:-1]
+    return expression
+
+
+def parse_nuxt_html(html: str) -> Tuple[Optional[str], Any]:
+    """提取并解码页面中的 __NUXT__ 数据，返回 (表达式, 数据)"""
+    expression = extract_nuxt_expression(html)
+    if expression is None:
+        return None, None
+    return expression, decode_nuxt(expression)
@@ -6,6 +6,7 @@ import os
 import uuid
 import aiofiles
 from datetime import datetime
+from starlette.concurrency import run_in_threadpool
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -85,8 +86,8 @@ async def _upload_to_qiniu(data: bytes, file_ext: str, folder: str = "") -> dict
     try:
         from app.utils.qiniu_storage import qiniu_storage
         
-        # 直接调用七牛云上传（已经是同步方法，在这里包装为异步）
-        result = qiniu_storage.upload_data(data, file_ext, folder)
+        # 七牛云 SDK 是阻塞调用，放到线程池执行，避免卡住事件循环
+        result = await run_in_threadpool(qiniu_storage.upload_data, data, file_ext, folder)
         return result
         
     except Exception as e:
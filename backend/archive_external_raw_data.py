@@ -0,0 +1,82 @@
+"""
+迁移脚本：把外部数据记录表中的 raw_data 压缩后迁入 external_raw_data，并清空原列
+（migrations/add_external_raw_data_table.sql 建表后执行，中断后可以重新执行）
+"""
+import json
+
+from sqlalchemy import bindparam, text
+
+from app.core.database import SessionLocal
+from app.services.external_raw_store import archive_raw_payloads
+
+TABLES = {
+    "sleep": "external_sleep_records",
+    "exercise": "external_exercise_records",
+    "weight": "external_weight_records",
+    "steps": "external_step_records",
+}
+BATCH_SIZE = 1000
+
+
+def archive_table(db, data_type: str, table: str) -> int:
+    """按主键分批迁移，返回迁移的行数（无法解析的 raw_data 保留在原列中，不清空）"""
+    last_id = 0
+    total = 0
+    skipped = 0
+    while True:
+        rows = db.execute(
+            text(
+                f"SELECT id, data_hash, raw_data FROM {table} "
+                "WHERE id > :last_id AND raw_data IS NOT NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            if skipped:
+                print(f"  {table}: {skipped} 行 raw_data 无法解析，已保留在原列中")
+            return total
+
+        items = []
+        archived_ids = []
+        for row in rows:
+            # raw_data 是 JSON 列中保存的 JSON 字符串，可能需要解析两次
+            record = row.raw_data
+            try:
+                while isinstance(record, (str, bytes)):
+                    record = json.loads(record)
+            except ValueError:
+                skipped += 1
+                continue
+            items.append((row.data_hash, record))
+            archived_ids.append(row.id)
+
+        archive_raw_payloads(db, data_type, items)
+        # 只清空已归档的行
+        if archived_ids:
+            db.execute(
+                text(f"UPDATE {table} SET raw_data = NULL WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": archived_ids}
+            )
+        db.commit()
+        last_id = rows[-1].id
+        total += len(archived_ids)
+        print(f"  {table}: 已迁移 {total} 行")
+
+
+def main():
+    db = SessionLocal()
+    try:
+        for data_type, table in TABLES.items():
+            print(f"开始迁移 {table}...")
+            count = archive_table(db, data_type, table)
+            print(f"✓ {table}: 迁移 {count} 行")
+        print("\n完成！")
+    except Exception as e:
+        db.rollback()
+        print(f"迁移失败: {str(e)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+__NUXT__ 解码器校验与性能对比（纯 Python 解码器 vs execjs）
+
+用法：
+    python benchmark_nuxt_decoder.py                 # 使用 fixtures/miaofoods/*.html
+    python benchmark_nuxt_decoder.py page1.html ...  # 指定保存的搜索页
+    python benchmark_nuxt_decoder.py -n 200          # 每个页面解码次数
+
+正确性由 tests/test_nuxt_decoder.py 保证（对照 fixtures 中的 *.expected.json），这里只做性能对比：
+execjs 已不在依赖中，手动安装 PyExecJS 和 JS 运行时后会额外校验结果一致并对比耗时，否则只输出纯 Python 解码耗时。
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from app.utils.nuxt_decoder import decode_nuxt, extract_nuxt_expression
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "miaofoods")
+
+
+def load_execjs():
+    try:
+        import execjs
+        execjs.get()
+        return execjs
+    except Exception as e:
+        print(f"execjs 不可用，跳过对比: {e}")
+        return None
+
+
+def timed(func, expression, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(expression)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="__NUXT__ 解码器校验与性能对比")
+    parser.add_argument("pages", nargs="*", help="保存的搜索页 HTML，默认 fixtures/miaofoods/*.html")
+    parser.add_argument("-n", "--rounds", type=int, default=100, help="每个页面的解码次数")
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    if not pages:
+        print("没有可用的页面")
+        return 1
+
+    execjs = load_execjs()
+    # execjs 每次调用都会启动一个 JS 运行时进程，次数减少以免耗时过长
+    execjs_rounds = max(1, args.rounds // 20)
+
+    failures = 0
+    for path in pages:
+        with open(path, encoding="utf-8") as f:
+            expression = extract_nuxt_expression(f.read())
+        name = os.path.basename(path)
+        if expression is None:
+            print(f"✗ {name}: 未找到 __NUXT__")
+            failures += 1
+            continue
+
+        try:
+            decoded = decode_nuxt(expression)
+        except Exception as e:
+            print(f"✗ {name}: 解码失败 {e}")
+            failures += 1
+            continue
+
+        foods = decoded.get("data", [{}])[0].get("curSearchFoodList", [])
+        python_ms = timed(decode_nuxt, expression, args.rounds)
+        line = f"{name}: {len(expression)} 字节, {len(foods)} 条食物, python {python_ms:.3f} ms"
+
+        if execjs is not None:
+            if execjs.eval(expression) != decoded:
+                print(f"✗ {name}: 与 execjs 结果不一致")
+                failures += 1
+                continue
+            execjs_ms = timed(execjs.eval, expression, execjs_rounds)
+            line += f", execjs {execjs_ms:.3f} ms ({execjs_ms / python_ms:.0f}x)"
+        print(f"✓ {line}")
+
+    if failures:
+        print(f"\n{failures} 个页面校验失败")
+        return 1
+    print("\n全部页面校验通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+检查核心查询的执行计划（EXPLAIN），发现全表扫描时返回非零退出码
+
+用法：
+    python check_query_plans.py            # 使用记录最多的用户
+    python check_query_plans.py --user 12  # 指定用户
+
+新增或修改按用户、日期查询的接口后执行一次，防止索引失效导致的性能回退。
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import desc, func, select
+
+from app.core.database import engine
+from app.models.daily_history import DailyHistory
+from app.models.diet import DietRecord
+from app.models.exercise import ExerciseRecord
+from app.models.external_data import ExternalSleepRecord
+from app.models.sleep import SleepRecord
+from app.models.water import WaterRecord
+from app.models.weight import WeightRecord
+from app.services.daily_rollup_service import _child_rows_query
+from app.services.nutrition_summary_service import summary_range_query
+
+# 视为全表/全索引扫描的访问类型
+FULL_SCAN_TYPES = {"ALL", "index"}
+
+
+def canonical_queries(user_id: int, today: date):
+    """应用中最常执行的按用户、日期查询"""
+    month_ago = today - timedelta(days=30)
+    return {
+        "体重趋势": select(WeightRecord.record_date, WeightRecord.weight).where(
+            WeightRecord.user_id == user_id, WeightRecord.record_date >= month_ago
+        ).order_by(WeightRecord.record_date.asc()),
+        "最新体重": select(WeightRecord.weight, WeightRecord.record_date).where(
+            WeightRecord.user_id == user_id
+        ).order_by(desc(WeightRecord.record_date), desc(WeightRecord.updated_at), desc(WeightRecord.id)).limit(1),
+        "当天体重": select(WeightRecord).where(
+            WeightRecord.user_id == user_id, WeightRecord.record_date == today
+        ),
+        "今日饮食": select(DietRecord).where(
+            DietRecord.user_id == user_id, DietRecord.record_date == today
+        ),
+        "今日运动": select(ExerciseRecord).where(
+            ExerciseRecord.user_id == user_id, ExerciseRecord.record_date == today
+        ),
+        "今日饮水": select(WaterRecord).where(
+            WaterRecord.user_id == user_id, WaterRecord.record_date == today
+        ),
+        "当天睡眠": select(SleepRecord).where(
+            SleepRecord.user_id == user_id, SleepRecord.record_date == today
+        ),
+        "历史列表": select(DailyHistory).where(
+            DailyHistory.user_id == user_id, DailyHistory.record_date <= today
+        ).order_by(DailyHistory.record_date.desc()).limit(20),
+        "历史总数": select(func.count()).select_from(DailyHistory).where(
+            DailyHistory.user_id == user_id, DailyHistory.record_date <= today
+        ),
+        "营养汇总趋势": summary_range_query(user_id, today - timedelta(days=365)),
+        "历史汇总重算": _child_rows_query([(user_id, today), (user_id, today - timedelta(days=1))]),
+        "外部睡眠列表": select(ExternalSleepRecord).where(
+            ExternalSleepRecord.user_id == user_id,
+            ExternalSleepRecord.is_deleted == False,
+            ExternalSleepRecord.sleep_date >= month_ago
+        ).order_by(desc(ExternalSleepRecord.sleep_date)).limit(20),
+    }
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    result = conn.exec_driver_sql(f"EXPLAIN {compiled}", params)
+    return [dict(row._mapping) for row in result]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="检查核心查询的执行计划")
+    parser.add_argument("--user", type=int, help="用于检查的用户ID，默认取体重记录最多的用户")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        user_id = args.user
+        if user_id is None:
+            user_id = conn.execute(
+                select(WeightRecord.user_id).group_by(WeightRecord.user_id)
+                .order_by(func.count().desc()).limit(1)
+            ).scalar() or 1
+
+        problems = 0
+        for name, stmt in canonical_queries(user_id, date.today()).items():
+            for row in explain(conn, stmt):
+                access_type = row.get("type")
+                table = row.get("table")
+                if table is None or table.startswith("<"):
+                    # 派生表/UNION结果，本身不对应索引
+                    continue
+                flagged = access_type in FULL_SCAN_TYPES or row.get("key") is None
+                status = "✗" if flagged else "✓"
+                print(f"{status} {name}: table={table} type={access_type} key={row.get('key')} "
+                      f"rows={row.get('rows')} extra={row.get('Extra') or ''}")
+                if flagged:
+                    problems += 1
+
+    if problems:
+        print(f"\n发现 {problems} 处全表扫描或未使用索引，请检查索引（migrations/add_user_date_composite_indexes.sql）")
+        return 1
+    print("\n所有核心查询均使用了索引")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
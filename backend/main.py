@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
+import hmac
 import os
 import logging
 from datetime import datetime
@@ -72,12 +73,28 @@ async def startup_event():
         scheduler_service.load_all_jobs(db)
     finally:
         db.close()
+    # 每日历史汇总后台任务
+    scheduler_service.add_daily_rollup_job()
+    # 夜间批量体重预测任务
+    scheduler_service.add_forecast_batch_job()
+    # 食物检索索引（后台构建，就绪前查询走数据库）
+    scheduler_service.add_food_index_job()
+    # 食物随机推荐列表
+    scheduler_service.add_food_random_job()
+    # 食物缓存预热
+    scheduler_service.add_food_cache_warm_job()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时的清理操作"""
     from app.services.scheduler_service import scheduler_service
+    from app.core.database import async_engine
+    from app.services import miaofoods_client, food_image_service, xiaomi_async_sync
     scheduler_service.shutdown()
+    await async_engine.dispose()
+    await miaofoods_client.close_http_client()
+    await food_image_service.close_http_client()
+    await xiaomi_async_sync.close_http_clients()
 
 
 @app.get("/")
@@ -90,6 +107,18 @@ async def root():
     }
 
 
+@app.get("/metrics/db-pool")
+async def db_pool_metrics(request: Request):
+    """数据库连接池监控数据（当前 worker 进程）"""
+    from app.core.config import get_settings
+    from app.core.db_metrics import get_pool_stats
+    metrics_token = get_settings().METRICS_TOKEN
+    # 未配置口令时不对外开放
+    if not metrics_token or not hmac.compare_digest(request.headers.get("X-Metrics-Token", ""), metrics_token):
+        return JSONResponse(status_code=403, content={"code": 403, "message": "无权访问", "data": None})
+    return {"code": 200, "data": get_pool_stats()}
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """全局异常处理"""
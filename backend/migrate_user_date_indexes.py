@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""添加 (user_id, record_date) 联合索引迁移脚本"""
+
+from sqlalchemy import text
+from app.core.database import engine
+
+def migrate():
+    with open('migrations/add_user_date_composite_indexes.sql', 'r', encoding='utf-8') as f:
+        # 去掉注释行后再分割，避免注释开头的语句被跳过
+        sql = '\n'.join(line for line in f if not line.strip().startswith('--'))
+
+    # 分割SQL语句
+    statements = [s.strip() for s in sql.split(';') if s.strip()]
+
+    with engine.connect() as conn:
+        for stmt in statements:
+            print(f"执行: {stmt[:80]}...")
+            try:
+                conn.execute(text(stmt))
+                conn.commit()
+                print("✓ 成功")
+            except Exception as e:
+                print(f"✗ 失败: {e}")
+                conn.rollback()
+
+    print("\n数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()
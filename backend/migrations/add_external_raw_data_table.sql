@@ -0,0 +1,15 @@
+-- 外部数据原始数据归档表（zlib 压缩，按数据类型和 data_hash 对应记录）
+-- 执行日期: 2026-10-18
+-- 需在 rehash_external_data_hash.sql 之后执行（data_hash 已为 BINARY(16)）
+
+CREATE TABLE `external_raw_data` (
+  `data_type` VARCHAR(20) NOT NULL COMMENT '数据类型（sleep/exercise/weight/steps）',
+  `data_hash` BINARY(16) NOT NULL COMMENT '对应记录的数据标识哈希',
+  `payload` MEDIUMBLOB NOT NULL COMMENT '压缩后的原始数据',
+  `created_at` DATETIME NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  PRIMARY KEY (`data_type`, `data_hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='外部数据原始数据归档表';
+
+-- 建表后在 backend 目录执行 python archive_external_raw_data.py，把已有记录的 raw_data 迁入归档表并清空原列
+-- 迁移完成后可执行 OPTIMIZE TABLE 回收空间：
+-- OPTIMIZE TABLE external_sleep_records, external_exercise_records, external_weight_records, external_step_records;
@@ -0,0 +1,22 @@
+-- 按游标（keyset）翻页的列表接口所需索引：索引列顺序与列表排序一致，翻到多深都只扫描一页的数据
+-- InnoDB 二级索引末尾隐含主键 id，排序的最后一列 id 不需要单独写进索引
+-- 执行日期: 2026-10-18
+
+-- 1. 同步日志：按 (created_at, id) 倒序
+ALTER TABLE `data_sync_log`
+ADD INDEX `idx_user_created` (`user_id`, `created_at`);
+
+-- 2. 外部数据：按 (日期, 时间, id) 倒序，扩展原有的 (user_id, 日期) 索引
+ALTER TABLE `external_sleep_records`
+DROP INDEX `idx_user_date`,
+ADD INDEX `idx_user_date` (`user_id`, `sleep_date`, `start_time`);
+
+ALTER TABLE `external_exercise_records`
+DROP INDEX `idx_user_date`,
+ADD INDEX `idx_user_date` (`user_id`, `exercise_date`, `start_time`);
+
+ALTER TABLE `external_weight_records`
+DROP INDEX `idx_user_date`,
+ADD INDEX `idx_user_date` (`user_id`, `measure_date`, `measure_time`);
+
+-- 步数 (user_id, step_date)、每日历史 uk_user_date (user_id, record_date) 已满足，无需修改
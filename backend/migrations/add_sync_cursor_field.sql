@@ -0,0 +1,5 @@
+-- 添加增量同步游标字段（定时同步只拉取游标之后的数据）
+-- 执行日期: 2026-10-18
+
+ALTER TABLE data_sync_config 
+ADD COLUMN sync_cursor BIGINT NULL COMMENT '增量同步游标（已拉取到的最新数据时间，秒级时间戳）' AFTER last_sync_time;
@@ -0,0 +1,41 @@
+-- 为按 (user_id, record_date) 查询的记录表添加联合索引
+-- 几乎所有查询都是 WHERE user_id = ? AND record_date ... ，单列索引需要MySQL二选一或做索引合并
+-- 已存在同名索引的表执行时会报 Duplicate key name，可忽略
+
+-- 1. 体重记录：每个用户每天只有一条，先清理重复数据（保留id最大的一条），再加唯一约束
+DELETE t1 FROM weight_records t1
+INNER JOIN weight_records t2
+WHERE
+    t1.user_id = t2.user_id
+    AND t1.record_date = t2.record_date
+    AND t1.id < t2.id;
+
+ALTER TABLE `weight_records`
+ADD UNIQUE KEY `uk_user_date` (`user_id`, `record_date`);
+
+-- 2. 每日历史：同上（旧库已执行过 add_daily_history_unique_constraint.sql 的会报重复，可忽略）
+DELETE t1 FROM daily_history t1
+INNER JOIN daily_history t2
+WHERE
+    t1.user_id = t2.user_id
+    AND t1.record_date = t2.record_date
+    AND t1.id < t2.id;
+
+ALTER TABLE `daily_history`
+ADD UNIQUE KEY `uk_user_date` (`user_id`, `record_date`);
+
+-- 3. 饮食记录（一天多条）
+ALTER TABLE `diet_records`
+ADD INDEX `idx_user_date` (`user_id`, `record_date`);
+
+-- 4. 运动记录（一天多条）
+ALTER TABLE `exercise_records`
+ADD INDEX `idx_user_date` (`user_id`, `record_date`);
+
+-- 5. 饮水记录（一天多条）
+ALTER TABLE `water_records`
+ADD INDEX `idx_user_date` (`user_id`, `record_date`);
+
+-- 6. 睡眠记录
+ALTER TABLE `sleep_records`
+ADD INDEX `idx_user_date` (`user_id`, `record_date`);
@@ -0,0 +1,19 @@
+-- 每日营养汇总表（按用户、日期一行，由写入路径增量维护）
+-- 建表后执行 python rebuild_nutrition_summary.py 回填历史数据
+CREATE TABLE IF NOT EXISTS `daily_nutrition_summary` (
+  `id` INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+  `user_id` INT NOT NULL COMMENT '用户ID',
+  `record_date` DATE NOT NULL COMMENT '记录日期',
+  `intake_calories` FLOAT NOT NULL DEFAULT 0 COMMENT '摄入热量(千卡)',
+  `protein` FLOAT NOT NULL DEFAULT 0 COMMENT '蛋白质(g)',
+  `carbs` FLOAT NOT NULL DEFAULT 0 COMMENT '碳水化合物(g)',
+  `fat` FLOAT NOT NULL DEFAULT 0 COMMENT '脂肪(g)',
+  `exercise_calories` FLOAT NOT NULL DEFAULT 0 COMMENT '运动消耗热量(千卡)',
+  `exercise_duration` INT NOT NULL DEFAULT 0 COMMENT '运动时长(分钟)',
+  `water` FLOAT NOT NULL DEFAULT 0 COMMENT '饮水量(ml)',
+  `sleep_duration` FLOAT NOT NULL DEFAULT 0 COMMENT '睡眠时长(小时)',
+  `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_user_date` (`user_id`, `record_date`),
+  FOREIGN KEY (`user_id`) REFERENCES `users`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='每日营养汇总表';
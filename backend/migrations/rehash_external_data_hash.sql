@@ -0,0 +1,39 @@
+-- 外部数据防重哈希改为16字节标识（VARCHAR(64) -> BINARY(16)）
+-- 执行日期: 2026-10-18
+-- 分三步执行，执行期间请暂停数据同步
+
+-- 第一步：添加新列
+ALTER TABLE external_sleep_records
+ADD COLUMN record_key BINARY(16) NULL COMMENT '数据标识哈希（防重）' AFTER data_hash;
+
+ALTER TABLE external_exercise_records
+ADD COLUMN record_key BINARY(16) NULL COMMENT '数据标识哈希（防重）' AFTER data_hash;
+
+ALTER TABLE external_weight_records
+ADD COLUMN record_key BINARY(16) NULL COMMENT '数据标识哈希（防重）' AFTER data_hash;
+
+ALTER TABLE external_step_records
+ADD COLUMN record_key BINARY(16) NULL COMMENT '数据标识哈希（防重）' AFTER data_hash;
+
+-- 第二步：在 backend 目录执行 python rehash_external_data.py，分批计算 record_key 并删除标识重复的记录
+
+-- 第三步：用新列替换原来的 data_hash（删除列时其唯一索引一并删除）
+ALTER TABLE external_sleep_records
+DROP COLUMN data_hash,
+CHANGE COLUMN record_key data_hash BINARY(16) NOT NULL COMMENT '数据标识哈希（防重）',
+ADD UNIQUE KEY uk_data_hash (data_hash);
+
+ALTER TABLE external_exercise_records
+DROP COLUMN data_hash,
+CHANGE COLUMN record_key data_hash BINARY(16) NOT NULL COMMENT '数据标识哈希（防重）',
+ADD UNIQUE KEY uk_data_hash (data_hash);
+
+ALTER TABLE external_weight_records
+DROP COLUMN data_hash,
+CHANGE COLUMN record_key data_hash BINARY(16) NOT NULL COMMENT '数据标识哈希（防重）',
+ADD UNIQUE KEY uk_data_hash (data_hash);
+
+ALTER TABLE external_step_records
+DROP COLUMN data_hash,
+CHANGE COLUMN record_key data_hash BINARY(16) NOT NULL COMMENT '数据标识哈希（防重）',
+ADD UNIQUE KEY uk_data_hash (data_hash);
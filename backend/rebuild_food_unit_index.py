@@ -0,0 +1,36 @@
+"""
+回填脚本：扫描已有的食物单位，生成每个用户的单位索引（food_unit_index:{user_id}）
+（上线单位索引后运行一次，之后由接口维护）
+"""
+from collections import defaultdict
+
+from app.core.redis import get_redis
+from app.api.v1.food_unit import UNIT_KEY_PREFIX, UNIT_TTL, _index_key
+
+
+def main():
+    """扫描 food_unit:*:units 并写入用户索引"""
+    redis_client = get_redis()
+    members = defaultdict(set)
+    try:
+        print("开始扫描食物单位...")
+        for key in redis_client.scan_iter(match=f"{UNIT_KEY_PREFIX}*:units", count=1000):
+            # food_unit:{user_id}:{source_type}:{food_id}:units
+            parts = key[len(UNIT_KEY_PREFIX):].split(":")
+            if len(parts) != 4:
+                continue
+            user_id, source_type, food_id, _ = parts
+            members[user_id].add(f"{source_type}:{food_id}")
+
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, foods in members.items():
+            pipe.sadd(_index_key(user_id), *foods)
+            pipe.expire(_index_key(user_id), UNIT_TTL)
+        pipe.execute()
+        print(f"\n完成！共 {len(members)} 个用户，{sum(len(f) for f in members.values())} 个食物")
+    except Exception as e:
+        print(f"回填失败: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+恢复脚本：根据体重记录全量重建 Redis 中的减肥榜
+"""
+from app.core.database import SessionLocal
+from app.services.leaderboard_service import rebuild_leaderboard
+
+
+def main():
+    """全量重建减肥榜"""
+    db = SessionLocal()
+    try:
+        print("开始重建减肥榜...")
+        ranked = rebuild_leaderboard(db)
+        print(f"\n完成！{ranked} 个用户上榜")
+    except Exception as e:
+        print(f"重建失败: {str(e)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+回填脚本：根据饮食/运动/饮水/睡眠记录全量重建每日营养汇总表
+（执行 migrations/create_daily_nutrition_summary_table.sql 建表后运行一次）
+"""
+from app.core.database import SessionLocal
+from app.services.nutrition_summary_service import rebuild_nutrition_summaries
+
+
+def main():
+    """全量回填营养汇总"""
+    db = SessionLocal()
+    try:
+        print("开始回填每日营养汇总...")
+        written = rebuild_nutrition_summaries(db)
+        print(f"\n完成！共写入 {written} 天")
+    except Exception as e:
+        print(f"回填失败: {str(e)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+迁移脚本：为已有的外部数据计算16字节防重标识（migrations/rehash_external_data_hash.sql 第二步）
+
+按主键分批读取 raw_data 计算 record_key，已计算过的行会跳过，中断后可以重新执行。
+按新的标识计算后重复的记录（同一用户、同一数据时间的多条）只保留 id 最小的一条。
+"""
+import json
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+from app.utils.data_hash import compute_data_hash
+
+TABLES = {
+    "sleep": "external_sleep_records",
+    "exercise": "external_exercise_records",
+    "weight": "external_weight_records",
+    "steps": "external_step_records",
+}
+BATCH_SIZE = 2000
+
+
+def _load_record(raw_data):
+    """raw_data 是 JSON 列中保存的 JSON 字符串，可能需要解析两次"""
+    record = raw_data
+    while isinstance(record, (str, bytes)):
+        record = json.loads(record)
+    return record if isinstance(record, dict) else None
+
+
+def rehash_table(db, data_type: str, table: str) -> int:
+    """分批计算 record_key，返回处理的行数"""
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.execute(
+            text(
+                f"SELECT id, user_id, data_source, data_hash, raw_data FROM {table} "
+                "WHERE id > :last_id AND record_key IS NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            return total
+
+        params = []
+        for row in rows:
+            try:
+                record = _load_record(row.raw_data)
+            except ValueError:
+                record = None
+            if record is None:
+                # 原始数据无法解析时沿用旧哈希，保证唯一
+                key = compute_data_hash(row.user_id, row.data_source, data_type, {"source_id": row.data_hash})
+            else:
+                record.pop("data_hash", None)
+                key = compute_data_hash(row.user_id, row.data_source, data_type, record)
+            params.append({"id": row.id, "key": key})
+
+        db.execute(text(f"UPDATE {table} SET record_key = :key WHERE id = :id"), params)
+        db.commit()
+        last_id = rows[-1].id
+        total += len(rows)
+        print(f"  {table}: 已处理 {total} 行")
+
+
+def remove_duplicates(db, table: str) -> int:
+    """删除标识重复的记录，保留 id 最小的一条"""
+    result = db.execute(text(
+        f"DELETE t FROM {table} t "
+        f"JOIN (SELECT record_key, MIN(id) AS keep_id FROM {table} "
+        "GROUP BY record_key HAVING COUNT(*) > 1) d "
+        "ON t.record_key = d.record_key AND t.id > d.keep_id"
+    ))
+    db.commit()
+    return result.rowcount
+
+
+def main():
+    db = SessionLocal()
+    try:
+        for data_type, table in TABLES.items():
+            print(f"开始处理 {table}...")
+            count = rehash_table(db, data_type, table)
+            removed = remove_duplicates(db, table)
+            print(f"✓ {table}: 计算 {count} 行，删除重复 {removed} 行")
+        print("\n完成！请继续执行 rehash_external_data_hash.sql 第三步")
+    except Exception as e:
+        db.rollback()
+        print(f"迁移失败: {str(e)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
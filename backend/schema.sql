@@ -50,6 +50,7 @@ CREATE TABLE IF NOT EXISTS exercise_records (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     INDEX idx_user_id (user_id),
     INDEX idx_record_date (record_date),
+    INDEX idx_user_date (user_id, record_date),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='运动记录表';
 
@@ -70,6 +71,7 @@ CREATE TABLE IF NOT EXISTS diet_records (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     INDEX idx_user_id (user_id),
     INDEX idx_record_date (record_date),
+    INDEX idx_user_date (user_id, record_date),
     INDEX idx_meal_type (meal_type),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='饮食记录表';
@@ -83,6 +85,7 @@ CREATE TABLE IF NOT EXISTS water_records (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     INDEX idx_user_id (user_id),
     INDEX idx_record_date (record_date),
+    INDEX idx_user_date (user_id, record_date),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='饮水记录表';
 
@@ -99,5 +102,24 @@ CREATE TABLE IF NOT EXISTS sleep_records (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     INDEX idx_user_id (user_id),
     INDEX idx_record_date (record_date),
+    INDEX idx_user_date (user_id, record_date),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='睡眠记录表';
+
+-- 每日营养汇总表（由饮食/运动/饮水/睡眠写入增量维护）
+CREATE TABLE IF NOT EXISTS daily_nutrition_summary (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL COMMENT '用户ID',
+    record_date DATE NOT NULL COMMENT '记录日期',
+    intake_calories FLOAT NOT NULL DEFAULT 0 COMMENT '摄入热量(千卡)',
+    protein FLOAT NOT NULL DEFAULT 0 COMMENT '蛋白质(g)',
+    carbs FLOAT NOT NULL DEFAULT 0 COMMENT '碳水化合物(g)',
+    fat FLOAT NOT NULL DEFAULT 0 COMMENT '脂肪(g)',
+    exercise_calories FLOAT NOT NULL DEFAULT 0 COMMENT '运动消耗热量(千卡)',
+    exercise_duration INT NOT NULL DEFAULT 0 COMMENT '运动时长(分钟)',
+    water FLOAT NOT NULL DEFAULT 0 COMMENT '饮水量(ml)',
+    sleep_duration FLOAT NOT NULL DEFAULT 0 COMMENT '睡眠时长(小时)',
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    UNIQUE KEY uk_user_date (user_id, record_date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='每日营养汇总表';
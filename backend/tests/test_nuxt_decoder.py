@@ -0,0 +1,99 @@
+"""
+__NUXT__ 解码器测试
+
+fixtures/miaofoods/*.html 是保存的搜索页，*.expected.json 是同一表达式经 JS 运行时
+JSON.stringify(eval(...)) 得到的结果（与原来 execjs.eval 的行为一致）。
+新增页面时保存整页 HTML，用 node 对其中的 __NUXT__ 表达式生成对应的 expected.json。
+"""
+import glob
+import json
+import os
+
+import pytest
+
+from app.services.miaofoods_client import _extract_foods
+from app.utils.nuxt_decoder import NuxtDecodeError, decode_nuxt, parse_nuxt_html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "miaofoods")
+PAGES = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("page", PAGES, ids=os.path.basename)
+def test_fixture_matches_js_eval(page):
+    expression, data = parse_nuxt_html(_read(page))
+    assert expression is not None
+    expected = json.loads(_read(page[:-len(".html")] + ".expected.json"))
+    assert data == expected
+
+
+def test_extract_foods_from_fixture():
+    _, data = parse_nuxt_html(_read(os.path.join(FIXTURE_DIR, "search_jidan.html")))
+    foods = _extract_foods(data)
+
+    assert len(foods) == 12
+    assert foods[0] == {
+        "external_id": "64434",
+        "name": "鸡蛋",
+        "calories": "0",
+        "protein": "17.1",
+        "carbs": "77.4",
+        "fat": "8.8",
+        "image_url": "https://img.miaofoods.com/food/0/icon.jpg",
+        "category": "蛋类",
+        "source": "miaofoods",
+        "unit": "100克",
+    }
+    tea_egg = next(food for food in foods if food["name"] == "茶叶蛋")
+    assert (tea_egg["calories"], tea_egg["protein"], tea_egg["carbs"], tea_egg["fat"]) == ("52.3", "1.6", "25.9", "8.8")
+    # 形参引用和赋值语句（x.platform=...）都已展开
+    assert data["state"]["app"] == {"platform": "pc", "theme": "light", "ratio": 0.5, "flags": [1, None, 3]}
+
+
+def test_page_without_nuxt_data():
+    assert parse_nuxt_html("<html><body>404</body></html>") == (None, None)
+
+
+def test_sparse_array():
+    assert decode_nuxt("[1,,3]") == [1, None, 3]
+    assert decode_nuxt("[,1,]") == [None, 1]
+
+
+def test_void_0_and_undefined():
+    assert decode_nuxt("{a:void 0,b:undefined,c:1}") == {"c": 1}
+    assert decode_nuxt("[void 0,1]") == [None, 1]
+    # 缺少的实参是 undefined
+    assert decode_nuxt("(function(a,b){return {a:a,b:b}}(1))") == {"a": 1}
+
+
+def test_index_assignment():
+    expression = '(function(a,b){a[0]=b;a[2]="x";b.self=1;return {list:a,item:b}}([],{}))'
+    assert decode_nuxt(expression) == {"list": [{"self": 1}, None, "x"], "item": {"self": 1}}
+
+
+def test_unicode_escapes():
+    assert decode_nuxt('{s:"\\ud83c\\udf5a\\u7c73\\u{1F35A}\\x41"}') == {"s": "🍚米🍚A"}
+    assert decode_nuxt("['https:\\u002F\\u002Fimg']") == ["https://img"]
+
+
+@pytest.mark.parametrize("expression", [
+    '(function(a){return {foodName:a',
+    '(function(a){return {foodName:a}}("米饭"',
+    '{s:"\\u00',
+    '{a:"未结束}',
+    '[1,2',
+])
+def test_truncated_input_raises(expression):
+    with pytest.raises(NuxtDecodeError):
+        decode_nuxt(expression)
+
+
+@pytest.mark.parametrize("page", PAGES, ids=os.path.basename)
+def test_truncated_page_raises(page):
+    expression, _ = parse_nuxt_html(_read(page))
+    with pytest.raises(NuxtDecodeError):
+        decode_nuxt(expression[:len(expression) // 2])